@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
 
@@ -53,6 +54,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    # Routes content reads to replicas and pins recent writers to the primary (see mytribe/replicas.py)
+    'mytribe.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,6 +99,81 @@ DATABASES = {
     }
 }
 
+# Read replicas (see mytribe/replicas.py): a comma-separated host[:port] list of
+# streaming replicas of the default database. Content list/retrieve/comments
+# reads go to a healthy replica; writes, transactions and everything else use
+# the primary. Locally, point DATABASES['replica_1'] at a second database (or
+# at the same SQLite file) and list it in DATABASE_REPLICAS.
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port) if port else DATABASES['default']['PORT'],
+        'OPTIONS': {'connect_timeout': 2},
+        # Tests run against the primary alone
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['mytribe.replicas.ReplicaRouter']
+
+# Replicas more than REPLICA_MAX_LAG seconds behind are skipped; each process
+# re-measures them every REPLICA_CHECK_INTERVAL seconds. A user who writes reads
+# from the primary for REPLICA_PIN_SECONDS, which should cover both. Pins are
+# kept in the default cache, so with replicas set REDIS_URL too (check replicas.W001).
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 5
+REPLICA_PIN_SECONDS = 10
+
+
+# Caching
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; set REDIS_URL to share the cache between workers in production.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'mytribe',
+        }
+    }
+
+# Anonymous content list/retrieve responses (see mytribe/cache.py)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Engagement counters (see mytribe/counters.py). With buffering on, likes and comment
+# counts accumulate in the cache and `manage.py flush_counters` writes them to the
+# database; schedule it at least every COUNTER_FLUSH_INTERVAL seconds.
+ENGAGEMENT_COUNTER_BUFFERING = False
+COUNTER_CACHE_ALIAS = 'default'
+COUNTER_FLUSH_INTERVAL = 10
+
+# Browser/CDN freshness for /api/v1/settings/public/; clients revalidate with its ETag afterwards
+PUBLIC_SETTINGS_MAX_AGE = 60
+
+# Tax charged on checkout subtotals (see mytribe/checkout.py), e.g. '0.20' for 20%
+CHECKOUT_TAX_RATE = os.environ.get('CHECKOUT_TAX_RATE', '0')
+
+# Background workers resizing uploads into WebP derivatives (see mytribe/images.py).
+# Set IMAGE_DERIVATIVES_SYNC to build them inline after commit instead, e.g. in tests.
+IMAGE_WORKERS = 2
+IMAGE_DERIVATIVES_SYNC = False
+
+# Section landing snapshots are rebuilt on content/config writes; this bounds how stale their counters get
+LANDING_SNAPSHOT_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -124,14 +202,40 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that builds request.user from the token (see mytribe/authentication.py)
+        'mytribe.authentication.SnapshotJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    # Sliding-window login limits (see mytribe/throttles.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_account': '10/min',
+    },
 }
 
+# Login password checks run on a bounded pool (see mytribe/backends.py); beyond
+# PASSWORD_HASH_QUEUE in-flight checks, logins are answered 503 with Retry-After
+PASSWORD_HASH_WORKERS = os.cpu_count() or 2
+PASSWORD_HASH_QUEUE = 64
+PASSWORD_HASH_TIMEOUT = 10
+
+# Access tokens carry a user snapshot checked against CustomUser.token_version.
+# The version, permission flags (and the cached `me` payload) are cached for this
+# many seconds, and rewritten on every save or delete of the user. Without
+# REDIS_URL that rewrite is per process: other workers see a revocation or
+# demotion only once their copy expires (check --deploy warns, authentication.W001).
+AUTH_SNAPSHOT_TIMEOUT = 60
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'mytribe.authentication.SnapshotTokenRefreshSerializer',
+}
+
+# UserRole.permissions are compiled into per-process bitsets (see mytribe/permissions.py).
+# Other processes pick up a saved role within this many seconds.
+ROLE_PERMISSION_RECHECK = 5
+
 # settings.py
 AUTHENTICATION_BACKENDS = [
     'mytribe.backends.EmailBackend',  # Add this
@@ -3,8 +3,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.db.models import Count
 from django.utils.html import format_html
 from .models import *
+from .generic import prefetch_content_object
 
 # ===============================================
 # INLINES
@@ -166,8 +168,8 @@ class BaseContentAdmin(admin.ModelAdmin):
 
 @admin.register(Post)
 class PostAdmin(BaseContentAdmin):
-    list_display = ['title', 'author', 'category', 'likes', 'comments_count', 'shares', 'created_at']
-    list_filter = ['category', 'author', 'created_at']
+    list_display = ['title', 'author', 'category', 'kind', 'likes', 'comments_count', 'shares', 'created_at']
+    list_filter = ['kind', 'category', 'author', 'created_at']
     search_fields = ['title', 'description', 'author__username']
     inlines = [CommentInline]
     
@@ -249,6 +251,7 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ['timestamp', 'author']
     search_fields = ['author__username', 'text']
     readonly_fields = ['timestamp']
+    list_select_related = ['author', 'parent__author']
     
     fieldsets = [
         ('Comment Content', {
@@ -264,6 +267,9 @@ class CommentAdmin(admin.ModelAdmin):
         })
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(prefetch_content_object())
+
     def text_preview(self, obj):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     text_preview.short_description = 'Text'
@@ -274,6 +280,7 @@ class FeaturedContentAdmin(admin.ModelAdmin):
     list_filter = ['section__section_id']
     search_fields = ['section__title']
     list_editable = ['order']
+    list_select_related = ['section']
     
     fieldsets = [
         ('Featured Content Configuration', {
@@ -285,6 +292,19 @@ class FeaturedContentAdmin(admin.ModelAdmin):
         })
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(prefetch_content_object())
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ['content_type', 'object_id', 'created_at']
+    list_filter = ['content_type']
+    readonly_fields = ['content_type', 'object_id', 'created_at', 'summary']
+
+    def has_add_permission(self, request):
+        # Entries are maintained by signals and the rebuild_feed command
+        return False
+
 # ===============================================
 # E-COMMERCE ADMINS
 # ===============================================
@@ -302,6 +322,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['order_date']
     inlines = [OrderItemInline]
+    list_select_related = ['user']
     
     fieldsets = [
         ('Order Information', {
@@ -312,9 +333,13 @@ class OrderAdmin(admin.ModelAdmin):
         })
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(item_total=Count('items'))
+
     def item_count(self, obj):
-        return obj.items.count()
+        return obj.item_total
     item_count.short_description = 'Items'
+    item_count.admin_order_field = 'item_total'
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -322,6 +347,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ['item_type', 'order__order_date']
     search_fields = ['name', 'order__user__username']
     readonly_fields = ['order']
+    list_select_related = ['order__user']
     
     fieldsets = [
         ('Item Details', {
@@ -332,5 +358,34 @@ class OrderItemAdmin(admin.ModelAdmin):
         })
     ]
 
+# ===============================================
+# ANALYTICS ADMINS
+# ===============================================
+
+class RollupAdmin(admin.ModelAdmin):
+    """Rollups are maintained by mytribe.analytics; the admin only browses them"""
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(RollupAdmin):
+    list_display = ['date', 'order_count', 'subtotal', 'tax', 'revenue']
+
+@admin.register(ItemSalesRollup)
+class ItemSalesRollupAdmin(RollupAdmin):
+    list_display = ['date', 'item_type', 'units', 'revenue']
+    list_filter = ['item_type']
+
+@admin.register(MemberSignupRollup)
+class MemberSignupRollupAdmin(RollupAdmin):
+    list_display = ['date', 'membership_tier', 'new_members']
+    list_filter = ['membership_tier']
+    list_select_related = ['membership_tier']
+
 # Register the custom user admin
 admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
@@ -0,0 +1,201 @@
+# mytribe/analytics.py
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+from django.utils import timezone
+
+from .models import (
+    CustomUser, ItemSalesRollup, MemberSignupRollup, Order, OrderItem, RollupDirtyDay, SalesRollup,
+)
+
+# ===============================================
+# DIRTY DAYS
+# ===============================================
+# Writes to orders, order items and members mark their calendar day dirty (see
+# signals.py). refresh_dirty() rebuilds only those days from the raw tables, so
+# keeping the rollups current costs one day's aggregation per changed day.
+# Days are in the current time zone (settings.TIME_ZONE).
+
+def local_date(value):
+    return timezone.localdate(value)
+
+
+def mark_dirty(*dates):
+    """Flag days whose rollups need rebuilding"""
+    now = timezone.now()
+    RollupDirtyDay.objects.bulk_create(
+        [RollupDirtyDay(date=date, marked_at=now) for date in set(dates)],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=['marked_at'],
+    )
+
+
+def mark_dirty_on_commit(*dates):
+    """
+    Mark once the current transaction commits. Every write on a busy day upserts
+    the same marker row, so marking after commit keeps that row lock out of
+    the writer's transaction.
+    """
+    transaction.on_commit(lambda: mark_dirty(*dates))
+
+
+def refresh_dirty():
+    """
+    Rebuild every day currently marked dirty. Each day is rebuilt in its own
+    transaction while its marker row is locked. A marker being written
+    concurrently is skipped and picked up on the next run. Returns the number of
+    days rebuilt.
+    """
+    started = timezone.now()
+    dates = list(RollupDirtyDay.objects.filter(marked_at__lte=started).order_by('date').values_list('date', flat=True))
+    refreshed = 0
+    for date in dates:
+        with transaction.atomic():
+            marker = (RollupDirtyDay.objects
+                      .select_for_update(skip_locked=True)
+                      .filter(date=date, marked_at__lte=started)
+                      .first())
+            if marker is None:
+                continue
+            rebuild_range(date, date + datetime.timedelta(days=1))
+            marker.delete()
+            refreshed += 1
+    return refreshed
+
+# ===============================================
+# BUILDING ROLLUPS
+# ===============================================
+
+def day_bounds(start, end):
+    """Aware datetimes covering the local days [start, end)"""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.datetime.combine(start, datetime.time.min), tz),
+        timezone.make_aware(datetime.datetime.combine(end, datetime.time.min), tz),
+    )
+
+
+def rebuild_range(start, end):
+    """Replace the rollups for days [start, end) with fresh aggregates of the raw tables"""
+    since, until = day_bounds(start, end)
+
+    orders = (Order.objects
+              .filter(order_date__gte=since, order_date__lt=until)
+              .annotate(day=TruncDate('order_date'))
+              .order_by()
+              .values('day')
+              .annotate(order_count=Count('id'), subtotal_sum=Sum('subtotal'), tax_sum=Sum('tax'), revenue=Sum('total')))
+    items = (OrderItem.objects
+             .filter(order__order_date__gte=since, order__order_date__lt=until)
+             .annotate(day=TruncDate('order__order_date'))
+             .order_by()
+             .values('day', 'item_type')
+             .annotate(units=Sum('quantity'),
+                       revenue=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))))
+    members = (CustomUser.objects
+               .filter(date_joined__gte=since, date_joined__lt=until)
+               .annotate(day=TruncDate('date_joined'))
+               .order_by()
+               .values('day', 'membership_tier')
+               .annotate(new_members=Count('id')))
+
+    with transaction.atomic():
+        for model in (SalesRollup, ItemSalesRollup, MemberSignupRollup):
+            model.objects.filter(date__gte=start, date__lt=end).delete()
+        SalesRollup.objects.bulk_create([
+            SalesRollup(date=row['day'], order_count=row['order_count'], subtotal=row['subtotal_sum'],
+                        tax=row['tax_sum'], revenue=row['revenue'])
+            for row in orders
+        ])
+        ItemSalesRollup.objects.bulk_create([
+            ItemSalesRollup(date=row['day'], item_type=row['item_type'], units=row['units'], revenue=row['revenue'])
+            for row in items
+        ])
+        MemberSignupRollup.objects.bulk_create([
+            MemberSignupRollup(date=row['day'], membership_tier_id=row['membership_tier'], new_members=row['new_members'])
+            for row in members
+        ])
+
+
+def backfill(start=None, end=None, chunk_days=31, stdout=None):
+    """
+    Rebuild rollups for [start, end] (inclusive; defaults to all history through
+    today) one chunk of days at a time, so memory is bounded by a chunk's
+    aggregate rows rather than the raw table sizes.
+    """
+    if start is None:
+        earliest = [value for value in (
+            Order.objects.aggregate(first=Min('order_date'))['first'],
+            CustomUser.objects.aggregate(first=Min('date_joined'))['first'],
+        ) if value is not None]
+        if not earliest:
+            return 0
+        start = local_date(min(earliest))
+    if end is None:
+        end = timezone.localdate()
+
+    days = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + datetime.timedelta(days=chunk_days), end + datetime.timedelta(days=1))
+        rebuild_range(chunk_start, chunk_end)
+        days += (chunk_end - chunk_start).days
+        if stdout is not None:
+            stdout.write(f"{chunk_start} .. {chunk_end - datetime.timedelta(days=1)} rebuilt")
+        chunk_start = chunk_end
+    return days
+
+# ===============================================
+# REPORTING
+# ===============================================
+
+# metric -> (rollup model, summed columns, allowed group_by columns)
+METRICS = {
+    'sales': (SalesRollup, ('order_count', 'subtotal', 'tax', 'revenue'), ()),
+    'items': (ItemSalesRollup, ('units', 'revenue'), ('item_type',)),
+    'members': (MemberSignupRollup, ('new_members',), ('membership_tier',)),
+}
+
+GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+
+def report(metric, start, end, granularity='day', group_by=None):
+    """
+    Sum a metric's rollups over [start, end] (inclusive) per period, optionally
+    split by one of the metric's group_by columns. Reads the rollup tables only.
+    """
+    model, columns, _ = METRICS[metric]
+    truncate = GRANULARITIES[granularity]
+    period = F('date') if truncate is None else truncate('date')
+    groups = [group_by] if group_by else []
+
+    rows = (model.objects
+            .filter(date__gte=start, date__lte=end)
+            .order_by()
+            .values(*groups, period=period)
+            .annotate(**{f'{column}_sum': Sum(column) for column in columns})
+            .order_by('period', *groups))
+    # Money sums are rendered as fixed-point strings, as DRF's DecimalField does,
+    # so JSON clients never see them as floats
+    places = {column: model._meta.get_field(column).decimal_places
+              for column in columns if isinstance(model._meta.get_field(column), DecimalField)}
+
+    def total(column, value):
+        return f'{value:.{places[column]}f}' if column in places and value is not None else value
+
+    # Sums are aliased because an annotation may not shadow a model field
+    return [
+        {**{key: value for key, value in row.items() if not key.endswith('_sum')},
+         **{column: total(column, row[f'{column}_sum']) for column in columns}}
+        for row in rows
+    ]
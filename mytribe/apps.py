@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MytribeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mytribe'
+
+    def ready(self):
+        from . import replicas, signals  # noqa: F401
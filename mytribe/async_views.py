@@ -0,0 +1,259 @@
+# mytribe/async_views.py
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import authentication, cache, counters, permissions, replicas, threads
+from .backends import HashingBusy, afind_user, averify_password
+from .models import Comment, CustomUser
+from .pagination import CommentPagination
+from .serializers import CommentSerializer, UserProfileSerializer
+from .views import (
+    HASHING_BUSY, INVALID_CREDENTIALS, LOGIN_THROTTLES, PUBLIC_SETTINGS_LABEL, BusinessViewSet, EventViewSet,
+    PostViewSet, build_public_settings, login_payload, snapshot_response,
+)
+
+# ===============================================
+# ASYNC READ PATH
+# ===============================================
+# Native coroutine views for the hottest reads, so an ASGI server serves them
+# without a thread-pool hop per request. They reuse the DRF viewsets' queryset
+# building, sparse fieldsets, role checks, serializers and conditional GET
+# (ETag, Last-Modified, 304), but every query goes through the async ORM and
+# every cache read through the async cache API; serializers only ever see rows
+# that are already fully loaded. Routed
+# under /api/v1/async/ with the same responses as their sync counterparts,
+# alongside a login that awaits the password hashing pool.
+
+CONTENT_VIEWSETS = {
+    'posts': PostViewSet,
+    'events': EventViewSet,
+    'businesses': BusinessViewSet,
+}
+
+jwt_authentication = authentication.SnapshotJWTAuthentication()
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def json_response(data, status=200):
+    return HttpResponse(render(data), status=status, content_type='application/json')
+
+
+def error_response(request, exc):
+    """Render an APIException as DRF's exception handler would"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = jwt_authentication.authenticate_header(request)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+async def authenticate(request):
+    """Bearer token first, then the session, as the DRF authentication classes do"""
+    result = await jwt_authentication.aauthenticate(request)
+    if result is not None:
+        return result[0]
+    user = await request.auser() if hasattr(request, 'auser') else AnonymousUser()
+    return user if user.is_active else AnonymousUser()
+
+
+def api_get(authenticated=True):
+    """GET-only async endpoint that sets request.user and turns APIExceptions into responses"""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                response = json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                response['Allow'] = 'GET, HEAD'
+                return response
+            try:
+                request.user = await authenticate(request) if authenticated else AnonymousUser()
+                return await view_func(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+        return wrapper
+    return decorator
+
+
+def bind(viewset_class, request, action, **kwargs):
+    """A viewset instance for one action, used for its querysets, permissions and serializers only"""
+    drf_request = Request(request)
+    drf_request.user = request.user
+    # Async views always answer JSON
+    drf_request.accepted_renderer = JSONRenderer()
+    drf_request.accepted_media_type = JSONRenderer.media_type
+    # Extra actions carry initkwargs (e.g. their permission_classes), as the router applies them
+    initkwargs = getattr(getattr(viewset_class, action, None), 'kwargs', {})
+    return viewset_class(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None, **initkwargs)
+
+
+def not_found(view):
+    """The 404 get_object_or_404() would raise"""
+    return exceptions.NotFound(f'No {view.get_queryset().model._meta.object_name} matches the given query.')
+
+
+def authorize(view, obj=None):
+    """The view's permission checks, answering anonymous callers with 401 as DRF does"""
+    try:
+        if obj is None:
+            view.check_permissions(view.request)
+        else:
+            view.check_object_permissions(view.request, obj)
+    except exceptions.PermissionDenied:
+        if not view.request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        raise
+
+
+async def content_type_for(model):
+    """ContentType for a model; only the first lookup in a process leaves the event loop"""
+    try:
+        return ContentType.objects._get_from_cache(model._meta)
+    except KeyError:
+        return await sync_to_async(ContentType.objects.get_for_model)(model)
+
+# ===============================================
+# LOGIN
+# ===============================================
+
+@csrf_exempt
+async def login(request):
+    """POST /api/v1/async/auth/login/, awaiting the password hashing pool rather than holding a thread"""
+    if request.method != 'POST':
+        response = json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        response['Allow'] = 'POST'
+        return response
+    drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+    try:
+        for throttle in (throttle_class() for throttle_class in LOGIN_THROTTLES):
+            if not throttle.allow_request(drf_request, None):
+                raise exceptions.Throttled(throttle.wait())
+        email = drf_request.data.get('email')
+        password = drf_request.data.get('password')
+    except exceptions.APIException as exc:
+        return error_response(request, exc)
+    if not isinstance(email, str) or not isinstance(password, str):
+        return json_response(INVALID_CREDENTIALS, status=401)
+
+    # Unknown users still pay for one hash, so both failures look the same
+    user = await afind_user(email)
+    try:
+        password_ok = await averify_password(user, password)
+    except HashingBusy:
+        response = json_response(HASHING_BUSY, status=503)
+        response['Retry-After'] = '1'
+        return response
+
+    if password_ok and user.is_active:
+        return json_response(login_payload(user))
+    return json_response(INVALID_CREDENTIALS, status=401)
+
+# ===============================================
+# CONTENT
+# ===============================================
+
+@replicas.replica_reads
+@api_get()
+async def content_list(request, collection):
+    """GET /api/v1/async/<posts|events|businesses>/"""
+    view = bind(CONTENT_VIEWSETS[collection], request, 'list')
+    await permissions.aprepare()
+    authorize(view)
+
+    async def build():
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        await counters.amerge_pending(page)
+        return render(paginator.get_paginated_response(view.get_serializer(page, many=True).data).data)
+
+    return await cache.aconditional_response(view, build)
+
+
+@replicas.replica_reads
+@api_get()
+async def content_detail(request, collection, pk):
+    """GET /api/v1/async/<posts|events|businesses>/<id>/"""
+    view = bind(CONTENT_VIEWSETS[collection], request, 'retrieve', pk=pk)
+    await permissions.aprepare()
+    authorize(view)
+
+    async def build():
+        obj = await view.filter_queryset(view.get_queryset()).filter(pk=pk).afirst()
+        if obj is None:
+            raise not_found(view)
+        authorize(view, obj)
+        await counters.amerge_pending([obj])
+        return render(view.get_serializer(obj).data)
+
+    return await cache.aconditional_response(view, build)
+
+
+@replicas.replica_reads
+@api_get()
+async def content_comments(request, collection, pk):
+    """GET /api/v1/async/<posts|events|businesses>/<id>/comments/, paged and threaded like the sync action"""
+    view = bind(CONTENT_VIEWSETS[collection], request, 'comments', pk=pk)
+    await permissions.aprepare()
+    authorize(view)
+
+    obj = await view.get_queryset().only(*view.always_load).filter(pk=pk).afirst()
+    if obj is None:
+        raise not_found(view)
+    authorize(view, obj)
+
+    content_type = await content_type_for(type(obj))
+    roots = threads.with_reply_flag(
+        Comment.objects.filter(content_type=content_type, object_id=obj.pk, depth=0).select_related('author')
+    )
+    paginator = CommentPagination()
+    page = await paginator.apaginate_queryset(roots, view.request, view=view)
+    params = view.request.query_params
+    await threads.aattach_replies(
+        page,
+        depth=threads.bounded_int(params.get('depth'), threads.DEFAULT_DEPTH, threads.MAX_DEPTH),
+        replies=threads.bounded_int(params.get('replies'), threads.DEFAULT_REPLIES, threads.MAX_REPLIES, minimum=1),
+    )
+    serializer = CommentSerializer(page, many=True, context={'request': view.request})
+    return json_response(paginator.get_paginated_response(serializer.data).data)
+
+# ===============================================
+# SETTINGS AND PROFILE
+# ===============================================
+
+@api_get(authenticated=False)
+async def public_settings(request):
+    """GET /api/v1/async/settings/public/"""
+    payload = await cache.aget_or_build(PUBLIC_SETTINGS_LABEL, 'public-settings', build_public_settings)
+    if payload is None:
+        return json_response({'error': 'Platform not configured'}, status=404)
+    return snapshot_response(request, payload)
+
+
+@api_get()
+async def me(request):
+    """GET /api/v1/async/users/me/"""
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    drf_request = Request(request)
+    drf_request.user = request.user
+
+    async def build():
+        user = await CustomUser.objects.aget(pk=request.user.pk)
+        return UserProfileSerializer(user, context={'request': drf_request}).data
+
+    return json_response(await authentication.acached_profile(drf_request, build))
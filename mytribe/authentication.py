@@ -0,0 +1,264 @@
+# mytribe/authentication.py
+
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import cache
+from .models import CustomUser
+
+# ===============================================
+# USER SNAPSHOTS
+# ===============================================
+# Access tokens carry the few user columns that permission checks read
+# (claim -> field below). Authentication rebuilds a deferred CustomUser from
+# them, so an authenticated request costs no user query; any other attribute
+# is loaded on first access. The token's version must still match the user's
+# token_version, which is read through a short-lived cache entry that every
+# save or delete of the user rewrites. Bumping token_version (password change),
+# deactivating or deleting the account therefore revokes outstanding tokens
+# on the next request. The same entry carries the current staff, superuser,
+# role and tier columns, which override the token's copies, so a demotion
+# takes effect on the next request too.
+#
+# The entry lives in the default cache. With the per-process LocMemCache a
+# save is only seen by the process that made it; the others notice when their
+# copy expires, up to AUTH_SNAPSHOT_TIMEOUT seconds later. Set REDIS_URL
+# wherever more than one process serves requests; `check --deploy` warns
+# (authentication.W001) when it is missing.
+
+SNAPSHOT_CLAIMS = {
+    'ver': 'token_version',
+    'staff': 'is_staff',
+    'su': 'is_superuser',
+    'role': 'role_id',
+    'tier': 'membership_tier_id',
+}
+
+# Columns whose current value comes from the version state rather than the token
+STATE_FIELDS = ('is_staff', 'is_superuser', 'role_id', 'membership_tier_id')
+
+STATE_PREFIX = 'auth:state'
+PROFILE_PREFIX = 'auth:me'
+
+
+def snapshot_timeout():
+    return getattr(settings, 'AUTH_SNAPSHOT_TIMEOUT', 60)
+
+
+def stamp(token, user):
+    """Copy the user's snapshot claims onto a token"""
+    for claim, field in SNAPSHOT_CLAIMS.items():
+        token[claim] = getattr(user, field)
+    return token
+
+
+def tokens_for_user(user):
+    """A refresh token whose access tokens carry the user's snapshot"""
+    return stamp(RefreshToken.for_user(user), user)
+
+
+def snapshot_user(user_id, token, flags=None):
+    """
+    A CustomUser holding only the token's snapshot fields, with STATE_FIELDS
+    taken from `flags` when given; the rest are deferred
+    """
+    known = {'id': CustomUser._meta.pk.to_python(user_id), 'is_active': True}
+    for claim, field in SNAPSHOT_CLAIMS.items():
+        known[field] = token[claim]
+    if flags is not None:
+        known.update(zip(STATE_FIELDS, flags))
+    # from_db() expects the values in concrete field order
+    names = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in known]
+    return CustomUser.from_db(router.db_for_read(CustomUser), names, [known[name] for name in names])
+
+
+def full_user(user):
+    """The complete row for a snapshot user, for code that renders or saves the whole profile"""
+    if not user.get_deferred_fields():
+        return user
+    return CustomUser.objects.get(pk=user.pk)
+
+# ===============================================
+# VERSION STATE
+# ===============================================
+# state = (token_version, is_active, flags, stamp), flags being the STATE_FIELDS
+# values; a missing user is (None, False, None, stamp). The stamp changes
+# whenever the entry is rewritten, which retires the cached `me` payload built
+# under the previous one.
+
+STATE_COLUMNS = ('token_version', 'is_active', *STATE_FIELDS)
+
+
+def state_key(user_id):
+    return f'{STATE_PREFIX}:{user_id}'
+
+
+def state_from_row(row):
+    """State from a STATE_COLUMNS row, or None for a missing user"""
+    if row is None:
+        return (None, False, None, cache.fresh_generation())
+    return (row[0], row[1], tuple(row[2:]), cache.fresh_generation())
+
+
+def state_row(user):
+    return tuple(getattr(user, column) for column in STATE_COLUMNS)
+
+
+def get_state(user_id):
+    store = cache.get_cache()
+    key = state_key(user_id)
+    state = store.get(key)
+    if state is None:
+        state = state_from_row(CustomUser.objects.filter(pk=user_id).values_list(*STATE_COLUMNS).first())
+        # add(), not set(): a save that committed meanwhile has already written newer state
+        if not store.add(key, state, snapshot_timeout()):
+            state = store.get(key) or state
+    return state
+
+
+async def aget_state(user_id):
+    """get_state() for async views"""
+    store = cache.get_cache()
+    key = state_key(user_id)
+    state = await store.aget(key)
+    if state is None:
+        state = state_from_row(await CustomUser.objects.filter(pk=user_id).values_list(*STATE_COLUMNS).afirst())
+        if not await store.aadd(key, state, snapshot_timeout()):
+            state = await store.aget(key) or state
+    return state
+
+
+def save_state(user_id, row):
+    cache.get_cache().set(state_key(user_id), state_from_row(row), snapshot_timeout())
+
+
+def publish_on_commit(user_id, row=None):
+    """Write a saved user's state (a state_row(), or None once deleted) when the write commits"""
+    transaction.on_commit(lambda: save_state(user_id, row))
+
+
+def forget(user_id):
+    """Drop the cached state, e.g. after a queryset update() that sent no signal"""
+    cache.get_cache().delete(state_key(user_id))
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_state_cache(app_configs=None, **kwargs):
+    if isinstance(cache.get_cache(), LocMemCache):
+        return [checks.Warning(
+            "Token revocation state is kept in a per-process LocMemCache, so other workers keep accepting "
+            "a revoked token for up to AUTH_SNAPSHOT_TIMEOUT seconds.",
+            hint="Set REDIS_URL (or another shared CACHES['default']) when more than one process serves requests.",
+            id='authentication.W001',
+        )]
+    return []
+
+# ===============================================
+# AUTHENTICATION
+# ===============================================
+
+class SnapshotJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token's user snapshot once its version checks out"""
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in SNAPSHOT_CLAIMS):
+            # Issued before tokens carried snapshots: load the user, treating it as version 0
+            user = super().get_user(validated_token)
+            if user.token_version != 0:
+                raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+            return user
+
+        user_id = self.get_user_id(validated_token)
+        return self.check_state(user_id, validated_token, get_state(user_id))
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views, on a plain HttpRequest"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if any(claim not in validated_token for claim in SNAPSHOT_CLAIMS):
+            return await sync_to_async(self.get_user)(validated_token), validated_token
+        user_id = self.get_user_id(validated_token)
+        return self.check_state(user_id, validated_token, await aget_state(user_id)), validated_token
+
+    def get_user_id(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise AuthenticationFailed('Token contained no recognizable user identification', code='token_not_valid')
+        return user_id
+
+    def check_state(self, user_id, validated_token, state):
+        token_version, is_active, flags, _ = state
+        if token_version is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token['ver'] != token_version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return snapshot_user(user_id, validated_token, flags)
+
+
+class SnapshotTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-read the user on refresh, so revoked refresh tokens are refused and new
+    access tokens carry the user's current flags rather than those at login.
+    Refresh token rotation is not supported.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = CustomUser.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if (user is None or not api_settings.USER_AUTHENTICATION_RULE(user)
+                or refresh.payload.get('ver', 0) != user.token_version):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        return {'access': str(stamp(refresh.access_token, user))}
+
+# ===============================================
+# PROFILE CACHE
+# ===============================================
+
+def profile_key(request, generation):
+    # Image fields render absolute URLs, so the host is part of the key
+    host = hashlib.sha1(request.get_host().encode()).hexdigest()[:12]
+    return f'{PROFILE_PREFIX}:{request.user.pk}:{generation}:{host}'
+
+
+def cached_profile(request, builder):
+    """
+    The current user's serialized `me` payload, cached for AUTH_SNAPSHOT_TIMEOUT
+    under the user's state stamp.
+    """
+    *_, generation = get_state(request.user.pk)
+    key = profile_key(request, generation)
+    store = cache.get_cache()
+    payload = store.get(key)
+    if payload is None:
+        payload = builder()
+        store.set(key, payload, snapshot_timeout())
+    return payload
+
+
+async def acached_profile(request, builder):
+    """cached_profile() for async views; `builder` is a coroutine function"""
+    *_, generation = await aget_state(request.user.pk)
+    key = profile_key(request, generation)
+    store = cache.get_cache()
+    payload = await store.aget(key)
+    if payload is None:
+        payload = await builder()
+        await store.aset(key, payload, snapshot_timeout())
+    return payload
+
@@ -1,18 +1,141 @@
 # mytribe/backends.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db import close_old_connections
+from django.db.models.functions import Lower
+
+# ===============================================
+# USER LOOKUP
+# ===============================================
+
+def user_lookup(identifier):
+    """
+    The single indexed lookup for a login identifier: identifiers containing
+    '@' are matched against LOWER(email), which is backed by the
+    customuser_email_ci_unique index, anything else by username.
+    """
+    UserModel = get_user_model()
+    if not identifier:
+        return None
+    if '@' in identifier:
+        return (UserModel.objects
+                .exclude(email='')
+                .alias(email_lower=Lower('email'))
+                .filter(email_lower=identifier.strip().lower()))
+    return UserModel.objects.filter(**{UserModel.USERNAME_FIELD: identifier})
+
+
+def find_user(identifier):
+    """Fetch a user by email (case-insensitive) or username"""
+    queryset = user_lookup(identifier)
+    return queryset.first() if queryset is not None else None
+
+
+async def afind_user(identifier):
+    """find_user() for async views"""
+    queryset = user_lookup(identifier)
+    return await queryset.afirst() if queryset is not None else None
+
+# ===============================================
+# PASSWORD VERIFICATION POOL
+# ===============================================
+# Password hashing is deliberately slow. Verifications run on a small dedicated
+# pool (hashlib releases the GIL while hashing), and at most
+# PASSWORD_HASH_QUEUE of them may be queued or running at once, so a burst of
+# logins fails fast instead of piling up. The sync login still parks its
+# request thread until the hash is done; the async login awaits the pool, so
+# under ASGI no thread is held per login in flight.
+
+class HashingBusy(Exception):
+    """Too many password verifications are already in flight"""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+def get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 2),
+                thread_name_prefix='password-hash',
+            )
+            _slots = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_HASH_QUEUE', 32))
+    return _executor
+
+
+def _check(user, password):
+    try:
+        if user is None:
+            # Same cost as a real check: hash the candidate with the default hasher
+            get_user_model()().set_password(password)
+            return False
+        # check_password may upgrade the stored hash and save the user
+        return user.check_password(password)
+    finally:
+        close_old_connections()
+
+
+def submit_check(user, password):
+    """Queue a password check on the hashing pool; raises HashingBusy when it is saturated"""
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = executor.submit(_check, user, password)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot is held until the hash finishes, even if we stop waiting for it
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def verify_password(user, password):
+    """
+    Check a password on the hashing pool. A missing user still costs one run of
+    the default hasher, so unknown accounts take as long to reject as wrong
+    passwords. Raises HashingBusy when the pool is saturated.
+    """
+    future = submit_check(user, password)
+    try:
+        return future.result(timeout=getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10))
+    except TimeoutError:
+        raise HashingBusy()
+
+
+async def averify_password(user, password):
+    """verify_password() that awaits the hashing pool instead of blocking a thread"""
+    future = submit_check(user, password)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10))
+    except asyncio.TimeoutError:
+        raise HashingBusy()
+
+# ===============================================
+# AUTHENTICATION BACKEND
+# ===============================================
 
 class EmailBackend(ModelBackend):
+    """Authenticate with either the username or the (case-insensitive) email address"""
     def authenticate(self, request, username=None, password=None, **kwargs):
-        UserModel = get_user_model()
-        try:
-            user = UserModel.objects.get(
-                Q(username=username) | Q(email=username)
-            )
-        except UserModel.DoesNotExist:
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = find_user(username)
+        if user is None:
+            # Run the hasher anyway so unknown users are not distinguishable by timing
+            get_user_model()().set_password(password)
             return None
-        
-        if user.check_password(password):
+        if user.check_password(password) and self.user_can_authenticate(user):
             return user
-        return None
\ No newline at end of file
+        return None
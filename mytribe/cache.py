@@ -0,0 +1,386 @@
+# mytribe/cache.py
+
+import contextlib
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from . import replicas
+
+# ===============================================
+# GENERATION COUNTERS
+# ===============================================
+# Every cached response key embeds the current generation of the models it
+# depends on. A write bumps the generation, so invalidation is a single INCR
+# and older entries simply stop being addressed until they expire.
+
+GENERATION_PREFIX = 'gen'
+METRICS_PREFIX = 'metrics:response-cache'
+CACHE_HEADER = 'X-Cache'
+BYPASS_HEADER = 'X-Cache-Bypass'
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def generation_key(label):
+    return f'{GENERATION_PREFIX}:{label}'
+
+
+def fresh_generation():
+    # Seeded from the clock so an evicted counter never restarts at a value
+    # that older cache entries were written under
+    return time.time_ns() // 1000
+
+
+def get_generations(labels):
+    cache = get_cache()
+    keys = [generation_key(label) for label in labels]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, fresh_generation(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+async def aget_generations(labels):
+    """get_generations() for async views"""
+    cache = get_cache()
+    keys = [generation_key(label) for label in labels]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, fresh_generation(), timeout=None)
+            found[key] = await cache.aget(key)
+    return [found[key] for key in keys]
+
+
+def bump(label):
+    """Invalidate every cached response that depends on the given model label"""
+    cache = get_cache()
+    try:
+        cache.incr(generation_key(label))
+    except ValueError:
+        cache.set(generation_key(label), fresh_generation(), timeout=None)
+
+
+def bump_on_commit(label):
+    """Bump once the current transaction commits, so readers never re-cache pre-commit rows"""
+    transaction.on_commit(lambda: bump(label))
+
+
+def get_or_build(label, name, builder, timeout=None):
+    """
+    Fetch a precomputed value stored under the label's current generation,
+    building and storing it on a miss. A bump of the label retires the value.
+    """
+    cache = get_cache()
+    generation, = get_generations([label])
+    key = f'{name}:{generation}'
+    value = cache.get(key)
+    if value is None:
+        with replicas.use_primary():
+            value = builder()
+        cache.set(key, value, timeout)
+    return value
+
+
+async def aget_or_build(label, name, builder, timeout=None):
+    """get_or_build() for async views; the (synchronous) builder runs in a worker thread on a miss"""
+    cache = get_cache()
+    generation, = await aget_generations([label])
+    key = f'{name}:{generation}'
+    value = await cache.aget(key)
+    if value is None:
+        with replicas.use_primary():
+            value = await sync_to_async(builder)()
+        await cache.aset(key, value, timeout)
+    return value
+
+# ===============================================
+# METRICS
+# ===============================================
+
+def record(outcome):
+    cache = get_cache()
+    key = f'{METRICS_PREFIX}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def arecord(outcome):
+    cache = get_cache()
+    key = f'{METRICS_PREFIX}:{outcome}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+def stats():
+    cache = get_cache()
+    outcomes = ('hit', 'miss', 'bypass')
+    found = cache.get_many([f'{METRICS_PREFIX}:{outcome}' for outcome in outcomes])
+    counts = {outcome: found.get(f'{METRICS_PREFIX}:{outcome}', 0) for outcome in outcomes}
+    lookups = counts['hit'] + counts['miss']
+    counts['hit_ratio'] = round(counts['hit'] / lookups, 4) if lookups else None
+    return counts
+
+# ===============================================
+# VIEWSET MIXIN
+# ===============================================
+
+def build_response_key(request, generations):
+    params = sorted((k, v) for k, values in request.query_params.lists() for v in values)
+    raw = f'{request.get_host()}{request.path}?{urlencode(params)}'
+    return f"resp:{'.'.join(str(g) for g in generations)}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def response_key(request, labels):
+    return build_response_key(request, get_generations(labels))
+
+
+
+class GenerationsMixin:
+    """The generations of the models in cache_models (the viewset's own model by default), read once per request"""
+    cache_models = None
+
+    def get_cache_labels(self):
+        models = self.cache_models or [self.queryset.model]
+        return [model._meta.label_lower for model in models]
+
+    def get_label_generations(self):
+        if getattr(self, '_label_generations', None) is None:
+            self._label_generations = get_generations(self.get_cache_labels())
+        return self._label_generations
+
+
+class CachedResponseMixin(GenerationsMixin):
+    """
+    Serve anonymous list/retrieve responses from the shared cache.
+    Responses are keyed by host, path, query params and the generation of each
+    model in cache_models. Send X-Cache-Bypass: 1 to skip the cache read while
+    debugging.
+    """
+    cache_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def serves_cached_response(self, request):
+        """Whether this response goes through the shared cache (and so is built from the primary)"""
+        return (self.action in self.cache_actions
+                and not request.user.is_authenticated
+                and request.accepted_renderer.format == 'json')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.serves_cached_response(request):
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = build_response_key(request, self.get_label_generations())
+        bypass = bool(request.headers.get(BYPASS_HEADER))
+
+        if not bypass:
+            content = cache.get(key)
+            if content is not None:
+                record('hit')
+                response = HttpResponse(content, content_type='application/json')
+                response[CACHE_HEADER] = 'HIT'
+                return response
+
+        # Shared entries are built from the primary, so a lagging replica is never cached for everyone
+        with replicas.use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, JSONRenderer().render(response.data), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+
+        outcome = 'bypass' if bypass else 'miss'
+        record(outcome)
+        response[CACHE_HEADER] = outcome.upper()
+        return response
+
+async def acached_response(request, labels, build, generations=None):
+    """
+    CachedResponseMixin.cached_response() for async views. `build` is a
+    coroutine function returning the JSON body of a 200 response; errors are
+    raised, so only successful anonymous responses are cached.
+    """
+    if request.user.is_authenticated:
+        return HttpResponse(await build(), content_type='application/json')
+
+    cache = get_cache()
+    if generations is None:
+        generations = await aget_generations(labels)
+    key = build_response_key(request, generations)
+    bypass = bool(request.headers.get(BYPASS_HEADER))
+
+    if not bypass:
+        content = await cache.aget(key)
+        if content is not None:
+            await arecord('hit')
+            response = HttpResponse(content, content_type='application/json')
+            response[CACHE_HEADER] = 'HIT'
+            return response
+
+    with replicas.use_primary():
+        body = await build()
+    await cache.aset(key, body, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+
+    outcome = 'bypass' if bypass else 'miss'
+    await arecord(outcome)
+    response = HttpResponse(body, content_type='application/json')
+    response[CACHE_HEADER] = outcome.upper()
+    return response
+
+# ===============================================
+# CONDITIONAL GET
+# ===============================================
+# ETags come from the same generations as the response cache, so validating a
+# request costs no query: any committed write to the models behind a response
+# changes its ETag. Only detail bodies rendered by the view carry
+# Last-Modified (a list's MAX(updated_at) cannot see deletes);
+# If-Modified-Since alone costs one primary-key lookup of updated_at.
+
+def content_etag(request, labels, generations):
+    """ETag for a content response; the caller and query string are folded in because both change the body"""
+    user = request.user
+    caller = f"{user.pk or 0}:{getattr(user, 'role_id', None) or 0}:{int(user.is_staff)}"
+    raw = (f"{'.'.join(labels)}|{'.'.join(str(g) for g in generations)}|{caller}"
+           f"|{request.path}|{request.GET.urlencode()}")
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def needs_last_modified(request):
+    """If-Modified-Since is only consulted when there is no If-None-Match"""
+    return 'If-Modified-Since' in request.headers and 'If-None-Match' not in request.headers
+
+
+def body_last_modified(data):
+    """updated_at of a serialized detail body, if it was rendered"""
+    value = data.get('updated_at') if isinstance(data, dict) else None
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    return int(moment.timestamp()) if moment else None
+
+
+class ConditionalGetMixin(GenerationsMixin):
+    """
+    Answer If-None-Match (list and retrieve) and If-Modified-Since (retrieve)
+    with 304 before the cache or any serializer is touched.
+    """
+    conditional_actions = ('list', 'retrieve')
+    # Generations that change what a signed-in caller may see (e.g. role grants), folded into their ETags
+    caller_labels = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_etag_labels(self):
+        labels = self.get_cache_labels()
+        if self.request.user.is_authenticated:
+            labels = [*labels, *self.caller_labels]
+        return labels
+
+    def last_modified_query(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return (self.filter_queryset(self.get_queryset()).order_by()
+                .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .values_list('updated_at', flat=True))
+
+    def validator_reads(self):
+        """
+        Read validators from the database the body comes from: the primary for
+        shared cache entries, the request's replica route otherwise
+        """
+        serves_cached = getattr(self, 'serves_cached_response', None)
+        if serves_cached is not None and serves_cached(self.request):
+            return replicas.use_primary()
+        return contextlib.nullcontext()
+
+    def get_last_modified(self):
+        """updated_at of the requested row as a timestamp, or None if there is no such row"""
+        with self.validator_reads():
+            updated_at = self.last_modified_query().first()
+        return int(updated_at.timestamp()) if updated_at else None
+
+    async def aget_last_modified(self):
+        """get_last_modified() for async views"""
+        with self.validator_reads():
+            updated_at = await self.last_modified_query().afirst()
+        return int(updated_at.timestamp()) if updated_at else None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+
+        labels = self.get_etag_labels()
+        # Signed-in callers skip the response cache, so their generations are only read here
+        generations = get_generations(labels) if request.user.is_authenticated else self.get_label_generations()
+        etag = content_etag(request, labels, generations)
+        timestamp = None
+        if self.action == 'retrieve' and needs_last_modified(request):
+            timestamp = self.get_last_modified()
+            if timestamp is None:
+                return handler(request, *args, **kwargs)
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if self.action == 'retrieve' and response.status_code == 200:
+                timestamp = body_last_modified(getattr(response, 'data', None))
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+async def aconditional_response(view, build):
+    """
+    ConditionalGetMixin.conditional_response() for async views, wrapping
+    acached_response(). `view` is the bound viewset (list or retrieve).
+    """
+    request = view.request
+    # Only anonymous responses are cached, and for them these are the cache labels
+    labels = view.get_etag_labels()
+    generations = await aget_generations(labels)
+    etag = content_etag(request, labels, generations)
+    detail = view.action == 'retrieve'
+    timestamp = None
+    if detail and needs_last_modified(request):
+        timestamp = await view.aget_last_modified()
+        if timestamp is None:
+            return await acached_response(request, labels, build, generations)
+
+    response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = await acached_response(request, labels, build, generations)
+        if detail:
+            timestamp = body_last_modified(json.loads(response.content))
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
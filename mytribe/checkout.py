@@ -0,0 +1,140 @@
+# mytribe/checkout.py
+
+import hashlib
+import json
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Event, MembershipTier, Order, OrderItem
+
+# ===============================================
+# PRICING
+# ===============================================
+# Carts are priced here from MembershipTier prices and Event.ticketing['price'];
+# nothing the client sends about money is trusted.
+
+CENT = Decimal('0.01')
+ITEM_MEMBERSHIP = 'membership'
+ITEM_EVENT = 'event'
+
+
+def tax_rate():
+    return Decimal(str(getattr(settings, 'CHECKOUT_TAX_RATE', '0')))
+
+
+def event_price(event):
+    """Ticket price from the event's ticketing data, or None if it cannot be bought here"""
+    ticketing = event.ticketing if isinstance(event.ticketing, dict) else {}
+    try:
+        price = Decimal(str(ticketing['price']))
+    except (KeyError, InvalidOperation, ValueError):
+        return None
+    return price.quantize(CENT) if price.is_finite() and price >= 0 else None
+
+
+def price_cart(lines):
+    """
+    Turn validated cart lines into unsaved OrderItems plus (subtotal, tax, total).
+    Tiers and events are each loaded in one query, whatever the cart size.
+    """
+    tier_ids = {line['id'] for line in lines if line['type'] == ITEM_MEMBERSHIP}
+    event_ids = {line['id'] for line in lines if line['type'] == ITEM_EVENT}
+    tiers = MembershipTier.objects.in_bulk(tier_ids)
+    events = Event.objects.only('id', 'title', 'image_url', 'date', 'ticketing').in_bulk(event_ids)
+
+    items = []
+    errors = {}
+    for index, line in enumerate(lines):
+        if line['type'] == ITEM_MEMBERSHIP:
+            tier = tiers.get(line['id'])
+            if tier is None:
+                errors[index] = 'Unknown membership tier'
+                continue
+            annual = line.get('billing') == 'annual'
+            items.append(OrderItem(
+                name=tier.name,
+                description='Annual membership' if annual else 'Monthly membership',
+                item_type=ITEM_MEMBERSHIP,
+                price=tier.annual_price if annual else tier.monthly_price,
+                quantity=line['quantity'],
+            ))
+        else:
+            event = events.get(line['id'])
+            price = event_price(event) if event is not None else None
+            if price is None:
+                errors[index] = 'Unknown event' if event is None else 'Tickets for this event are not sold here'
+                continue
+            items.append(OrderItem(
+                name=event.title,
+                description=event.date,
+                image_url=event.image_url,
+                item_type=ITEM_EVENT,
+                price=price,
+                quantity=line['quantity'],
+            ))
+    if errors:
+        raise ValidationError({'items': errors})
+
+    subtotal = sum((item.price * item.quantity for item in items), Decimal('0')).quantize(CENT)
+    tax = (subtotal * tax_rate()).quantize(CENT, rounding=ROUND_HALF_UP)
+    return items, subtotal, tax, subtotal + tax
+
+# ===============================================
+# CHECKOUT
+# ===============================================
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different cart.'
+    default_code = 'idempotency_key_reused'
+
+
+def cart_hash(lines):
+    """Fingerprint of what a cart buys, independent of line order"""
+    normalized = sorted([line['type'], line['id'], line['quantity'], line.get('billing', '')] for line in lines)
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def replayed(order, fingerprint):
+    """The order an idempotent retry returns, if it was placed for the same cart"""
+    # Orders placed before carts were fingerprinted have no hash to compare
+    if order.cart_hash and order.cart_hash != fingerprint:
+        raise IdempotencyKeyReused()
+    return order, False
+
+
+def checkout(user, lines, idempotency_key=None):
+    """
+    Price the cart and write the order with all of its items in one transaction.
+    Returns (order, created). A repeated idempotency key returns the order the
+    first request created instead of charging again, or raises
+    IdempotencyKeyReused if that order was for a different cart.
+    """
+    fingerprint = cart_hash(lines)
+    if idempotency_key:
+        existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return replayed(existing, fingerprint)
+
+    items, subtotal, tax, total = price_cart(lines)
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=user, subtotal=subtotal, tax=tax, total=total,
+                idempotency_key=idempotency_key or None, cart_hash=fingerprint,
+            )
+            for item in items:
+                item.order = order
+            # bulk_create skips the OrderItem signals; the Order save above has
+            # already marked the day for the analytics rollups
+            OrderItem.objects.bulk_create(items)
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        if not idempotency_key:
+            raise
+        return replayed(Order.objects.get(user=user, idempotency_key=idempotency_key), fingerprint)
+    return order, True
@@ -0,0 +1,282 @@
+# mytribe/counters.py
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest, Now
+
+from . import cache as response_cache
+from . import feed
+from .models import CONTENT_MODELS, CounterFlushProgress
+
+logger = logging.getLogger(__name__)
+
+# ===============================================
+# ENGAGEMENT COUNTERS
+# ===============================================
+# likes / comments_count / shares are only ever changed through this module.
+# Direct mode applies each delta as a single UPDATE ... SET n = n + delta, so
+# concurrent writers never lose updates. Buffered mode (ENGAGEMENT_COUNTER_BUFFERING)
+# instead adds the delta to a shared-cache key and a scheduled `manage.py
+# flush_counters` folds the accumulated deltas into the rows in batches, so a
+# viral object no longer serializes every like on its row lock.
+#
+# Buffered deltas live in time buckets of COUNTER_FLUSH_INTERVAL seconds. Only
+# closed buckets are flushed, and nothing writes to a closed bucket, so a flush
+# can read and delete its keys without racing incoming increments. Each
+# bucket's CounterFlushProgress row is locked and advanced in the same
+# transaction as the UPDATEs it covers, so overlapping flushes, or a flush
+# retried after dying before it deleted its keys, skip what is already applied.
+# The newest fully flushed bucket is recorded there too, not in the evictable
+# cache, so a flush resumes where the last one finished however long ago that was.
+#
+# Every counter write also copies the new values into the rows' feed summaries
+# and bumps the model's response-cache generation.
+
+COUNTER_FIELDS = ('likes', 'comments_count', 'shares')
+KEY_PREFIX = 'counter'
+# Buckets younger than this many intervals are left for stragglers
+FLUSH_GRACE_BUCKETS = 1
+# How far back reads look for unflushed buckets
+MAX_PENDING_BUCKETS = 30
+
+
+def get_store():
+    return caches[getattr(settings, 'COUNTER_CACHE_ALIAS', 'default')]
+
+
+def buffering_enabled():
+    return getattr(settings, 'ENGAGEMENT_COUNTER_BUFFERING', False)
+
+
+def flush_interval():
+    return getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+
+
+def current_bucket():
+    return int(time.time() // flush_interval())
+
+
+def delta_key(bucket, label, pk, field):
+    return f'{KEY_PREFIX}:{bucket}:{label}:{pk}:{field}'
+
+
+def journal_key(bucket, seq):
+    return f'{KEY_PREFIX}:{bucket}:journal:{seq}'
+
+
+def journal_seq_key(bucket):
+    return f'{KEY_PREFIX}:{bucket}:journal'
+
+
+# Read-side hint only: reads skip buckets at or below it
+FLUSHED_THROUGH_KEY = f'{KEY_PREFIX}:flushed-through'
+
+# ===============================================
+# WRITES
+# ===============================================
+
+def increment(model, pk, field, delta=1):
+    """
+    Add delta to a counter on one content row and return its new value
+    (including any still-buffered deltas).
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"{field} is not an engagement counter")
+    if buffering_enabled():
+        buffer_delta(model._meta.label_lower, pk, field, delta)
+        return value(model, pk, field)
+    return apply_delta(model, pk, field, delta)
+
+
+def apply_delta(model, pk, field, delta):
+    """Apply one delta straight to the row, clamped at zero"""
+    with transaction.atomic():
+        model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, 0), 'updated_at': Now()})
+        # Still holding the row lock, so this is exactly our write
+        new_value = model.objects.filter(pk=pk).values_list(field, flat=True).first()
+        feed.refresh_counters(model, [pk], COUNTER_FIELDS)
+        response_cache.bump_on_commit(model._meta.label_lower)
+    return new_value
+
+
+def buffer_delta(label, pk, field, delta):
+    store = get_store()
+    bucket = current_bucket()
+    key = delta_key(bucket, label, pk, field)
+    # Only the writer that creates the key journals it, so each key is flushed once
+    if store.add(key, 0, timeout=None):
+        seq = incr(store, journal_seq_key(bucket))
+        store.set(journal_key(bucket, seq), (label, pk, field), timeout=None)
+    store.incr(key, delta)
+
+
+def incr(store, key, delta=1):
+    try:
+        return store.incr(key, delta)
+    except ValueError:
+        store.add(key, 0, timeout=None)
+        return store.incr(key, delta)
+
+# ===============================================
+# READS
+# ===============================================
+
+def bucket_range(flushed):
+    newest = current_bucket()
+    oldest = newest - MAX_PENDING_BUCKETS if flushed is None else max(flushed + 1, newest - MAX_PENDING_BUCKETS)
+    return range(oldest, newest + 1)
+
+
+def pending_buckets(store):
+    return bucket_range(store.get(FLUSHED_THROUGH_KEY))
+
+
+def pending_keys(model, pks, buckets):
+    label = model._meta.label_lower
+    return {
+        delta_key(bucket, label, pk, field): (pk, field)
+        for bucket in buckets
+        for pk in pks
+        for field in COUNTER_FIELDS
+    }
+
+
+def sum_pending(keys, found):
+    pending = {}
+    for key, delta in found.items():
+        pk, field = keys[key]
+        fields = pending.setdefault(pk, {})
+        fields[field] = fields.get(field, 0) + delta
+    return pending
+
+
+def pending_many(model, pks):
+    """Return {pk: {field: delta}} for buffered deltas not yet flushed to the rows"""
+    if not buffering_enabled() or not pks:
+        return {}
+    store = get_store()
+    keys = pending_keys(model, pks, pending_buckets(store))
+    return sum_pending(keys, store.get_many(list(keys)))
+
+
+async def apending_many(model, pks):
+    """pending_many() for async views"""
+    if not buffering_enabled() or not pks:
+        return {}
+    store = get_store()
+    keys = pending_keys(model, pks, bucket_range(await store.aget(FLUSHED_THROUGH_KEY)))
+    return sum_pending(keys, await store.aget_many(list(keys)))
+
+
+def value(model, pk, field):
+    """Current counter value: the row plus anything still buffered"""
+    stored = model.objects.filter(pk=pk).values_list(field, flat=True).first() or 0
+    delta = pending_many(model, [pk]).get(pk, {}).get(field, 0)
+    return max(stored + delta, 0)
+
+
+def merge_pending(instance, pending):
+    """Fold buffered deltas into an instance's counter attributes in place"""
+    deferred = instance.get_deferred_fields()
+    for field, delta in pending.get(instance.pk, {}).items():
+        if field in deferred:
+            continue
+        setattr(instance, field, max(getattr(instance, field) + delta, 0))
+    return instance
+
+
+async def amerge_pending(instances):
+    """Fold buffered deltas into already-loaded content rows, marking them so serializers skip the lookup"""
+    if not instances:
+        return instances
+    pending = await apending_many(type(instances[0]), [instance.pk for instance in instances])
+    for instance in instances:
+        merge_pending(instance, pending)
+        instance.pending_counters_merged = True
+    return instances
+
+# ===============================================
+# FLUSHING
+# ===============================================
+
+def flushed_through():
+    """The newest bucket a flush has finished, or None before the first flush"""
+    return CounterFlushProgress.objects.filter(flushed=True).aggregate(bucket=Max('bucket'))['bucket']
+
+
+def flush(batch_size=500):
+    """
+    Fold every closed bucket since the last flush into the database. Deltas for
+    the same row are coalesced into one UPDATE. Returns the number of rows updated.
+    """
+    store = get_store()
+    last_closed = current_bucket() - 1 - FLUSH_GRACE_BUCKETS
+    # Buckets before this are no longer merged into reads
+    read_window_start = current_bucket() - MAX_PENDING_BUCKETS
+    flushed = flushed_through()
+    first = read_window_start if flushed is None else flushed + 1
+
+    rows_updated = 0
+    late_buckets = 0
+    for bucket in range(first, last_closed + 1):
+        seq = store.get(journal_seq_key(bucket)) or 0
+        if seq:
+            if bucket < read_window_start:
+                late_buckets += 1
+            CounterFlushProgress.objects.get_or_create(bucket=bucket)
+            for start in range(1, seq + 1, batch_size):
+                end = min(start + batch_size - 1, seq)
+                rows_updated += flush_batch(store, bucket, start, end)
+            CounterFlushProgress.objects.filter(bucket=bucket).update(flushed=True)
+        store.delete(journal_seq_key(bucket))
+        store.set(FLUSHED_THROUGH_KEY, bucket, timeout=None)
+    if late_buckets:
+        logger.warning(
+            "Flushed %d counter bucket(s) older than the %d-bucket read window; "
+            "their deltas were missing from reads until now. Run flush_counters more often.",
+            late_buckets, MAX_PENDING_BUCKETS,
+        )
+    CounterFlushProgress.objects.update_or_create(bucket=last_closed, defaults={'flushed': True})
+    CounterFlushProgress.objects.filter(bucket__lt=read_window_start).delete()
+    return rows_updated
+
+
+def flush_batch(store, bucket, start, end):
+    """Apply journal entries start..end of one bucket unless a flush already has; returns rows updated"""
+    models_by_label = {model._meta.label_lower: model for model in CONTENT_MODELS.values()}
+    journal_keys = [journal_key(bucket, n) for n in range(start, end + 1)]
+    rows_updated = 0
+    with transaction.atomic():
+        # Serializes flushes of this bucket; whoever waits here sees the winner's progress
+        progress = CounterFlushProgress.objects.select_for_update().get(bucket=bucket)
+        first = max(start, progress.applied_through + 1)
+        if first <= end:
+            entries = list(store.get_many(journal_keys[first - start:]).values())
+            deltas = store.get_many([delta_key(bucket, *entry) for entry in entries])
+
+            coalesced = {}
+            for label, pk, field in entries:
+                delta = deltas.get(delta_key(bucket, label, pk, field), 0)
+                if delta:
+                    coalesced.setdefault((label, pk), {})[field] = delta
+
+            for (label, pk), fields in coalesced.items():
+                model = models_by_label[label]
+                updates = {field: Greatest(F(field) + delta, 0) for field, delta in fields.items()}
+                rows_updated += model.objects.filter(pk=pk).update(**updates, updated_at=Now())
+            for label in {label for label, _ in coalesced}:
+                model = models_by_label[label]
+                feed.refresh_counters(model, [pk for row_label, pk in coalesced if row_label == label], COUNTER_FIELDS)
+                response_cache.bump_on_commit(label)
+
+            progress.applied_through = end
+            progress.save(update_fields=['applied_through'])
+
+    entries = store.get_many(journal_keys).values()
+    store.delete_many(journal_keys + [delta_key(bucket, *entry) for entry in entries])
+    return rows_updated
@@ -0,0 +1,168 @@
+# mytribe/exports.py
+
+import csv
+import datetime
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import analytics
+from .models import Business, CustomUser, Event, Order, OrderItem, Post
+
+# ===============================================
+# EXPORT DEFINITIONS
+# ===============================================
+# Each export streams values_list() rows through .iterator(), which uses a
+# server-side cursor on Postgres. Memory stays at one chunk of rows plus one
+# output buffer, however large the table is.
+
+EXPORTS = {
+    'orders': {
+        'model': Order,
+        'fields': ('id', 'user_id', 'user__email', 'order_date', 'subtotal', 'tax', 'total'),
+        'date_field': 'order_date',
+        'filters': {'tier': 'user__membership_tier'},
+    },
+    'order-items': {
+        'model': OrderItem,
+        'fields': ('id', 'order_id', 'order__user_id', 'order__order_date', 'item_type', 'name', 'price', 'quantity'),
+        'date_field': 'order__order_date',
+        'filters': {'tier': 'order__user__membership_tier', 'type': 'item_type'},
+    },
+    'users': {
+        'model': CustomUser,
+        'fields': ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'is_active',
+                   'location', 'membership_tier_id', 'membership_tier__name'),
+        'date_field': 'date_joined',
+        'filters': {'tier': 'membership_tier'},
+    },
+    'posts': {
+        'model': Post,
+        'fields': ('id', 'title', 'category', 'kind', 'author_id', 'created_at', 'updated_at',
+                   'likes', 'comments_count', 'shares'),
+        'date_field': 'created_at',
+        'filters': {'type': 'kind'},
+    },
+    'events': {
+        'model': Event,
+        'fields': ('id', 'title', 'date', 'location', 'created_at', 'updated_at', 'likes', 'comments_count', 'shares'),
+        'date_field': 'created_at',
+        'filters': {},
+    },
+    'businesses': {
+        'model': Business,
+        'fields': ('id', 'name', 'category', 'address', 'created_at', 'updated_at', 'likes', 'comments_count', 'shares'),
+        'date_field': 'created_at',
+        'filters': {'type': 'category'},
+    },
+}
+
+OUTPUTS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+# Rendered lines are gathered into blocks of about this many bytes before being yielded
+BLOCK_SIZE = 64 * 1024
+
+
+def export_queryset(name, start=None, end=None, **filters):
+    """
+    Rows for an export, oldest id first. start/end are inclusive local dates;
+    other keyword filters must be listed in the export's 'filters'.
+    """
+    spec = EXPORTS[name]
+    queryset = spec['model'].objects.order_by('pk')
+    date_field = spec['date_field']
+    if start is not None:
+        since, _ = analytics.day_bounds(start, start)
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    if end is not None:
+        _, until = analytics.day_bounds(end, end + datetime.timedelta(days=1))
+        queryset = queryset.filter(**{f'{date_field}__lt': until})
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key not in spec['filters']:
+            raise ValueError(f"'{name}' cannot be filtered by {key}")
+        queryset = queryset.filter(**{spec['filters'][key]: value})
+    return queryset.values_list(*spec['fields'])
+
+# ===============================================
+# STREAMING
+# ===============================================
+
+class LineBuffer:
+    """File-like sink that hands back whatever csv.writer writes"""
+    def write(self, value):
+        return value
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow([field.replace('__', '_') for field in fields])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(fields, rows):
+    keys = [field.replace('__', '_') for field in fields]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(keys, row))) + '\n'
+
+
+def blocks(lines):
+    """Join text lines into encoded blocks of about BLOCK_SIZE bytes"""
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(chunks):
+    """Compress a byte stream into a single gzip member as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(name, output='csv', compress=False, chunk_size=CHUNK_SIZE, **filters):
+    """Yield the export as bytes: CSV or JSON Lines, optionally gzip-compressed"""
+    fields = EXPORTS[name]['fields']
+    rows = export_queryset(name, **filters).iterator(chunk_size=chunk_size)
+    lines = csv_lines(fields, rows) if output == 'csv' else jsonl_lines(fields, rows)
+    chunks = blocks(lines)
+    return gzipped(chunks) if compress else chunks
+
+
+async def aiterate(chunks):
+    """
+    Serve a stream() under ASGI, which would otherwise read a sync iterator into
+    memory with sync_to_async(list). Each block is produced in the sync thread,
+    so the server-side cursor stays on one connection and memory stays at one block.
+    """
+    produce = sync_to_async(next)
+    try:
+        while True:
+            chunk = await produce(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Release the cursor when the client goes away mid-stream
+        await sync_to_async(chunks.close)()
+
+
+def filename(name, output, compress):
+    stamp = datetime.date.today().strftime('%Y%m%d')
+    return f"{name}-{stamp}.{output}{'.gz' if compress else ''}"
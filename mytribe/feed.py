@@ -0,0 +1,137 @@
+# mytribe/feed.py
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import JSONObject
+
+from .models import CONTENT_MODELS, FeedEntry, content_model_name
+
+# ===============================================
+# FEED SUMMARIES
+# ===============================================
+
+# Type-specific fields copied into each summary on top of the common ones
+SUMMARY_FIELDS = {
+    'post': ('title', 'description', 'image_url', 'category', 'kind'),
+    'event': ('title', 'description', 'image_url', 'date', 'location'),
+    'business': ('name', 'description', 'image_url', 'category', 'promotion', 'address'),
+}
+
+DESCRIPTION_PREVIEW_LENGTH = 280
+
+
+def build_summary(instance, feed_type):
+    """Build the card payload stored on the feed entry"""
+    summary = {
+        'type': feed_type,
+        'id': instance.pk,
+        'created_at': instance.created_at.isoformat(),
+        'likes': instance.likes,
+        'comments_count': instance.comments_count,
+        'shares': instance.shares,
+    }
+    for field in SUMMARY_FIELDS[feed_type]:
+        summary[field] = getattr(instance, field)
+
+    if len(summary['description']) > DESCRIPTION_PREVIEW_LENGTH:
+        summary['description'] = summary['description'][:DESCRIPTION_PREVIEW_LENGTH].rstrip() + '...'
+
+    if feed_type == 'post':
+        summary['author'] = instance.author.username if instance.author_id else None
+    return summary
+
+
+def make_entry(instance, feed_type, content_type):
+    return FeedEntry(
+        content_type=content_type,
+        object_id=instance.pk,
+        created_at=instance.created_at,
+        summary=build_summary(instance, feed_type),
+    )
+
+
+def upsert_entries(entries):
+    """Insert or refresh feed entries in a single statement"""
+    return FeedEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['content_type', 'object_id'],
+        update_fields=['created_at', 'summary'],
+    )
+
+# ===============================================
+# SYNC AND REBUILD
+# ===============================================
+
+def refresh_counters(model, pks, fields):
+    """
+    Copy the rows' current counter columns into their feed summaries with one
+    UPDATE, for counter writes that bypass save() and so never reach sync_entry()
+    """
+    rows = model.objects.filter(pk=OuterRef('object_id'))
+    counters = JSONObject(**{field: Subquery(rows.values(field)) for field in fields})
+    return (FeedEntry.objects
+            .filter(content_type=ContentType.objects.get_for_model(model), object_id__in=pks)
+            .update(summary=models.Func(F('summary'), counters, template='(%(expressions)s)',
+                                        arg_joiner=' || ', output_field=models.JSONField())))
+
+
+def sync_entry(instance):
+    """Create or refresh the feed entry for a saved content object"""
+    feed_type = content_model_name(type(instance))
+    content_type = ContentType.objects.get_for_model(instance)
+    upsert_entries([make_entry(instance, feed_type, content_type)])
+
+
+def sync_entries(model, pks, chunk_size=1000):
+    """Create or refresh feed entries for many rows of one content model, a chunk at a time"""
+    feed_type = content_model_name(model)
+    content_type = ContentType.objects.get_for_model(model)
+    queryset = model.objects.order_by('pk')
+    if feed_type == 'post':
+        queryset = queryset.select_related('author')
+    pks = list(pks)
+    for start in range(0, len(pks), chunk_size):
+        chunk = queryset.filter(pk__in=pks[start:start + chunk_size])
+        upsert_entries([make_entry(obj, feed_type, content_type) for obj in chunk])
+
+
+def remove_entry(instance):
+    """Drop the feed entry for a deleted content object"""
+    content_type = ContentType.objects.get_for_model(instance)
+    FeedEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+
+def rebuild(chunk_size=1000, truncate=False, stdout=None):
+    """
+    Rebuild the feed table from the content tables, walking each one in
+    primary-key chunks so memory stays bounded. Without truncate the feed stays
+    readable throughout: entries are upserted and orphans pruned at the end.
+    """
+    if truncate:
+        FeedEntry.objects.all().delete()
+
+    for feed_type, model in CONTENT_MODELS.items():
+        content_type = ContentType.objects.get_for_model(model)
+        queryset = model.objects.order_by('pk')
+        if feed_type == 'post':
+            queryset = queryset.select_related('author')
+
+        last_pk = 0
+        written = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                upsert_entries([make_entry(obj, feed_type, content_type) for obj in chunk])
+            last_pk = chunk[-1].pk
+            written += len(chunk)
+
+        pruned, _ = (FeedEntry.objects
+                     .filter(content_type=content_type)
+                     .exclude(object_id__in=model.objects.values('pk'))
+                     .delete())
+        if stdout is not None:
+            stdout.write(f"{feed_type}: {written} entries written, {pruned} pruned")
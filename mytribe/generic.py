@@ -0,0 +1,39 @@
+# mytribe/generic.py
+
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import prefetch_related_objects
+
+from . import likes
+from .models import Post, Event, Business
+
+# ===============================================
+# GENERIC FOREIGN KEY PREFETCHING
+# ===============================================
+# Touching `content_object` on a row costs one query. GenericPrefetch groups the
+# rows by content_type and resolves each group with a single IN query, so a list
+# of FeaturedContent / Comment rows costs one query per distinct content type.
+
+def content_querysets(user=None):
+    """Querysets used to load Post/Event/Business targets, ready for card serialization"""
+    querysets = [
+        Post.objects.select_related('author__membership_tier'),
+        Event.objects.all(),
+        Business.objects.all(),
+    ]
+    if user is not None:
+        querysets = [likes.annotate_liked_by_me(queryset, user) for queryset in querysets]
+    return querysets
+
+
+def prefetch_content_object(lookup='content_object', user=None):
+    """
+    A prefetch_related() lookup resolving a GenericForeignKey in one query per
+    content type. Pass the requesting user to annotate liked_by_me on the targets.
+    """
+    return GenericPrefetch(lookup, content_querysets(user))
+
+
+def prefetch_content_objects(instances, lookup='content_object', user=None):
+    """Resolve the GenericForeignKey on already-fetched rows in place"""
+    prefetch_related_objects(instances, prefetch_content_object(lookup, user))
+    return instances
@@ -0,0 +1,217 @@
+# mytribe/images.py
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import authentication, cache
+from .models import CustomUser, PlatformSettings, SplashTheme
+
+logger = logging.getLogger(__name__)
+
+# ===============================================
+# IMAGE DERIVATIVES
+# ===============================================
+# Uploaded images are resized off the request path into WebP derivatives at a
+# fixed set of widths. Derivative names embed a hash of the original's bytes,
+# so rebuilding the same upload rewrites nothing and identical uploads share
+# files. Each image field has a sibling `<field>_variants` JSON column:
+#
+#     {'source': 'profile_pictures/me.jpg', 'width': 2400,
+#      'sizes': {'128': 'derivatives/3f0c...-128.webp', ...}}
+
+# model -> {image field: target widths}
+IMAGE_FIELDS = {
+    CustomUser: {
+        'profile_picture': (64, 128, 256, 512),
+        'cover_photo': (640, 1280, 1920),
+    },
+    PlatformSettings: {
+        'logo': (64, 128, 256),
+    },
+    SplashTheme: {
+        'image': (640, 1280, 1920),
+    },
+}
+
+# Cached payloads that embed each model's image URLs
+CACHE_LABELS = {
+    CustomUser: (CustomUser._meta.label_lower, 'landing'),
+    PlatformSettings: ('public-settings', 'landing'),
+    SplashTheme: ('public-settings', 'landing'),
+}
+
+DERIVATIVE_DIR = 'derivatives'
+WEBP_QUALITY = 80
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def derivative_name(digest, width):
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}-{width}.webp'
+
+
+def render_webp(image, width):
+    resized = image.copy()
+    resized.thumbnail((width, width * 10), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def build_variants(name, widths):
+    """Write the derivatives for one stored original and return its variants map"""
+    with default_storage.open(name, 'rb') as original:
+        data = original.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    # Never upscale: widths beyond the original collapse to the original width
+    targets = sorted({min(width, image.width) for width in widths})
+    sizes = {}
+    for width in targets:
+        target = derivative_name(digest, width)
+        if not default_storage.exists(target):
+            default_storage.save(target, ContentFile(render_webp(image, width)))
+        sizes[str(width)] = target
+    return {'source': name, 'width': image.width, 'sizes': sizes}
+
+
+def is_current(name, variants):
+    return (bool(name) and variants.get('source') == name
+            and all(default_storage.exists(path) for path in variants.get('sizes', {}).values()))
+
+
+def process(model, pk, field_name, force=False):
+    """
+    Bring one image field's variants up to date. Safe to repeat: a current map
+    is left alone and already-written derivatives are reused. Returns True if the
+    variants column changed.
+    """
+    column = variants_field(field_name)
+    row = model.objects.filter(pk=pk).values(field_name, column).first()
+    if row is None:
+        return False
+    name, variants = row[field_name], row[column] or {}
+
+    if not name:
+        new_variants = {}
+    elif not force and is_current(name, variants):
+        return False
+    else:
+        try:
+            new_variants = build_variants(name, IMAGE_FIELDS[model][field_name])
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning("Could not build variants for %s %s.%s (%s)", model.__name__, pk, field_name, name, exc_info=True)
+            return False
+    if new_variants == variants:
+        return False
+
+    # Only write if the image was not replaced while we worked
+    if name:
+        unchanged = Q(**{field_name: name})
+    else:
+        unchanged = Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})
+    updated = model.objects.filter(unchanged, pk=pk).update(**{column: new_variants})
+    if updated:
+        for label in CACHE_LABELS.get(model, ()):
+            cache.bump(label)
+        if model is CustomUser:
+            # update() sends no signal; retire the cached `me` payload
+            authentication.forget(pk)
+    return bool(updated)
+
+# ===============================================
+# WORKER POOL
+# ===============================================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+                thread_name_prefix='image-derivatives',
+            )
+    return _executor
+
+
+def run_job(model, pk, field_name, force=False):
+    close_old_connections()
+    try:
+        return process(model, pk, field_name, force=force)
+    except Exception:
+        logger.exception("Image derivative job failed for %s %s.%s", model.__name__, pk, field_name)
+        return False
+    finally:
+        close_old_connections()
+
+
+def schedule(model, pk, field_name):
+    """Queue derivative generation once the current transaction commits"""
+    if getattr(settings, 'IMAGE_DERIVATIVES_SYNC', False):
+        transaction.on_commit(lambda: process(model, pk, field_name))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_job, model, pk, field_name))
+
+
+def schedule_changed(instance, update_fields=None):
+    """Queue every image field on a saved instance whose variants do not match its current file"""
+    model = type(instance)
+    for field_name in IMAGE_FIELDS[model]:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        name = getattr(instance, field_name).name or ''
+        variants = getattr(instance, variants_field(field_name)) or {}
+        if variants.get('source', '') != name:
+            schedule(model, instance.pk, field_name)
+
+# ===============================================
+# SERIALIZATION
+# ===============================================
+
+def current_sizes(field_file, variants):
+    """The derivative map for a file, ignoring variants left over from a previous upload"""
+    variants = variants or {}
+    if not field_file or variants.get('source') != field_file.name:
+        return {}
+    return variants.get('sizes', {})
+
+
+def srcset(field_file, variants):
+    """{'<width>w': url} for an image's derivatives, or None until they exist"""
+    sizes = current_sizes(field_file, variants)
+    if not sizes:
+        return None
+    return {f'{width}w': default_storage.url(path)
+            for width, path in sorted(sizes.items(), key=lambda item: int(item[0]))}
+
+
+def best_url(field_file, variants, width=None):
+    """URL of the smallest derivative at least `width` wide (largest if None), else the original"""
+    if not field_file:
+        return None
+    sizes = current_sizes(field_file, variants)
+    if not sizes:
+        return field_file.url
+    widths = sorted(int(size) for size in sizes)
+    chosen = widths[-1] if width is None else next((w for w in widths if w >= width), widths[-1])
+    return default_storage.url(sizes[str(chosen)])
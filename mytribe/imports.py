@@ -0,0 +1,162 @@
+# mytribe/imports.py
+
+import codecs
+import csv
+import gzip
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import JSONField
+
+from . import cache, feed, landing, search
+from .models import Business, Event, content_model_name
+
+# ===============================================
+# IMPORT DEFINITIONS
+# ===============================================
+# Rows are validated field by field with the model fields' own clean(), then
+# upserted a batch at a time with one INSERT ... ON CONFLICT (import_key) DO
+# UPDATE. bulk_create sends no signals, so the feed, search vectors and
+# response caches are refreshed once for all written rows after the last batch.
+
+IMPORTS = {
+    'business': {
+        'model': Business,
+        'fields': ('name', 'description', 'image_url', 'category', 'promotion', 'address', 'website_url'),
+    },
+    'event': {
+        'model': Event,
+        'fields': ('title', 'description', 'image_url', 'date', 'location', 'ticketing', 'features', 'gallery_images'),
+    },
+}
+
+INPUTS = ('csv', 'jsonl')
+KEY_FIELD = 'import_key'
+BATCH_SIZE = 1000
+# Per-row errors beyond this are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+# ===============================================
+# READING
+# ===============================================
+
+def open_upload(fileobj, filename):
+    """Transparently decompress .gz uploads; returns (binary file object, input format guessed from the name)"""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        fileobj = gzip.GzipFile(fileobj=fileobj)
+        name = name[:-3]
+    return fileobj, 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(source, input_format):
+    """Yield (row_number, dict) from a binary file object holding CSV (with a header row) or JSON Lines"""
+    text = codecs.getreader('utf-8-sig')(source)
+    if input_format == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, row
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, ValueError(f'Invalid JSON: {error}')
+            continue
+        yield number, row if isinstance(row, dict) else ValueError('Each line must be a JSON object')
+
+
+def clean_row(model, fields, row):
+    """Return (instance, None) for a valid row or (None, {field: [messages]})"""
+    if isinstance(row, Exception):
+        return None, {'row': [str(row)]}
+
+    errors = {}
+    values = {}
+    for name in (KEY_FIELD,) + fields:
+        field = model._meta.get_field(name)
+        raw = row.get(name)
+        if raw is None or raw == '':
+            if name == KEY_FIELD or not (field.blank or field.has_default()):
+                errors[name] = ['This field is required.']
+            continue
+        if isinstance(field, JSONField) and isinstance(raw, str):
+            # CSV cells carry JSON values as text
+            try:
+                raw = json.loads(raw)
+            except ValueError:
+                errors[name] = ['Enter valid JSON.']
+                continue
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as error:
+            errors[name] = error.messages
+    if errors:
+        return None, errors
+    return model(**values), None
+
+# ===============================================
+# WRITING
+# ===============================================
+
+def write_batch(model, fields, instances):
+    """Upsert one batch; returns (created, updated, pks)"""
+    # Later rows for the same key win, as they would row by row
+    by_key = {instance.import_key: instance for instance in instances}
+    existing = set(model.objects.filter(import_key__in=list(by_key)).values_list('import_key', flat=True))
+    with transaction.atomic():
+        written = model.objects.bulk_create(
+            list(by_key.values()),
+            update_conflicts=True,
+            unique_fields=[KEY_FIELD],
+            update_fields=list(fields) + ['updated_at'],
+        )
+    return len(by_key) - len(existing), len(existing), [instance.pk for instance in written]
+
+
+def finish(model, pks):
+    """The deferred per-row work that post_save would have done, once per import"""
+    content_type = content_model_name(model)
+    search.update_vectors(content_type, pks)
+    feed.sync_entries(model, pks)
+    cache.bump(model._meta.label_lower)
+    cache.bump(landing.LANDING_LABEL)
+
+
+def run(import_type, source, input_format='csv', batch_size=BATCH_SIZE):
+    """
+    Import Business or Event rows from a binary file object. Invalid rows are
+    reported and skipped; every valid row is written. Returns a summary dict.
+    """
+    spec = IMPORTS[import_type]
+    model, fields = spec['model'], spec['fields']
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    pks = []
+    batch = []
+
+    def flush():
+        created, updated, written = write_batch(model, fields, batch)
+        report['created'] += created
+        report['updated'] += updated
+        pks.extend(written)
+        batch.clear()
+
+    for number, row in read_rows(source, input_format):
+        report['rows'] += 1
+        instance, errors = clean_row(model, fields, row)
+        if errors:
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': number, 'errors': errors})
+            continue
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if pks:
+        finish(model, pks)
+    return report
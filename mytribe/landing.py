@@ -0,0 +1,79 @@
+# mytribe/landing.py
+
+import hashlib
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from . import cache, generic
+from .models import Business, Event, FeaturedContent, Post, SectionConfig
+from .serializers import PublicSectionSerializer, serialize_card
+
+# ===============================================
+# SECTION LANDING SNAPSHOTS
+# ===============================================
+# Opening a section needs its splash theme, hero slider and latest cards. All
+# three are rendered once into a JSON snapshot kept in the shared cache under
+# the LANDING_LABEL generation. Saving or deleting content, featured items,
+# splash themes or sections bumps the generation, and the next request rebuilds
+# the snapshot. Counter changes (likes, comments) do not bump it; they show up
+# once the snapshot expires after LANDING_SNAPSHOT_TIMEOUT seconds.
+
+LANDING_LABEL = 'landing'
+LATEST_LIMIT = 10
+
+# section_id -> (content type, model, filters) for the section's latest list
+SECTION_CONTENT = {
+    'News': ('post', Post, {'kind': Post.KIND_NEWS}),
+    'Articles': ('post', Post, {'kind': Post.KIND_ARTICLE}),
+    'Events': ('event', Event, {}),
+    'Businesses': ('business', Business, {}),
+}
+
+
+def latest_queryset(section_id):
+    content_type, model, filters = SECTION_CONTENT[section_id]
+    queryset = model.objects.filter(**filters).order_by('-created_at', '-id')
+    if content_type == 'post':
+        queryset = queryset.select_related('author__membership_tier')
+    return queryset[:LATEST_LIMIT]
+
+
+def build(section_id):
+    """Render one section's landing payload; returns None if the section is not configured"""
+    section = SectionConfig.objects.select_related('splash_theme').filter(section_id=section_id).first()
+    if section is None:
+        return None
+
+    featured = (FeaturedContent.objects
+                .filter(section=section)
+                .order_by('order', 'id')
+                .prefetch_related(generic.prefetch_content_object()))
+    featured_cards = []
+    for item in featured:
+        card = serialize_card(item.content_object)
+        if card is not None:
+            featured_cards.append({'order': item.order, **card})
+
+    data = {
+        'section': PublicSectionSerializer(section).data,
+        'featured': featured_cards,
+        'latest': [serialize_card(obj) for obj in latest_queryset(section_id)],
+    }
+    body = JSONRenderer().render(data)
+    return {'body': body, 'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32]}
+
+
+def get(section_id):
+    """Return the cached {'body', 'etag'} snapshot for a section, building it on a miss"""
+    return cache.get_or_build(
+        LANDING_LABEL,
+        f'landing:{section_id}',
+        lambda: build(section_id),
+        timeout=getattr(settings, 'LANDING_SNAPSHOT_TIMEOUT', 60),
+    )
+
+
+def invalidate():
+    """Retire every section's snapshot once the current transaction commits"""
+    cache.bump_on_commit(LANDING_LABEL)
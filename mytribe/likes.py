@@ -0,0 +1,94 @@
+# mytribe/likes.py
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import counters
+from .models import CONTENT_MODELS
+
+# ===============================================
+# LIKE STATE
+# ===============================================
+# Likes are read and written through the liked_by through table, whose unique
+# (content, user) index turns every check into a single index probe instead of
+# loading the object's full liker list.
+
+def through_filter(model, pk, user_id):
+    """Filter kwargs selecting one user's like row on one object"""
+    return {f'{model._meta.model_name}_id': pk, 'customuser_id': user_id}
+
+
+def is_liked(model, pk, user):
+    return model.liked_by.through.objects.filter(**through_filter(model, pk, user.pk)).exists()
+
+
+def like(model, pk, user):
+    """Idempotently like an object. Returns (liked, likes)"""
+    with transaction.atomic():
+        _, created = model.liked_by.through.objects.get_or_create(**through_filter(model, pk, user.pk))
+        if created:
+            return True, counters.increment(model, pk, 'likes', 1)
+    return True, counters.value(model, pk, 'likes')
+
+
+def unlike(model, pk, user):
+    """Idempotently remove a like. Returns (liked, likes)"""
+    with transaction.atomic():
+        deleted, _ = model.liked_by.through.objects.filter(**through_filter(model, pk, user.pk)).delete()
+        if deleted:
+            return False, counters.increment(model, pk, 'likes', -1)
+    return False, counters.value(model, pk, 'likes')
+
+
+def annotate_liked_by_me(queryset, user):
+    """Add a liked_by_me flag to every row, evaluated inside the page query itself"""
+    model = queryset.model
+    if not user.is_authenticated:
+        return queryset
+    liked = model.liked_by.through.objects.filter(**{
+        f'{model._meta.model_name}_id': OuterRef('pk'),
+        'customuser_id': user.pk,
+    })
+    return queryset.annotate(liked_by_me=Exists(liked))
+
+# ===============================================
+# BULK ENGAGEMENT STATE
+# ===============================================
+
+def engagement_state(items, user):
+    """
+    Counters and the caller's like state for a mixed list of (type, id) pairs.
+    Issues one query per content type present, however many items there are.
+    Unknown ids are left out; results follow the order of `items`.
+    """
+    ids_by_type = {}
+    for content_type, pk in items:
+        ids_by_type.setdefault(content_type, set()).add(pk)
+
+    found = {}
+    for content_type, ids in ids_by_type.items():
+        model = CONTENT_MODELS[content_type]
+        queryset = annotate_liked_by_me(model.objects.filter(pk__in=ids).order_by(), user)
+        fields = ['pk', 'likes', 'comments_count', 'shares']
+        if user.is_authenticated:
+            fields.append('liked_by_me')
+        pending = counters.pending_many(model, list(ids))
+
+        for row in queryset.values(*fields):
+            deltas = pending.get(row['pk'], {})
+            found[(content_type, row['pk'])] = {
+                'type': content_type,
+                'id': row['pk'],
+                'likes': max(row['likes'] + deltas.get('likes', 0), 0),
+                'comments_count': max(row['comments_count'] + deltas.get('comments_count', 0), 0),
+                'shares': max(row['shares'] + deltas.get('shares', 0), 0),
+                'liked_by_me': row.get('liked_by_me', False),
+            }
+
+    results = []
+    seen = set()
+    for key in items:
+        if key in found and key not in seen:
+            seen.add(key)
+            results.append(found[key])
+    return results
@@ -0,0 +1,31 @@
+# mytribe/management/commands/backfill_analytics.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mytribe import analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales and membership rollups from order and member history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild, YYYY-MM-DD (default: earliest order or signup)")
+        parser.add_argument('--end', help="Last day to rebuild, YYYY-MM-DD (default: today)")
+        parser.add_argument('--chunk-days', type=int, default=31,
+                            help="Days aggregated and written per batch (default: 31)")
+
+    def handle(self, *args, **options):
+        start = self.parse_date(options['start'])
+        end = self.parse_date(options['end'])
+        days = analytics.backfill(start=start, end=end, chunk_days=options['chunk_days'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt for {days} days"))
+
+    def parse_date(self, value):
+        if value is None:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
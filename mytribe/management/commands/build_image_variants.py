@@ -0,0 +1,32 @@
+# mytribe/management/commands/build_image_variants.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from mytribe import images
+
+
+class Command(BaseCommand):
+    help = "Build WebP derivatives for existing profile, cover, logo and splash images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Images processed in parallel (default: 4)")
+        parser.add_argument('--force', action='store_true',
+                            help="Re-check every image even if its variants look current")
+
+    def handle(self, *args, **options):
+        jobs = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for model, fields in images.IMAGE_FIELDS.items():
+                for field_name in fields:
+                    pks = (model.objects
+                           .exclude(**{field_name: ''})
+                           .exclude(**{f'{field_name}__isnull': True})
+                           .values_list('pk', flat=True)
+                           .iterator())
+                    for pk in pks:
+                        jobs.append(pool.submit(images.run_job, model, pk, field_name, options['force']))
+        changed = sum(1 for job in jobs if job.result())
+        self.stdout.write(self.style.SUCCESS(f"{len(jobs)} images checked, {changed} updated"))
@@ -0,0 +1,57 @@
+# mytribe/management/commands/export_data.py
+
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mytribe import exports
+
+
+class Command(BaseCommand):
+    help = "Stream orders, order items, users or content to CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(exports.EXPORTS))
+        parser.add_argument('--output', choices=exports.OUTPUTS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Compress the output")
+        parser.add_argument('--start', help="First day to include, YYYY-MM-DD")
+        parser.add_argument('--end', help="Last day to include, YYYY-MM-DD")
+        parser.add_argument('--tier', type=int, help="Membership tier id")
+        parser.add_argument('--type', help="Post kind, order item type or business category")
+        parser.add_argument('--file', help="Write here instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help=f"Rows fetched per cursor round trip (default: {exports.CHUNK_SIZE})")
+
+    def handle(self, *args, **options):
+        filters = {key: options[key] for key in ('tier', 'type') if options[key] is not None}
+        try:
+            chunks = exports.stream(
+                options['name'],
+                output=options['output'],
+                compress=options['gzip'],
+                chunk_size=options['chunk_size'],
+                start=self.parse_date(options['start']),
+                end=self.parse_date(options['end']),
+                **filters,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['file']:
+            with open(options['file'], 'wb') as target:
+                for chunk in chunks:
+                    target.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['file']}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+    def parse_date(self, value):
+        if value is None:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
@@ -0,0 +1,20 @@
+# mytribe/management/commands/flush_counters.py
+
+from django.core.management.base import BaseCommand
+
+from mytribe import counters
+
+
+class Command(BaseCommand):
+    help = "Write buffered engagement counter deltas to the content rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Journal entries read per cache round trip (default: 500)")
+
+    def handle(self, *args, **options):
+        if not counters.buffering_enabled():
+            self.stdout.write("Counter buffering is disabled; nothing to flush")
+            return
+        rows = counters.flush(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Flushed counters for {rows} rows"))
@@ -0,0 +1,38 @@
+# mytribe/management/commands/import_content.py
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mytribe import imports
+
+
+class Command(BaseCommand):
+    help = "Bulk-load businesses or events from a CSV or JSON Lines file (optionally .gz), upserting by import_key"
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=list(imports.IMPORTS))
+        parser.add_argument('path')
+        parser.add_argument('--input', choices=imports.INPUTS, help="Input format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE,
+                            help=f"Rows validated and written per batch (default: {imports.BATCH_SIZE})")
+
+    def handle(self, *args, **options):
+        try:
+            raw = open(options['path'], 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        with raw:
+            source, input_format = imports.open_upload(raw, options['path'])
+            report = imports.run(
+                options['type'], source,
+                input_format=options['input'] or input_format,
+                batch_size=options['batch_size'],
+            )
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows read: {report['created']} created, "
+            f"{report['updated']} updated, {report['error_count']} rejected"
+        ))
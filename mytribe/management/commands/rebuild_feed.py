@@ -0,0 +1,19 @@
+# mytribe/management/commands/rebuild_feed.py
+
+from django.core.management.base import BaseCommand
+
+from mytribe import feed
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized activity feed from Post, Event and Business"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Rows read and written per batch (default: 1000)")
+        parser.add_argument('--truncate', action='store_true',
+                            help="Empty the feed table first instead of upserting in place")
+
+    def handle(self, *args, **options):
+        feed.rebuild(chunk_size=options['chunk_size'], truncate=options['truncate'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Feed rebuilt"))
@@ -0,0 +1,13 @@
+# mytribe/management/commands/refresh_analytics.py
+
+from django.core.management.base import BaseCommand
+
+from mytribe import analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the analytics rollups for days changed since the last run (schedule every few minutes)"
+
+    def handle(self, *args, **options):
+        days = analytics.refresh_dirty()
+        self.stdout.write(self.style.SUCCESS(f"Rollups refreshed for {days} days"))
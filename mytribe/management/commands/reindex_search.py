@@ -0,0 +1,25 @@
+# mytribe/management/commands/reindex_search.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mytribe import search
+from mytribe.models import CONTENT_MODELS
+
+
+class Command(BaseCommand):
+    help = "Recompute full-text search vectors for posts, events and businesses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('types', nargs='*', help="Content types to reindex (default: all)")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows updated per statement (default: 5000)")
+
+    def handle(self, *args, **options):
+        types = options['types'] or list(CONTENT_MODELS)
+        unknown = set(types) - set(CONTENT_MODELS)
+        if unknown:
+            raise CommandError(f"Unknown content types: {', '.join(sorted(unknown))}")
+
+        for search_type in types:
+            search.reindex(search_type, chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
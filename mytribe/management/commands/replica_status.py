@@ -0,0 +1,21 @@
+# mytribe/management/commands/replica_status.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mytribe import replicas
+
+
+class Command(BaseCommand):
+    help = "Check each read replica's health and replication lag"
+
+    def handle(self, *args, **options):
+        report = replicas.status()
+        if not report:
+            self.stdout.write("No read replicas configured (DATABASE_REPLICAS is empty)")
+            return
+        for alias, state in report.items():
+            lag = 'unreachable' if state['lag'] is None else f"{state['lag']:.1f}s behind"
+            line = f"{alias}: {lag}"
+            self.stdout.write(self.style.SUCCESS(line) if state['healthy'] else self.style.ERROR(line))
+        if not any(state['healthy'] for state in report.values()):
+            raise CommandError("No healthy read replica; reads are served by the primary")
@@ -0,0 +1,237 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:24
+
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('monthly_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('annual_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('is_default', models.BooleanField(default=False, help_text="Default tier for new users if they don't choose one.")),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlatformSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app_name', models.CharField(default='Community Hub', max_length=100)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='logos/')),
+                ('owner_name', models.CharField(default='Community Admin', max_length=100)),
+                ('domain_name', models.CharField(default='hub.example.com', max_length=255)),
+                ('primary_contact', models.EmailField(default='admin@hub.example.com', max_length=254)),
+                ('categories', models.JSONField(default=dict, help_text="Content categories, e.g., {'News': ['Community', 'Infrastructure']}")),
+                ('currency_code', models.CharField(default='GBP', max_length=3)),
+                ('currency_symbol', models.CharField(default='£', max_length=5)),
+                ('payment_gateway', models.CharField(blank=True, choices=[('Stripe', 'Stripe'), ('PayPal', 'PayPal'), ('SumUp', 'SumUp'), ('Square', 'Square')], max_length=50, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Platform Settings',
+            },
+        ),
+        migrations.CreateModel(
+            name='SectionConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section_id', models.CharField(choices=[('News', 'News'), ('Events', 'Events'), ('Articles', 'Articles'), ('Businesses', 'Businesses')], max_length=50, unique=True)),
+                ('title', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserRole',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField()),
+                ('is_default', models.BooleanField(default=False, help_text='Default role for new sign-ups.')),
+                ('permissions', models.JSONField(default=dict, help_text="e.g., {'News': {'read': true, 'create': false}}")),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('profile_picture', models.ImageField(blank=True, null=True, upload_to='profile_pictures/')),
+                ('cover_photo', models.ImageField(blank=True, null=True, upload_to='cover_photos/')),
+                ('bio', models.TextField(blank=True)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('age', models.PositiveIntegerField(blank=True, null=True)),
+                ('gender', models.CharField(blank=True, max_length=50)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+                ('membership_tier', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='mytribe.membershiptier')),
+                ('role', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='mytribe.userrole')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('image_url', models.URLField(blank=True, max_length=1024)),
+                ('category', models.CharField(max_length=100)),
+                ('promotion', models.CharField(blank=True, max_length=255)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('website_url', models.URLField(blank=True, max_length=1024)),
+                ('liked_by', models.ManyToManyField(blank=True, related_name='%(class)s_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Businesses',
+            },
+        ),
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='mytribe.comment')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('image_url', models.URLField(blank=True, max_length=1024)),
+                ('date', models.CharField(help_text="e.g., 'August 15, 2024' or 'Every Saturday'", max_length=100)),
+                ('location', models.CharField(max_length=255)),
+                ('ticketing', models.JSONField(default=dict, help_text='Stores ticketing type, price, URL etc.')),
+                ('features', models.JSONField(default=list, help_text="List of features, e.g., ['Family Friendly', 'Outdoor']")),
+                ('gallery_images', models.JSONField(default=list, help_text='List of image URLs for the gallery')),
+                ('liked_by', models.ManyToManyField(blank=True, related_name='%(class)s_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_date', models.DateTimeField(auto_now_add=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-order_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('image_url', models.URLField(blank=True, max_length=1024)),
+                ('item_type', models.CharField(help_text="e.g., 'membership', 'event'", max_length=50)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='mytribe.order')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Post',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('image_url', models.URLField(blank=True, max_length=1024)),
+                ('category', models.CharField(max_length=100)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to=settings.AUTH_USER_MODEL)),
+                ('liked_by', models.ManyToManyField(blank=True, related_name='%(class)s_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SplashTheme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tagline', models.CharField(max_length=255)),
+                ('color', models.CharField(help_text="Tailwind CSS color class, e.g., 'from-blue-600'", max_length=50)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='splash_images/')),
+                ('section', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='splash_theme', to='mytribe.sectionconfig')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeaturedContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('order', models.PositiveIntegerField(default=0, help_text='Order in the slider')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='featured_content', to='mytribe.sectionconfig')),
+            ],
+            options={
+                'ordering': ['section', 'order'],
+                'unique_together': {('section', 'content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='business',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name_plural': 'Businesses'},
+        ),
+        migrations.AlterModelOptions(
+            name='event',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['created_at', 'id'], name='business_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['created_at', 'id'], name='event_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'id'], name='post_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('mytribe', '0002_content_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('summary', models.JSONField(default=dict, help_text='Prebuilt card payload served as-is by the feed')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name_plural': 'Feed entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['created_at', 'id'], name='feedentry_created_id_idx'), models.Index(fields=['content_type', 'created_at', 'id'], name='feedentry_type_created_idx')],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:26
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Frozen copy of mytribe.search.SEARCH_FIELDS at the time of this migration
+SEARCH_FIELDS = {
+    'post': [('title', 'A'), ('description', 'B')],
+    'event': [('title', 'A'), ('location', 'B'), ('description', 'C')],
+    'business': [('name', 'A'), ('category', 'B'), ('description', 'C'), ('address', 'D')],
+}
+
+
+def populate_search_vectors(apps, schema_editor):
+    for model_name, fields in SEARCH_FIELDS.items():
+        vector = None
+        for field, weight in fields:
+            part = SearchVector(field, weight=weight, config='english')
+            vector = part if vector is None else vector + part
+        apps.get_model('mytribe', model_name).objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0003_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='business_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_gin'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0004_content_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='kind',
+            field=models.CharField(choices=[('news', 'News'), ('article', 'Article')], default='article', editable=False, help_text='Derived from category using PlatformSettings.categories', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['kind', 'created_at', 'id'], name='post_kind_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Backfills Post.kind from PlatformSettings.categories in primary-key batches.
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def kind_for_category(category, news, articles):
+    # Frozen copy of Post.kind_for_category
+    category = (category or '').strip().lower()
+    if category in news:
+        return 'news'
+    if category in articles:
+        return 'article'
+    return 'news' if 'news' in category else 'article'
+
+
+def backfill_post_kind(apps, schema_editor):
+    Post = apps.get_model('mytribe', 'Post')
+    PlatformSettings = apps.get_model('mytribe', 'PlatformSettings')
+
+    categories = PlatformSettings.objects.values_list('categories', flat=True).first() or {}
+    news = {c.lower() for c in categories.get('News', [])}
+    articles = {c.lower() for c in categories.get('Articles', [])}
+
+    last_pk = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'category', 'kind')[:BATCH_SIZE])
+        if not batch:
+            break
+        changed = []
+        for post in batch:
+            kind = kind_for_category(post.category, news, articles)
+            if post.kind != kind:
+                post.kind = kind
+                changed.append(post)
+        with transaction.atomic():
+            Post.objects.bulk_update(changed, ['kind'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the posts table is never locked for the whole backfill
+    atomic = False
+
+    dependencies = [
+        ('mytribe', '0005_post_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_post_kind, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+# Walks every thread from its root with a recursive CTE and writes path/depth in one statement
+BACKFILL_COMMENT_PATHS = """
+WITH RECURSIVE tree (id, path, depth) AS (
+    SELECT id, LPAD(id::text, 10, '0')::varchar, 0
+    FROM mytribe_comment
+    WHERE parent_id IS NULL
+  UNION ALL
+    SELECT c.id, (tree.path || '/' || LPAD(c.id::text, 10, '0'))::varchar, tree.depth + 1
+    FROM mytribe_comment c
+    JOIN tree ON c.parent_id = tree.id
+)
+UPDATE mytribe_comment
+SET path = tree.path, depth = tree.depth
+FROM tree
+WHERE mytribe_comment.id = tree.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('mytribe', '0006_backfill_post_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=1000),
+        ),
+        migrations.RunSQL(BACKFILL_COMMENT_PATHS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_type', 'object_id', 'depth', 'timestamp', 'id'], name='comment_thread_roots_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0010_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='import_key',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='import_key',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
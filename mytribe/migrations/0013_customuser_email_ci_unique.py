@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:45
+# Refuses to add the case-insensitive email constraint while accounts share an
+# address, listing them so they can be merged or re-addressed first.
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+MAX_REPORTED = 20
+
+
+def check_duplicate_emails(apps, schema_editor):
+    CustomUser = apps.get_model('mytribe', 'CustomUser')
+    duplicates = list(CustomUser.objects
+                      .exclude(email='')
+                      .values(email_lower=Lower('email'))
+                      .annotate(accounts=Count('id'))
+                      .filter(accounts__gt=1)
+                      .order_by('email_lower')
+                      .values_list('email_lower', flat=True)[:MAX_REPORTED + 1])
+    if not duplicates:
+        return
+    lines = []
+    for email in duplicates[:MAX_REPORTED]:
+        users = (CustomUser.objects
+                 .alias(email_lower=Lower('email'))
+                 .filter(email_lower=email)
+                 .order_by('pk')
+                 .values_list('pk', 'username'))
+        lines.append(f"  {email}: " + ', '.join(f"{username} (id {pk})" for pk, username in users))
+    if len(duplicates) > MAX_REPORTED:
+        lines.append('  ...')
+    raise RuntimeError(
+        "Cannot add customuser_email_ci_unique: these email addresses are used by more than one "
+        "account (ignoring case). Merge the accounts or change all but one address, then migrate again.\n"
+        + '\n'.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('mytribe', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='customuser_email_ci_unique'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0014_customuser_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterFlushProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(unique=True)),
+                ('applied_through', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
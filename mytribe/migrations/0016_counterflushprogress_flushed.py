@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0015_counter_flush_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='counterflushprogress',
+            name='flushed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
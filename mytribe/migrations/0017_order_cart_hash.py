@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mytribe', '0016_counterflushprogress_flushed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cart_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
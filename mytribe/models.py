@@ -4,9 +4,13 @@
 
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
 
 # ===============================================
 # 1. USERS AND AUTHENTICATION MODELS
@@ -46,6 +50,9 @@ class CustomUser(AbstractUser):
     """
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     cover_photo = models.ImageField(upload_to='cover_photos/', null=True, blank=True)
+    # Resized WebP derivatives of the images above, written by mytribe/images.py
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    cover_photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     address = models.CharField(max_length=255, blank=True)
     phone = models.CharField(max_length=20, blank=True)
@@ -55,10 +62,18 @@ class CustomUser(AbstractUser):
     
     role = models.ForeignKey(UserRole, on_delete=models.SET_NULL, null=True, related_name='users')
     membership_tier = models.ForeignKey(MembershipTier, on_delete=models.SET_NULL, null=True, related_name='members')
+    # Stamped into access tokens; bumping it revokes every token issued before (see mytribe/authentication.py)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return self.username
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Login looks users up by LOWER(email); this is also the index it uses
+            models.UniqueConstraint(Lower('email'), condition=~models.Q(email=''), name='customuser_email_ci_unique'),
+        ]
+
 
 # ===============================================
 # 2. PLATFORM CONFIGURATION MODELS (Singleton Pattern)
@@ -72,6 +87,7 @@ class PlatformSettings(models.Model):
     # AppSettings
     app_name = models.CharField(max_length=100, default='Community Hub')
     logo = models.ImageField(upload_to='logos/', null=True, blank=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     # PlatformSettings
     owner_name = models.CharField(max_length=100, default='Community Admin')
@@ -130,6 +146,7 @@ class SplashTheme(models.Model):
     tagline = models.CharField(max_length=255)
     color = models.CharField(max_length=50, help_text="Tailwind CSS color class, e.g., 'from-blue-600'")
     image = models.ImageField(upload_to='splash_images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     def __str__(self):
         return f"Splash Theme for {self.section.title}"
@@ -160,22 +177,85 @@ class BaseContent(models.Model):
 
     class Meta:
         abstract = True
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Backs the (created_at, id) keyset used by KeysetPagination
+            models.Index(fields=['created_at', 'id'], name='%(class)s_created_id_idx'),
+        ]
 
 class Post(BaseContent):
     """
     For News and Articles sections.
     Corresponds to: types.ts -> Post
     """
+    KIND_NEWS = 'news'
+    KIND_ARTICLE = 'article'
+    KIND_CHOICES = [
+        (KIND_NEWS, 'News'),
+        (KIND_ARTICLE, 'Article'),
+    ]
+
     title = models.CharField(max_length=255)
     description = models.TextField()
     image_url = models.URLField(max_length=1024, blank=True) # Or use ImageField
     author = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='posts')
     category = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_ARTICLE, editable=False,
+                            help_text="Derived from category using PlatformSettings.categories")
+
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    @staticmethod
+    def kind_for_category(category, categories):
+        """
+        Map a category onto News or Articles using the configured category lists,
+        falling back to the old 'contains news' rule for unlisted categories.
+        """
+        category = (category or '').strip().lower()
+        if category in {c.lower() for c in categories.get('News', [])}:
+            return Post.KIND_NEWS
+        if category in {c.lower() for c in categories.get('Articles', [])}:
+            return Post.KIND_ARTICLE
+        return Post.KIND_NEWS if 'news' in category else Post.KIND_ARTICLE
+
+    def save(self, *args, **kwargs):
+        categories = PlatformSettings.objects.values_list('categories', flat=True).first() or {}
+        self.kind = self.kind_for_category(self.category, categories)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'category' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'kind'}
+        return super(Post, self).save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
+    class Meta(BaseContent.Meta):
+        indexes = BaseContent.Meta.indexes + [
+            GinIndex(fields=['search_vector'], name='post_search_gin'),
+            models.Index(fields=['kind', 'created_at', 'id'], name='post_kind_created_idx'),
+        ]
+
+
+def reclassify_post_kinds(categories):
+    """
+    Re-derive Post.kind for every row after the category configuration changes.
+    Returns the pks of the posts whose kind changed; the updates bypass save(),
+    so callers refresh whatever mirrors those rows.
+    """
+    news = [c.lower() for c in categories.get('News', [])]
+    articles = [c.lower() for c in categories.get('Articles', [])]
+    is_news = models.Q(category_lower__in=news) | (
+        ~models.Q(category_lower__in=articles) & models.Q(category__icontains='news')
+    )
+    posts = Post.objects.alias(category_lower=Lower(Trim('category')))
+    changed = []
+    for kind, matching in ((Post.KIND_NEWS, posts.filter(is_news)), (Post.KIND_ARTICLE, posts.exclude(is_news))):
+        pks = list(matching.exclude(kind=kind).values_list('pk', flat=True))
+        if pks:
+            Post.objects.filter(pk__in=pks).update(kind=kind, updated_at=timezone.now())
+            changed += pks
+    return changed
+
 class Event(BaseContent):
     """
     For the Events section.
@@ -189,10 +269,20 @@ class Event(BaseContent):
     ticketing = models.JSONField(default=dict, help_text="Stores ticketing type, price, URL etc.")
     features = models.JSONField(default=list, help_text="List of features, e.g., ['Family Friendly', 'Outdoor']")
     gallery_images = models.JSONField(default=list, help_text="List of image URLs for the gallery")
+    
+    # Natural key from bulk imports (see mytribe/imports.py); re-importing a row updates it in place
+    import_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.title
 
+    class Meta(BaseContent.Meta):
+        indexes = BaseContent.Meta.indexes + [
+            GinIndex(fields=['search_vector'], name='event_search_gin'),
+        ]
+
 class Business(BaseContent):
     """
     For the Local Businesses section.
@@ -206,11 +296,33 @@ class Business(BaseContent):
     address = models.CharField(max_length=255, blank=True)
     website_url = models.URLField(max_length=1024, blank=True)
     
+    # Natural key from bulk imports (see mytribe/imports.py); re-importing a row updates it in place
+    import_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     def __str__(self):
         return self.name
 
-    class Meta:
+    class Meta(BaseContent.Meta):
         verbose_name_plural = "Businesses"
+        indexes = BaseContent.Meta.indexes + [
+            GinIndex(fields=['search_vector'], name='business_search_gin'),
+        ]
+
+# Public type names for the concrete content models, as used in API filters
+CONTENT_MODELS = {
+    'post': Post,
+    'event': Event,
+    'business': Business,
+}
+
+def content_model_name(model):
+    """Reverse lookup into CONTENT_MODELS, e.g. Post -> 'post'"""
+    for name, content_model in CONTENT_MODELS.items():
+        if content_model is model:
+            return name
+    return None
 
 
 # ===============================================
@@ -229,16 +341,42 @@ class Comment(models.Model):
     # Self-referencing FK for replies
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     
+    # Materialized path: zero-padded ids from the thread root down to this comment,
+    # e.g. '0000000012/0000000034'. Sorting by path yields the thread depth-first.
+    path = models.CharField(max_length=1000, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     # Generic Foreign Key setup
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
     
+    PATH_SEGMENT_WIDTH = 10
+    
+    def save(self, *args, **kwargs):
+        super(Comment, self).save(*args, **kwargs)
+        if not self.path:
+            # The path embeds our own id, so it can only be written once the row exists
+            segment = str(self.pk).zfill(self.PATH_SEGMENT_WIDTH)
+            if self.parent_id:
+                self.path = f'{self.parent.path}/{segment}'
+                self.depth = self.parent.depth + 1
+            else:
+                self.path = segment
+                self.depth = 0
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
     def __str__(self):
         return f'Comment by {self.author.username} on {self.timestamp.strftime("%Y-%m-%d")}'
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Top-level comments for one object, keyset-paged by (timestamp, id)
+            models.Index(fields=['content_type', 'object_id', 'depth', 'timestamp', 'id'], name='comment_thread_roots_idx'),
+            # Prefix (LIKE 'path/%') scans for whole subtrees
+            models.Index(fields=['path'], name='comment_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
 class FeaturedContent(models.Model):
     """
@@ -262,6 +400,45 @@ class FeaturedContent(models.Model):
         unique_together = ('section', 'content_type', 'object_id')
 
 
+class FeedEntry(models.Model):
+    """
+    Denormalized row per Post/Event/Business backing the unified activity feed.
+    Kept in sync by signals; rebuild with `manage.py rebuild_feed`.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    created_at = models.DateTimeField()
+    summary = models.JSONField(default=dict, help_text="Prebuilt card payload served as-is by the feed")
+
+    def __str__(self):
+        return f"{self.content_type.model} #{self.object_id}"
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = "Feed entries"
+        unique_together = ('content_type', 'object_id')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='feedentry_created_id_idx'),
+            models.Index(fields=['content_type', 'created_at', 'id'], name='feedentry_type_created_idx'),
+        ]
+
+class CounterFlushProgress(models.Model):
+    """
+    How far `manage.py flush_counters` has applied one bucket's journal. Advanced
+    in the same transaction as the counter UPDATEs, so an overlapping or retried
+    flush never applies a delta twice. The newest flushed bucket is where the
+    next flush resumes.
+    """
+    bucket = models.BigIntegerField(unique=True)
+    applied_through = models.PositiveIntegerField(default=0)
+    flushed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Counter bucket {self.bucket} through {self.applied_through}"
+
+
 # ===============================================
 # 5. E-COMMERCE MODELS
 # ===============================================
@@ -276,12 +453,25 @@ class Order(models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
     tax = models.DecimalField(max_digits=10, decimal_places=2)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    # Client-supplied key for checkout retries; one order per (user, key)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # SHA-256 of the normalized cart, so a key replayed with a different cart is refused
+    cart_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return f"Order #{self.pk} by {self.user.username}"
     
     class Meta:
-        ordering = ['-order_date']
+        ordering = ['-order_date', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='order_user_idempotency_key'),
+        ]
+        indexes = [
+            # One user's order history, keyset-paged by (order_date, id)
+            models.Index(fields=['user', 'order_date', 'id'], name='order_user_date_idx'),
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+        ]
 
 class OrderItem(models.Model):
     """
@@ -300,4 +490,64 @@ class OrderItem(models.Model):
     # but storing denormalized data (name, price) is safer for historical accuracy.
     
     def __str__(self):
-        return f"{self.quantity} x {self.name} in Order #{self.order.pk}"
\ No newline at end of file
+        return f"{self.quantity} x {self.name} in Order #{self.order.pk}"
+
+
+# ===============================================
+# 6. ANALYTICS ROLLUPS
+# ===============================================
+# Daily aggregates maintained by mytribe.analytics. Reports read only these
+# tables; the raw Order/OrderItem/CustomUser rows are touched only when a day
+# is (re)built.
+
+class SalesRollup(models.Model):
+    """Order totals for one calendar day"""
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Sales on {self.date}"
+
+    class Meta:
+        ordering = ['date']
+
+class ItemSalesRollup(models.Model):
+    """Units and revenue for one OrderItem.item_type on one calendar day"""
+    date = models.DateField()
+    item_type = models.CharField(max_length=50)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.item_type} sales on {self.date}"
+
+    class Meta:
+        ordering = ['date', 'item_type']
+        unique_together = ('date', 'item_type')
+
+class MemberSignupRollup(models.Model):
+    """Members who joined on one calendar day, by their membership tier (null for none)"""
+    date = models.DateField()
+    membership_tier = models.ForeignKey(MembershipTier, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    new_members = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Signups on {self.date}"
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'membership_tier'], nulls_distinct=False, name='member_signup_rollup_unique'),
+        ]
+
+class RollupDirtyDay(models.Model):
+    """A day whose rollups are out of date; written by signals, consumed by analytics.refresh_dirty()"""
+    date = models.DateField(unique=True)
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return str(self.date)
+
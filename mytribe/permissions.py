@@ -0,0 +1,226 @@
+# mytribe/permissions.py
+
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from rest_framework.permissions import BasePermission
+
+from . import cache
+from .models import Post, UserRole
+
+# ===============================================
+# ROLE PERMISSION MATRIX
+# ===============================================
+# UserRole.permissions holds JSON such as {'News': {'read': true, 'create': false}}.
+# Each role is compiled once into a single int with one bit per (section,
+# action), so a check is a dict lookup and a bit test. Sections and actions a
+# role does not mention keep the BASELINE grant, which is what the API allowed
+# before roles were enforced. Staff pass every check.
+
+SECTIONS = ('News', 'Articles', 'Events', 'Businesses', 'Comments', 'Orders')
+ACTIONS = ('read', 'create', 'update', 'delete')
+
+BITS = {
+    (section, action): 1 << (index * len(ACTIONS) + offset)
+    for index, section in enumerate(SECTIONS)
+    for offset, action in enumerate(ACTIONS)
+}
+
+BASELINE = {
+    'News': ('read',),
+    'Articles': ('read',),
+    'Events': ('read',),
+    'Businesses': ('read',),
+    'Comments': ('read', 'create'),
+    'Orders': ('read', 'create'),
+}
+
+BASELINE_MASK = sum(BITS[section, action] for section, actions in BASELINE.items() for action in actions)
+
+# Sections of the content types outside Posts, whose kinds split them between News and Articles
+TYPE_SECTIONS = {'event': 'Events', 'business': 'Businesses'}
+POST_KIND_SECTIONS = {Post.KIND_NEWS: 'News', Post.KIND_ARTICLE: 'Articles'}
+
+ROLE_LABEL = UserRole._meta.label_lower
+
+
+def compile_permissions(permissions):
+    """Fold a role's JSON onto the baseline; unknown sections, actions and non-boolean values are ignored"""
+    mask = BASELINE_MASK
+    if not isinstance(permissions, dict):
+        return mask
+    for section, actions in permissions.items():
+        if not isinstance(actions, dict):
+            continue
+        for action, allowed in actions.items():
+            bit = BITS.get((section, action))
+            if bit is None or not isinstance(allowed, bool):
+                continue
+            mask = mask | bit if allowed else mask & ~bit
+    return mask
+
+
+def validation_errors(permissions):
+    """Messages for anything compile_permissions() would ignore"""
+    if not isinstance(permissions, dict):
+        return ['Permissions must be an object of sections.']
+    errors = []
+    for section, actions in permissions.items():
+        if section not in SECTIONS:
+            errors.append(f"Unknown section '{section}'; expected one of {', '.join(SECTIONS)}.")
+        elif not isinstance(actions, dict):
+            errors.append(f"'{section}' must map actions to true or false.")
+        else:
+            for action, allowed in actions.items():
+                if action not in ACTIONS:
+                    errors.append(f"Unknown action '{section}.{action}'; expected one of {', '.join(ACTIONS)}.")
+                elif not isinstance(allowed, bool):
+                    errors.append(f"'{section}.{action}' must be true or false.")
+    return errors
+
+# ===============================================
+# IN-PROCESS CACHE
+# ===============================================
+# Every role is compiled at once (there are only a handful). The compiled map
+# is tagged with the role generation from the shared cache, which a role save
+# bumps; each process re-reads that generation at most every
+# ROLE_PERMISSION_RECHECK seconds, and the process that saved re-reads at once.
+
+_compiled = {}
+_generation = None
+_checked_at = float('-inf')
+_lock = threading.Lock()
+
+
+def recheck_due():
+    return time.monotonic() - _checked_at >= getattr(settings, 'ROLE_PERMISSION_RECHECK', 5)
+
+
+def compiled_roles():
+    """role id -> compiled mask"""
+    global _compiled, _generation, _checked_at
+    if not recheck_due():
+        return _compiled
+    with _lock:
+        now = time.monotonic()
+        if now - _checked_at >= getattr(settings, 'ROLE_PERMISSION_RECHECK', 5):
+            generation, = cache.get_generations([ROLE_LABEL])
+            if generation != _generation:
+                _compiled = {pk: compile_permissions(permissions)
+                             for pk, permissions in UserRole.objects.values_list('pk', 'permissions')}
+                _generation = generation
+            _checked_at = now
+    return _compiled
+
+
+async def aprepare():
+    """
+    For async views: do any due recheck in a worker thread, so the permission
+    checks that follow are pure in-memory work on the event loop.
+    """
+    if recheck_due():
+        await sync_to_async(compiled_roles)()
+
+
+def expire():
+    global _checked_at
+    _checked_at = float('-inf')
+
+
+def invalidate():
+    """Recompile after the current transaction commits, here and (via the generation) in every other process"""
+    def bump():
+        cache.bump(ROLE_LABEL)
+        expire()
+    transaction.on_commit(bump)
+
+
+def role_mask(user):
+    if not user.is_authenticated or user.role_id is None:
+        return BASELINE_MASK
+    return compiled_roles().get(user.role_id, BASELINE_MASK)
+
+
+def allows(user, section, action):
+    if user.is_staff:
+        return True
+    return bool(role_mask(user) & BITS[section, action])
+
+
+def readable_post_kinds(user):
+    return [kind for kind, section in POST_KIND_SECTIONS.items() if allows(user, section, 'read')]
+
+# ===============================================
+# DRF PERMISSION
+# ===============================================
+
+DEFAULT_ACTIONS = {
+    'list': 'read',
+    'retrieve': 'read',
+    'create': 'create',
+    'update': 'update',
+    'partial_update': 'update',
+    'destroy': 'delete',
+}
+
+
+def requirements(view):
+    """
+    (section or None, action) pairs the view's current action needs. Views map
+    extra actions in role_actions to an action name or a tuple of them; a
+    'Section.action' entry names a section other than the view's own.
+    """
+    needed = getattr(view, 'role_actions', {}).get(view.action, DEFAULT_ACTIONS.get(view.action))
+    if needed is None:
+        return ()
+    if isinstance(needed, str):
+        needed = (needed,)
+    return tuple(tuple(item.split('.', 1)) if '.' in item else (None, item) for item in needed)
+
+
+class RolePermission(BasePermission):
+    """
+    Check the caller's role against the view's section. Views set role_section
+    or override get_role_sections(obj=None) when the section depends on the
+    object; with several candidate sections, any one granting the action will
+    do until the object is known. Actions without a mapping are left to the
+    view's other permissions. A view's role_owner_field lets authors update or
+    delete their own objects whatever their role says.
+    """
+
+    owner_actions = ('update', 'delete')
+
+    def has_permission(self, request, view):
+        needed = requirements(view)
+        if getattr(view, 'role_owner_field', None):
+            # Ownership is only known once the object is loaded
+            needed = tuple(item for item in needed if item[1] not in self.owner_actions)
+        sections = view.get_role_sections()
+        return all(
+            any(allows(request.user, section, action) for section in ((section,) if section else sections))
+            for section, action in needed
+        )
+
+    def has_object_permission(self, request, view, obj):
+        needed = requirements(view)
+        owner_field = getattr(view, 'role_owner_field', None)
+        if (owner_field and request.user.is_authenticated
+                and getattr(obj, f'{owner_field}_id') == request.user.pk):
+            needed = tuple(item for item in needed if item[1] not in self.owner_actions)
+        sections = view.get_role_sections(obj)
+        return all(
+            all(allows(request.user, section, action) for section in ((section,) if section else sections))
+            for section, action in needed
+        )
+
+
+class RoleSectionMixin:
+    """Supplies get_role_sections() from a fixed role_section"""
+    role_section = None
+    role_actions = {}
+
+    def get_role_sections(self, obj=None):
+        return (self.role_section,)
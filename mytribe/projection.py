@@ -0,0 +1,94 @@
+# mytribe/projection.py
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+
+# ===============================================
+# SPARSE FIELDSETS
+# ===============================================
+
+class SparseFieldsetMixin:
+    """
+    Let clients choose which serializer fields they get back with ?fields=a,b,
+    ?exclude=a,b or a named ?preset= from field_presets, and narrow the SQL to
+    match: unrequested columns are deferred with only(), and relations are only
+    joined or prefetched when one of their fields is actually rendered.
+
+    The serializer must accept a `fields` argument (see DynamicFieldsMixin).
+    """
+    field_presets = {}
+    # Columns the viewset itself needs regardless of selection (keyset cursors use created_at)
+    always_load = ('id', 'created_at')
+
+    def get_requested_fields(self):
+        """Return the set of serializer field names to render, or None for all of them"""
+        params = self.request.query_params
+        available = self.get_available_fields()
+        selected = None
+
+        preset = params.get('preset')
+        if preset:
+            if preset not in self.field_presets:
+                raise ValidationError({'preset': f"Unknown preset '{preset}'. Choose from: {', '.join(self.field_presets)}"})
+            if self.field_presets[preset] is not None:
+                selected = set(self.field_presets[preset])
+
+        if params.get('fields'):
+            selected = self.parse_field_list('fields', available)
+        if params.get('exclude'):
+            selected = (selected if selected is not None else set(available)) - self.parse_field_list('exclude', available)
+
+        return selected
+
+    def parse_field_list(self, param, available):
+        names = {name.strip() for name in self.request.query_params[param].split(',') if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({param: f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        return names
+
+    def get_available_fields(self):
+        if not hasattr(self, '_available_fields'):
+            self._available_fields = self.get_serializer_class()().fields
+        return self._available_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, 'request', None) is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def project_queryset(self, queryset):
+        """Load only the columns and relations the rendered fields need"""
+        if self.request.method != 'GET' or self.action not in ('list', 'retrieve'):
+            return queryset
+        available = self.get_available_fields()
+        selected = self.get_requested_fields()
+        names = available if selected is None else selected
+        model = queryset.model
+
+        columns = set(self.always_load)
+        select_related = []
+        prefetch = []
+        for name in names:
+            source = available[name].source
+            if source == '*':
+                continue
+            try:
+                model_field = model._meta.get_field(source.split('.')[0])
+            except FieldDoesNotExist:
+                continue
+            if model_field.many_to_many:
+                prefetch.append(Prefetch(model_field.name, queryset=model_field.related_model.objects.only('pk')))
+            elif model_field.concrete:
+                columns.add(model_field.name)
+                if model_field.is_relation:
+                    select_related.append(model_field.name)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if selected is not None:
+            queryset = queryset.only(*columns)
+        return queryset
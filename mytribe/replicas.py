@@ -0,0 +1,296 @@
+# mytribe/replicas.py
+
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import LazyObject
+
+logger = logging.getLogger(__name__)
+
+# ===============================================
+# READ REPLICAS
+# ===============================================
+# Reads made while serving a view action that opts in (replica_actions on a
+# viewset, @replica_reads on a function view) go to one healthy replica from
+# DATABASE_REPLICAS, picked once per request. Everything else reads the
+# primary: writes, reads inside a transaction, reads made before the caller is
+# known, reads after the request has written anything, and every read by a
+# user who wrote within the last REPLICA_PIN_SECONDS (read-your-writes).
+# Outside a request (commands, workers, shell) all queries use the primary.
+
+PIN_PREFIX = 'replica:pin'
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_route = contextvars.ContextVar('replica_route', default=None)
+_primary_only = contextvars.ContextVar('replica_primary_only', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def replica_reads(view_func):
+    """Let a function view's queries be served by a replica"""
+    view_func.replica_reads = True
+    return view_func
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. while filling a shared cache"""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+# ===============================================
+# STICKY PRIMARY
+# ===============================================
+
+# Pins live in the default cache. Only a shared cache (REDIS_URL) lets a write
+# handled by one worker pin the user's next reads in every other worker; with
+# the per-process LocMemCache another worker can serve them from a replica
+# that has not caught up. The replicas.W001 check warns about that setup.
+
+def pin_key(user_id):
+    return f'{PIN_PREFIX}:{user_id}'
+
+
+def pin_cache():
+    return caches['default']
+
+
+def is_pinned(user_id):
+    return pin_cache().get(pin_key(user_id)) is not None
+
+
+def pin(user_id):
+    pin_cache().set(pin_key(user_id), 1, pin_seconds())
+
+
+async def apin(user_id):
+    await pin_cache().aset(pin_key(user_id), 1, pin_seconds())
+
+
+def resolved_user(request):
+    """request.user once authentication has run, else None"""
+    user = getattr(request, 'user', None)
+    # AuthenticationMiddleware's lazy user is replaced by DRF (and the async
+    # views) with the authenticated user
+    if user is None or isinstance(user, LazyObject):
+        return None
+    return user
+
+
+class Route:
+    """Routing state for one request"""
+
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+        self.wrote = False
+
+    def eligible(self):
+        request = self.request
+        match = getattr(request, 'resolver_match', None)
+        if match is None or request.method not in ('GET', 'HEAD'):
+            return False
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is None:
+            return getattr(match.func, 'replica_reads', False)
+        action = (getattr(match.func, 'actions', None) or {}).get('get')
+        return action in getattr(view_class, 'replica_actions', ())
+
+    def read_alias(self):
+        if self.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if self.alias is None:
+            user = resolved_user(self.request)
+            if user is None:
+                # Authentication itself reads the primary
+                return DEFAULT_DB_ALIAS
+            replicas = healthy_replicas() if self.eligible() else []
+            if replicas and user.is_authenticated and is_pinned(user.pk):
+                replicas = []
+            self.alias = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return self.alias
+
+    def writer_id(self):
+        """The user to pin after this request, if it wrote"""
+        if not self.wrote:
+            return None
+        user = resolved_user(self.request)
+        return user.pk if user is not None and user.is_authenticated else None
+
+@checks.register(checks.Tags.database)
+def check_pin_cache(app_configs=None, **kwargs):
+    if replica_aliases() and isinstance(pin_cache(), LocMemCache):
+        return [checks.Warning(
+            "Read replicas are configured but read-your-writes pins are kept in a per-process LocMemCache.",
+            hint="Set REDIS_URL (or another shared CACHES['default']) so every worker sees a user's pin.",
+            id='replicas.W001',
+        )]
+    return []
+
+# ===============================================
+# HEALTH AND LAG
+# ===============================================
+# Each process re-measures a replica at most every REPLICA_CHECK_INTERVAL
+# seconds, on whichever request thread gets there first; the others keep the
+# last result rather than wait. Replicas that fail the check or lag more than
+# REPLICA_MAX_LAG seconds are skipped until a later check passes, and a query
+# error on a replica takes it out of rotation at once. Until a replica's first
+# check completes, reads stay on the primary.
+
+_health = {}  # alias -> (healthy, lag seconds or None, checked_at)
+_lock = threading.Lock()
+
+
+def measure_lag(alias):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_LAG_SQL)
+        else:
+            # Stand-ins (e.g. a copy of a SQLite database) only prove they answer
+            cursor.execute('SELECT 0')
+        return float(cursor.fetchone()[0] or 0)
+
+
+def check(alias):
+    """(healthy, lag) for one replica, measured now"""
+    try:
+        lag = measure_lag(alias)
+    except DatabaseError:
+        logger.warning("Read replica %s failed its health check", alias, exc_info=True)
+        connections[alias].close()
+        return False, None
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+    if lag > max_lag:
+        logger.warning("Read replica %s is %.1fs behind (limit %ss)", alias, lag, max_lag)
+    return lag <= max_lag, lag
+
+
+def healthy_replicas():
+    aliases = replica_aliases()
+    if not aliases:
+        return []
+    interval = getattr(settings, 'REPLICA_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    if any(now - _health.get(alias, (False, None, float('-inf')))[2] >= interval for alias in aliases):
+        if _lock.acquire(blocking=False):
+            try:
+                for alias in aliases:
+                    if now - _health.get(alias, (False, None, float('-inf')))[2] >= interval:
+                        _health[alias] = (*check(alias), time.monotonic())
+            finally:
+                _lock.release()
+    return [alias for alias in aliases if _health.get(alias, (False,))[0]]
+
+
+def mark_down(alias):
+    _health[alias] = (False, None, time.monotonic())
+
+
+def status():
+    """alias -> {'healthy', 'lag'} for every replica, measured now"""
+    result = {}
+    for alias in replica_aliases():
+        healthy, lag = check(alias)
+        _health[alias] = (healthy, lag, time.monotonic())
+        result[alias] = {'healthy': healthy, 'lag': lag}
+    return result
+
+# ===============================================
+# ROUTER AND MIDDLEWARE
+# ===============================================
+
+class ReplicaRouter:
+    """Database router for the primary and its DATABASE_REPLICAS"""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the row they start from
+            return instance._state.db
+        route = _route.get()
+        if route is None or _primary_only.get():
+            return DEFAULT_DB_ALIAS
+        return route.read_alias()
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None:
+            route.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Scope replica routing to the request, and pin users who wrote to the primary"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        route = Route(request)
+        token = _route.set(route)
+        try:
+            return self.get_response(request)
+        finally:
+            _route.reset(token)
+            user_id = route.writer_id()
+            if user_id is not None:
+                pin(user_id)
+
+    async def __acall__(self, request):
+        route = Route(request)
+        token = _route.set(route)
+        try:
+            return await self.get_response(request)
+        finally:
+            _route.reset(token)
+            user_id = route.writer_id()
+            if user_id is not None:
+                await apin(user_id)
+
+    def process_exception(self, request, exception):
+        route = _route.get()
+        if isinstance(exception, DatabaseError) and route is not None and route.alias in replica_aliases():
+            logger.warning("Taking read replica %s out of rotation after a query error", route.alias)
+            mark_down(route.alias)
+        return None
@@ -0,0 +1,165 @@
+# mytribe/search.py
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F
+
+from . import permissions
+from .models import CONTENT_MODELS
+
+# ===============================================
+# SEARCH CONFIGURATION
+# ===============================================
+
+SEARCH_LANGUAGE = 'english'
+
+# (field, weight) pairs folded into each model's search_vector column
+SEARCH_FIELDS = {
+    'post': [('title', 'A'), ('description', 'B')],
+    'event': [('title', 'A'), ('location', 'B'), ('description', 'C')],
+    'business': [('name', 'A'), ('category', 'B'), ('description', 'C'), ('address', 'D')],
+}
+
+TITLE_FIELDS = {
+    'post': 'title',
+    'event': 'title',
+    'business': 'name',
+}
+
+HEADLINE_OPTIONS = {
+    'start_sel': '<mark>',
+    'stop_sel': '</mark>',
+    'max_words': 35,
+    'min_words': 15,
+    'max_fragments': 2,
+}
+
+MAX_RESULTS = 50
+# Deepest page served; every type ranks offset + limit rows to merge them
+MAX_OFFSET = 500
+
+
+def build_vector(search_type):
+    """Weighted tsvector expression for one content type"""
+    vector = None
+    for field, weight in SEARCH_FIELDS[search_type]:
+        part = SearchVector(field, weight=weight, config=SEARCH_LANGUAGE)
+        vector = part if vector is None else vector + part
+    return vector
+
+# ===============================================
+# INDEX MAINTENANCE
+# ===============================================
+
+def update_vector(search_type, pk):
+    """Recompute the search vector for a single row in the database"""
+    model = CONTENT_MODELS[search_type]
+    model.objects.filter(pk=pk).update(search_vector=build_vector(search_type))
+
+
+def update_vectors(search_type, pks, chunk_size=5000):
+    """Recompute search vectors for many rows, one UPDATE per chunk of primary keys"""
+    model = CONTENT_MODELS[search_type]
+    vector = build_vector(search_type)
+    pks = list(pks)
+    for start in range(0, len(pks), chunk_size):
+        model.objects.filter(pk__in=pks[start:start + chunk_size]).update(search_vector=vector)
+
+
+def indexed_fields(search_type):
+    return {field for field, _ in SEARCH_FIELDS[search_type]}
+
+
+def reindex(search_type, chunk_size=5000, stdout=None):
+    """
+    Recompute search vectors for a whole table as set-based UPDATEs over
+    primary-key ranges, so each statement touches a bounded number of rows.
+    """
+    model = CONTENT_MODELS[search_type]
+    vector = build_vector(search_type)
+    pks = model.objects.order_by('pk').values_list('pk', flat=True)
+
+    last_pk = 0
+    updated = 0
+    while True:
+        upper = list(pks.filter(pk__gt=last_pk)[chunk_size - 1:chunk_size])
+        if upper:
+            updated += model.objects.filter(pk__gt=last_pk, pk__lte=upper[0]).update(search_vector=vector)
+            last_pk = upper[0]
+        else:
+            updated += model.objects.filter(pk__gt=last_pk).update(search_vector=vector)
+            break
+    if stdout is not None:
+        stdout.write(f"{search_type}: {updated} rows indexed")
+    return updated
+
+# ===============================================
+# QUERYING
+# ===============================================
+
+def search_type_queryset(search_type, query, user=None):
+    """
+    Ranked matches for one content type that the user's role may read, or
+    None if it may read none of them
+    """
+    model = CONTENT_MODELS[search_type]
+    queryset = model.objects.filter(search_vector=query)
+    if user is not None:
+        if search_type == 'post':
+            kinds = permissions.readable_post_kinds(user)
+            if not kinds:
+                return None
+            if len(kinds) < len(permissions.POST_KIND_SECTIONS):
+                queryset = queryset.filter(kind__in=kinds)
+        elif not permissions.allows(user, permissions.TYPE_SECTIONS[search_type], 'read'):
+            return None
+    return (queryset
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-created_at', '-id'))
+
+
+def search(text, types=None, limit=20, offset=0, user=None):
+    """
+    Search across the requested content types and merge the results by rank.
+    Ranking reads only ids, ranks and dates; titles and highlighted headlines
+    are fetched for the returned page alone. Returns a list of plain dicts
+    ready for the response.
+    """
+    types = [t for t in (types or CONTENT_MODELS) if t in CONTENT_MODELS]
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_LANGUAGE)
+    window = min(offset, MAX_OFFSET) + limit
+
+    ranked = []
+    for search_type in types:
+        queryset = search_type_queryset(search_type, query, user)
+        if queryset is None:
+            continue
+        for row in queryset.values('id', 'rank', 'created_at')[:window]:
+            ranked.append((row['rank'], row['created_at'], row['id'], search_type))
+    ranked.sort(reverse=True)
+    page = ranked[window - limit:window]
+
+    details = {}
+    for search_type in {search_type for *_, search_type in page}:
+        title_field = TITLE_FIELDS[search_type]
+        rows = (CONTENT_MODELS[search_type].objects
+                .filter(pk__in=[pk for _, _, pk, row_type in page if row_type == search_type])
+                .annotate(headline=SearchHeadline('description', query, config=SEARCH_LANGUAGE, **HEADLINE_OPTIONS))
+                .values('id', title_field, 'image_url', 'headline'))
+        for row in rows:
+            details[search_type, row['id']] = row
+
+    results = []
+    for rank, created_at, pk, search_type in page:
+        row = details.get((search_type, pk))
+        if row is None:
+            continue  # deleted since it was ranked
+        results.append({
+            'type': search_type,
+            'id': pk,
+            'title': row[TITLE_FIELDS[search_type]],
+            'image_url': row['image_url'],
+            'created_at': created_at,
+            'rank': rank,
+            'headline': row['headline'],
+        })
+    return results
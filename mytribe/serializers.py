@@ -1,9 +1,52 @@
 # mytribe/serializers.py
 
 from rest_framework import serializers
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import *
+from . import analytics, counters, exports, images, permissions, threads
+from .backends import find_user
+
+class DynamicFieldsMixin:
+    """
+    Accepts an optional `fields` argument naming the subset of fields to render.
+    Used by SparseFieldsetMixin for ?fields= / ?exclude= / ?preset= requests.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class PendingCountersListSerializer(serializers.ListSerializer):
+    """Looks up buffered counter deltas for a whole page at once"""
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Rows merged earlier (see counters.amerge_pending) are not looked up again
+        unmerged = [item for item in items if not getattr(item, 'pending_counters_merged', False)]
+        pending = counters.pending_many(self.child.Meta.model, [item.pk for item in unmerged])
+        for item in unmerged:
+            counters.merge_pending(item, pending)
+            item.pending_counters_merged = True
+        return super().to_representation(items)
+
+class PendingCountersMixin:
+    """
+    Render likes/comments_count/shares including deltas still buffered by
+    mytribe.counters, plus the caller's liked_by_me flag (annotated by the view).
+    """
+    def get_liked_by_me(self, obj):
+        return getattr(obj, 'liked_by_me', False)
+
+    def to_representation(self, instance):
+        if not getattr(instance, 'pending_counters_merged', False):
+            counters.merge_pending(instance, counters.pending_many(type(instance), [instance.pk]))
+        return super().to_representation(instance)
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -13,6 +56,11 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ('username', 'email', 'password', 'password_confirm', 'first_name', 'last_name')
     
+    def validate_email(self, value):
+        if value and find_user(value) is not None:
+            raise serializers.ValidationError("A user with this email already exists.")
+        return value
+    
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
@@ -26,6 +74,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     profile_picture_url = serializers.SerializerMethodField()
     cover_photo_url = serializers.SerializerMethodField()
+    profile_picture_srcset = serializers.SerializerMethodField()
+    cover_photo_srcset = serializers.SerializerMethodField()
     membership_tier_id = serializers.SerializerMethodField()
     
     class Meta:
@@ -33,26 +83,30 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 
                  'profile_picture', 'cover_photo', 'bio', 'address', 
                  'phone', 'age', 'gender', 'location', 'membership_tier',
-                 'profile_picture_url', 'cover_photo_url', 'membership_tier_id')
+                 'profile_picture_url', 'cover_photo_url', 'profile_picture_srcset', 'cover_photo_srcset',
+                 'membership_tier_id')
     
     def get_profile_picture_url(self, obj):
-        if obj.profile_picture:
-            return obj.profile_picture.url
-        return None
+        # The largest WebP derivative once it exists, the original until then
+        return images.best_url(obj.profile_picture, obj.profile_picture_variants)
     
     def get_cover_photo_url(self, obj):
-        if obj.cover_photo:
-            return obj.cover_photo.url
-        return None
+        return images.best_url(obj.cover_photo, obj.cover_photo_variants)
+    
+    def get_profile_picture_srcset(self, obj):
+        return images.srcset(obj.profile_picture, obj.profile_picture_variants)
+    
+    def get_cover_photo_srcset(self, obj):
+        return images.srcset(obj.cover_photo, obj.cover_photo_variants)
     
     def get_membership_tier_id(self, obj):
-        if obj.membership_tier:
-            return obj.membership_tier.id
-        return None
+        return obj.membership_tier_id
     
 class UserProfileSerializer(serializers.ModelSerializer):
     profile_picture_url = serializers.SerializerMethodField()
     cover_photo_url = serializers.SerializerMethodField()
+    profile_picture_srcset = serializers.SerializerMethodField()
+    cover_photo_srcset = serializers.SerializerMethodField()
     membership_tier_id = serializers.SerializerMethodField()
     name = serializers.SerializerMethodField()
     
@@ -61,23 +115,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'name',
                  'profile_picture', 'cover_photo', 'bio', 'address', 
                  'phone', 'age', 'gender', 'location', 'membership_tier',
-                 'profile_picture_url', 'cover_photo_url', 'membership_tier_id')
+                 'profile_picture_url', 'cover_photo_url', 'profile_picture_srcset', 'cover_photo_srcset',
+                 'membership_tier_id')
         read_only_fields = ('username', 'email')  # These shouldn't be changed via profile update
     
     def get_profile_picture_url(self, obj):
-        if obj.profile_picture:
-            return obj.profile_picture.url
-        return None
+        # The largest WebP derivative once it exists, the original until then
+        return images.best_url(obj.profile_picture, obj.profile_picture_variants)
     
     def get_cover_photo_url(self, obj):
-        if obj.cover_photo:
-            return obj.cover_photo.url
-        return None
+        return images.best_url(obj.cover_photo, obj.cover_photo_variants)
+    
+    def get_profile_picture_srcset(self, obj):
+        return images.srcset(obj.profile_picture, obj.profile_picture_variants)
+    
+    def get_cover_photo_srcset(self, obj):
+        return images.srcset(obj.cover_photo, obj.cover_photo_variants)
     
     def get_membership_tier_id(self, obj):
-        if obj.membership_tier:
-            return obj.membership_tier.id
-        return None
+        return obj.membership_tier_id
     
     def get_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
@@ -100,13 +156,20 @@ class ChangePasswordSerializer(serializers.Serializer):
     def save(self, **kwargs):
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
-        user.save()
+        # Tokens issued before the change stop working on their next request
+        user.token_version += 1
+        user.save(update_fields=['password', 'token_version'])
         return user
 
 class PlatformSettingsSerializer(serializers.ModelSerializer):
+    logo_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = PlatformSettings
-        fields = '__all__'
+        exclude = ('logo_variants',)
+
+    def get_logo_srcset(self, obj):
+        return images.srcset(obj.logo, obj.logo_variants)
 
 class SectionConfigSerializer(serializers.ModelSerializer):
     class Meta:
@@ -114,39 +177,105 @@ class SectionConfigSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class SplashThemeSerializer(serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = SplashTheme
-        fields = '__all__'
+        exclude = ('image_variants',)
+
+    def get_image_srcset(self, obj):
+        return images.srcset(obj.image, obj.image_variants)
+
+class PublicSectionSerializer(serializers.ModelSerializer):
+    splash_theme = SplashThemeSerializer(read_only=True)
+
+    class Meta:
+        model = SectionConfig
+        fields = ('id', 'section_id', 'title', 'splash_theme')
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, PendingCountersMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
-        fields = '__all__'
+        exclude = ('search_vector', 'liked_by')
+        list_serializer_class = PendingCountersListSerializer
+
+class EventSerializer(DynamicFieldsMixin, PendingCountersMixin, serializers.ModelSerializer):
+    liked_by_me = serializers.SerializerMethodField()
 
-class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ('search_vector', 'liked_by')
+        list_serializer_class = PendingCountersListSerializer
+
+class BusinessSerializer(DynamicFieldsMixin, PendingCountersMixin, serializers.ModelSerializer):
+    liked_by_me = serializers.SerializerMethodField()
 
-class BusinessSerializer(serializers.ModelSerializer):
     class Meta:
         model = Business
-        fields = '__all__'
+        exclude = ('search_vector', 'liked_by')
+        list_serializer_class = PendingCountersListSerializer
+
+# Compact card payloads, shared by the ?preset=card viewsets and embedded content
+CONTENT_CARD_FIELDS = {
+    'post': ('id', 'title', 'image_url', 'category', 'kind', 'author', 'likes', 'comments_count', 'created_at'),
+    'event': ('id', 'title', 'image_url', 'date', 'location', 'likes', 'comments_count', 'created_at'),
+    'business': ('id', 'name', 'image_url', 'category', 'promotion', 'likes', 'comments_count', 'created_at'),
+}
+
+CONTENT_SERIALIZERS = {
+    'post': PostSerializer,
+    'event': EventSerializer,
+    'business': BusinessSerializer,
+}
+
+def serialize_card(instance, context=None):
+    """Card payload for a Post/Event/Business, tagged with its type; None for anything else"""
+    content_type = content_model_name(type(instance))
+    if content_type is None:
+        return None
+    serializer = CONTENT_SERIALIZERS[content_type](instance, fields=CONTENT_CARD_FIELDS[content_type], context=context or {})
+    return {'type': content_type, **serializer.data}
 
 class CommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
+    more_replies = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = '__all__'
-        read_only_fields = ('author', 'timestamp', 'content_type', 'object_id')
+        exclude = ('path',)
+        read_only_fields = ('author', 'timestamp', 'content_type', 'object_id', 'depth')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # The materialized path is written once, so a comment cannot be moved to another parent
+            fields['parent'].read_only = True
+        return fields
 
     def get_replies(self, obj):
-        replies = obj.replies.all()
-        return CommentSerializer(replies, many=True).data
+        # Threads loaded through mytribe.threads arrive with their children attached;
+        # a lone comment (e.g. one just created) loads its own subtree in one query
+        if not hasattr(obj, 'thread_children'):
+            threads.attach_replies([obj])
+        return CommentSerializer(obj.thread_children, many=True, context=self.context).data
+
+    def get_more_replies(self, obj):
+        """Link to the next replies of this branch when the thread was cut short, keeping the thread limits"""
+        after = getattr(obj, 'more_replies_after', None)
+        if after is None:
+            return None
+        url = reverse('v1:comments-replies', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        if request is not None:
+            url = request.build_absolute_uri(url)
+            for param in ('depth', 'replies'):
+                if param in request.query_params:
+                    url = replace_query_param(url, param, request.query_params[param])
+        return replace_query_param(url, 'after', after) if after else url
 
 class FeaturedContentSerializer(serializers.ModelSerializer):
     content_object = serializers.SerializerMethodField()
@@ -156,8 +285,36 @@ class FeaturedContentSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_content_object(self, obj):
-        # This would need custom implementation based on your content types
-        return str(obj.content_object)
+        # Prefetch content_object with mytribe.generic, or this costs a query per row
+        return serialize_card(obj.content_object, self.context)
+
+class FeedEntrySerializer(serializers.ModelSerializer):
+    type = serializers.SerializerMethodField()
+    id = serializers.IntegerField(source='object_id', read_only=True)
+
+    class Meta:
+        model = FeedEntry
+        fields = ('type', 'id', 'created_at', 'summary')
+
+    def get_type(self, obj):
+        # get_for_id is served from ContentType's in-process cache
+        return ContentType.objects.get_for_id(obj.content_type_id).model
+
+class EngagementItemSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=sorted(CONTENT_MODELS))
+    id = serializers.IntegerField(min_value=1)
+
+class EngagementRequestSerializer(serializers.Serializer):
+    items = EngagementItemSerializer(many=True, allow_empty=False, max_length=100)
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    image_url = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    rank = serializers.FloatField()
+    headline = serializers.CharField()
 
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -166,11 +323,74 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
-    user = UserSerializer(read_only=True)
 
     class Meta:
         model = Order
-        fields = '__all__'
+        # Retry bookkeeping stays server-side
+        exclude = ('idempotency_key', 'cart_hash')
+        read_only_fields = ('user',)
+
+class CheckoutLineSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['membership', 'event'])
+    id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    billing = serializers.ChoiceField(choices=['monthly', 'annual'], required=False)
+
+    def validate(self, attrs):
+        if attrs['type'] == 'membership':
+            if 'billing' not in attrs:
+                raise serializers.ValidationError({'billing': 'Required for memberships'})
+            if attrs['quantity'] != 1:
+                raise serializers.ValidationError({'quantity': 'Memberships are bought one at a time'})
+        return attrs
+
+class CheckoutSerializer(serializers.Serializer):
+    """A cart to price and turn into an order; prices and totals are computed server-side"""
+    items = CheckoutLineSerializer(many=True, allow_empty=False, max_length=50)
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Compact order row; item_count and item_quantity are aggregated in SQL (see order_queryset)"""
+    item_count = serializers.IntegerField(read_only=True)
+    item_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'user', 'order_date', 'subtotal', 'tax', 'total', 'item_count', 'item_quantity')
+
+class AnalyticsReportSerializer(serializers.Serializer):
+    """Query parameters for the analytics report"""
+    metric = serializers.ChoiceField(choices=list(analytics.METRICS))
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.ChoiceField(choices=list(analytics.GRANULARITIES), default='day')
+    group_by = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': 'end must not be before start'})
+        group_by = attrs.get('group_by')
+        allowed = analytics.METRICS[attrs['metric']][2]
+        if group_by and group_by not in allowed:
+            raise serializers.ValidationError({'group_by': f"'{attrs['metric']}' can be grouped by: {', '.join(allowed) or 'nothing'}"})
+        return attrs
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Query parameters for the streaming exports (?output= because DRF reserves ?format=)"""
+    output = serializers.ChoiceField(choices=list(exports.OUTPUTS), default='csv')
+    gzip = serializers.BooleanField(default=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    tier = serializers.IntegerField(required=False, min_value=1)
+    type = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': 'end must not be before start'})
+        allowed = exports.EXPORTS[self.context['export']]['filters']
+        for key in ('tier', 'type'):
+            if key in attrs and key not in allowed:
+                raise serializers.ValidationError({key: f"This export cannot be filtered by {key}"})
+        return attrs
 
 class MembershipTierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -180,4 +400,11 @@ class MembershipTierSerializer(serializers.ModelSerializer):
 class UserRoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserRole
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def validate_permissions(self, value):
+        """Reject entries the permission engine would silently ignore"""
+        errors = permissions.validation_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
\ No newline at end of file
@@ -0,0 +1,203 @@
+# mytribe/signals.py
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analytics, authentication, cache, feed, images, landing, permissions, search
+from .models import (
+    Business, CustomUser, Event, FeaturedContent, MemberSignupRollup, MembershipTier, Order, OrderItem,
+    PlatformSettings, Post, SectionConfig, SplashTheme, UserRole, content_model_name, reclassify_post_kinds,
+)
+
+# ===============================================
+# ACTIVITY FEED
+# ===============================================
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Business)
+def sync_feed_entry(sender, instance, raw=False, **kwargs):
+    """Keep the materialized feed row in step with its content"""
+    if raw:
+        return
+    feed.sync_entry(instance)
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Business)
+def remove_feed_entry(sender, instance, **kwargs):
+    feed.remove_entry(instance)
+
+# ===============================================
+# RESPONSE CACHE GENERATIONS
+# ===============================================
+
+# liked_by through model -> the content model that owns it
+LIKED_BY_OWNERS = {model.liked_by.through: model for model in (Post, Event, Business)}
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Business)
+def bump_content_generation(sender, **kwargs):
+    cache.bump_on_commit(sender._meta.label_lower)
+
+@receiver(m2m_changed, sender=Post.liked_by.through)
+@receiver(m2m_changed, sender=Event.liked_by.through)
+@receiver(m2m_changed, sender=Business.liked_by.through)
+def bump_liked_generation(sender, action, **kwargs):
+    if action.startswith('post_'):
+        cache.bump_on_commit(LIKED_BY_OWNERS[sender]._meta.label_lower)
+
+# Columns only logins and password changes write, which no cached body shows
+UNCACHED_USER_FIELDS = {'last_login', 'password', 'token_version'}
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_author_generation(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Post bodies and landing cards nest their author, so profile edits retire them too"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) - UNCACHED_USER_FIELDS:
+        return
+    cache.bump_on_commit(sender._meta.label_lower)
+    landing.invalidate()
+
+@receiver(post_save, sender=PlatformSettings)
+@receiver(post_save, sender=MembershipTier)
+@receiver(post_save, sender=SectionConfig)
+@receiver(post_save, sender=SplashTheme)
+@receiver(post_delete, sender=PlatformSettings)
+@receiver(post_delete, sender=MembershipTier)
+@receiver(post_delete, sender=SectionConfig)
+@receiver(post_delete, sender=SplashTheme)
+def bump_public_settings_generation(sender, **kwargs):
+    """Retire the precomputed public settings payload"""
+    cache.bump_on_commit('public-settings')
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Business)
+@receiver(post_save, sender=FeaturedContent)
+@receiver(post_save, sender=SectionConfig)
+@receiver(post_save, sender=SplashTheme)
+@receiver(post_save, sender=PlatformSettings)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Business)
+@receiver(post_delete, sender=FeaturedContent)
+@receiver(post_delete, sender=SectionConfig)
+@receiver(post_delete, sender=SplashTheme)
+def bump_landing_generation(sender, **kwargs):
+    """Retire the section landing snapshots (PlatformSettings can reclassify posts)"""
+    landing.invalidate()
+
+# ===============================================
+# FULL-TEXT SEARCH
+# ===============================================
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Business)
+def update_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Refresh the row's tsvector when any indexed text field may have changed"""
+    if raw:
+        return
+    search_type = content_model_name(sender)
+    if update_fields is not None and not search.indexed_fields(search_type) & set(update_fields):
+        return
+    search.update_vector(search_type, instance.pk)
+
+# ===============================================
+# POST KINDS
+# ===============================================
+
+@receiver(post_save, sender=PlatformSettings)
+def reclassify_posts(sender, instance, raw=False, **kwargs):
+    """Category lists drive Post.kind, so re-derive it whenever settings are saved"""
+    if raw:
+        return
+    changed = reclassify_post_kinds(instance.categories)
+    if changed:
+        # The kind updates skip save(), so refresh the feed and retire cached post responses here
+        feed.sync_entries(Post, changed)
+        cache.bump_on_commit(Post._meta.label_lower)
+
+# ===============================================
+# ANALYTICS ROLLUPS
+# ===============================================
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def mark_order_day_dirty(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    analytics.mark_dirty_on_commit(analytics.local_date(instance.order_date))
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def mark_order_item_day_dirty(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    order_date = Order.objects.filter(pk=instance.order_id).values_list('order_date', flat=True).first()
+    # A missing order means it is being deleted, and marks its own day
+    if order_date is not None:
+        analytics.mark_dirty_on_commit(analytics.local_date(order_date))
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def mark_signup_day_dirty(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Signups are counted by join date and tier, so only those fields matter"""
+    if raw:
+        return
+    if update_fields is not None and not {'date_joined', 'membership_tier'} & set(update_fields):
+        return
+    analytics.mark_dirty_on_commit(analytics.local_date(instance.date_joined))
+
+@receiver(pre_delete, sender=MembershipTier)
+def mark_tier_days_dirty(sender, instance, **kwargs):
+    """The tier's members fall back to no tier, so every day it has signups changes"""
+    dates = list(MemberSignupRollup.objects.filter(membership_tier=instance).values_list('date', flat=True))
+    if dates:
+        analytics.mark_dirty_on_commit(*dates)
+
+# ===============================================
+# IMAGE DERIVATIVES
+# ===============================================
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=PlatformSettings)
+@receiver(post_save, sender=SplashTheme)
+def schedule_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Resize new or replaced uploads in the background once the save commits"""
+    if raw:
+        return
+    images.schedule_changed(instance, update_fields=update_fields)
+
+# ===============================================
+# AUTH SNAPSHOTS
+# ===============================================
+
+@receiver(post_save, sender=CustomUser)
+def publish_user_state(sender, instance, raw=False, **kwargs):
+    """Outstanding tokens are checked against the saved version, active flag and permission columns"""
+    if raw:
+        return
+    authentication.publish_on_commit(instance.pk, authentication.state_row(instance))
+
+@receiver(post_delete, sender=CustomUser)
+def revoke_deleted_user(sender, instance, **kwargs):
+    authentication.publish_on_commit(instance.pk)
+
+# ===============================================
+# ROLE PERMISSIONS
+# ===============================================
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def recompile_role_permissions(sender, raw=False, **kwargs):
+    if raw:
+        return
+    permissions.invalidate()
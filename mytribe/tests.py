@@ -1,3 +1,1570 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.core import checks
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from . import (
+    analytics, authentication, backends, cache, checkout, counters, exports, feed, images, imports, permissions, replicas,
+    search, threads,
+)
+from .models import *
+from .replicas import ReplicaRouter
+from .serializers import CONTENT_CARD_FIELDS
+from .throttles import LoginAccountThrottle, LoginIPThrottle
+
+
+# Benchmarks are slow and print timings; run them with MYTRIBE_BENCHMARKS=1
+benchmark = skipUnless(os.environ.get('MYTRIBE_BENCHMARKS'), 'set MYTRIBE_BENCHMARKS=1 to run benchmarks')
+
+
+def timed(label, runs, func):
+    """Run func `runs` times and print the mean latency"""
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    elapsed = (time.perf_counter() - started) / runs
+    print(f'\n{label}: {elapsed * 1000:.2f} ms')
+    return elapsed
+
+
+def run_threads(target, count):
+    """Run target(index) on `count` threads at once, each with its own connection"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(index):
+        try:
+            barrier.wait()
+            target(index)
+        except Exception as exc:  # surfaced by the caller
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def async_get(url, token=None, headers=None):
+    """GET through the ASGI handler"""
+    headers = dict(headers or {})
+    if token is not None:
+        headers['Authorization'] = f'Bearer {token}'
+    return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+
+class APITestBase(TestCase):
+    """Fresh cache per test; helpers for token clients and committed writes"""
+
+    def setUp(self):
+        caches['default'].clear()
+        permissions.expire()
+
+    def make_role(self, name, grants):
+        with self.committed():
+            return UserRole.objects.create(name=name, description='', permissions=grants)
+
+    def make_user(self, username, **fields):
+        return CustomUser.objects.create_user(username, f'{username}@example.com', 'pw12345!x', **fields)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {authentication.tokens_for_user(user).access_token}')
+        return client
+
+    def committed(self):
+        """Run on_commit hooks (cache bumps, state publishing) as a real commit would"""
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def make_post(self, title='Post', category='Local News', **fields):
+        with self.committed():
+            fields.setdefault('description', f'{title} body')
+            return Post.objects.create(title=title, category=category, **fields)
+
+    def make_event(self, title='Event', **fields):
+        with self.committed():
+            fields.setdefault('description', f'{title} body')
+            return Event.objects.create(title=title, date='Saturday', location='Town hall', **fields)
+
+    def make_business(self, name='Business', **fields):
+        with self.committed():
+            fields.setdefault('description', f'{name} body')
+            return Business.objects.create(name=name, category='Bakery', **fields)
+
+# ===============================================
+# KEYSET PAGINATION (user-001)
+# ===============================================
+
+class KeysetPaginationTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [self.make_post(f'Post {index}') for index in range(7)]
+        # Ties on created_at must still page without gaps or repeats
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[2:5]]).update(created_at=self.posts[2].created_at)
+        self.client = self.client_for(self.make_user('reader'))
+
+    def walk(self, url, link='next'):
+        ids = []
+        while url:
+            data = self.client.get(url).data
+            ids.extend(item['id'] for item in data['results'])
+            url = data[link]
+        return ids
+
+    def test_pages_cover_every_row_once_without_count(self):
+        url = '/api/v1/posts/?pagination=cursor&page_size=2'
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.walk(url)
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/api/v1/posts/?pagination=cursor&page_size=3').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual([item['id'] for item in back['results']], [item['id'] for item in first['results']])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/v1/posts/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_page_numbers_remain_the_default(self):
+        data = self.client.get('/api/v1/posts/').data
+        self.assertEqual(data['count'], 7)
+
+# ===============================================
+# ACTIVITY FEED (user-002)
+# ===============================================
+
+class FeedTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.make_post('Harbour news')
+        self.event = self.make_event('Harbour swim')
+        self.business = self.make_business('Harbour Bakery')
+
+    def feed(self, **params):
+        return APIClient().get('/api/v1/feed/', params).data['results']
+
+    def test_feed_mixes_types_newest_first_in_one_query(self):
+        self.feed()  # content types are cached per process after the first page
+        with self.assertNumQueries(1):
+            results = self.feed()
+        self.assertEqual([(item['type'], item['id']) for item in results],
+                         [('business', self.business.pk), ('event', self.event.pk), ('post', self.post.pk)])
+        self.assertEqual(results[2]['summary']['title'], 'Harbour news')
+
+    def test_type_filter(self):
+        self.assertEqual([item['type'] for item in self.feed(type='post,event')], ['event', 'post'])
+
+    def test_entries_follow_saves_and_deletes(self):
+        self.post.title = 'Harbour news, updated'
+        self.post.save()
+        self.event.delete()
+        results = self.feed()
+        self.assertEqual([item['type'] for item in results], ['business', 'post'])
+        self.assertEqual(results[1]['summary']['title'], 'Harbour news, updated')
+
+    def test_rebuild_restores_the_table(self):
+        before = self.feed()
+        feed.rebuild(chunk_size=2, truncate=True)
+        self.assertEqual(self.feed(), before)
+
+# ===============================================
+# FULL-TEXT SEARCH (user-003)
+# ===============================================
+
+class SearchTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_post('Harbour festival returns', category='Local News',
+                       description='The harbour festival returns with boats and music.')
+        self.make_post('Sourdough at home', category='Essay', description='A harbour town bakery shares its starter.')
+        self.make_event('Harbour swim', description='Open water swim across the harbour.')
+        self.make_business('Harbour Bakery', description='Fresh bread by the harbour.')
+
+    def test_ranks_all_types_with_headlines(self):
+        response = APIClient().get('/api/v1/search/', {'q': 'harbour'})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual({result['type'] for result in results}, {'post', 'event', 'business'})
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all('<mark>' in result['headline'] for result in results))
+        ranks = [result['rank'] for result in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_headlines_only_for_the_returned_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/v1/search/', {'q': 'harbour', 'limit': 1, 'offset': 1})
+        self.assertEqual(len(response.data['results']), 1)
+        headline_queries = [query['sql'] for query in queries if 'ts_headline' in query['sql']]
+        self.assertEqual(len(headline_queries), 1)
+        self.assertIn(' IN (', headline_queries[0])
+
+    def test_offset_is_capped(self):
+        response = APIClient().get('/api/v1/search/', {'q': 'harbour', 'offset': search.MAX_OFFSET + 1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_respects_role_read_permissions(self):
+        role = self.make_role('no news', {'News': {'read': False}, 'Events': {'read': False}})
+        client = self.client_for(self.make_user('reader', role=role))
+        results = client.get('/api/v1/search/', {'q': 'harbour'}).data['results']
+        self.assertEqual(sorted(result['type'] for result in results), ['business', 'post'])
+        self.assertEqual([result['title'] for result in results if result['type'] == 'post'], ['Sourdough at home'])
+
+
+class SearchBenchmark(APITestBase):
+    """Search latency over MYTRIBE_BENCHMARK_ROWS posts (default one million)"""
+
+    @benchmark
+    def test_search_latency(self):
+        total = int(os.environ.get('MYTRIBE_BENCHMARK_ROWS', 1_000_000))
+        words = ['harbour', 'bakery', 'festival', 'market', 'council', 'river', 'school', 'garden']
+        batch = []
+        for n in range(total):
+            batch.append(Post(title=f'{words[n % 8]} story {n}', category='Local News', kind=Post.KIND_NEWS,
+                              description=f'{words[(n * 7) % 8]} {words[(n * 3) % 8]} update number {n}'))
+            if len(batch) == 10_000:
+                Post.objects.bulk_create(batch)
+                batch = []
+        Post.objects.bulk_create(batch)
+        search.reindex('post', chunk_size=50_000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE mytribe_post')
+
+        client = APIClient()
+        for params in ({'q': 'harbour festival'}, {'q': 'harbour', 'offset': 480}):
+            elapsed = timed(f'search {params} over {total} posts', 5, lambda: client.get('/api/v1/search/', params))
+            self.assertLess(elapsed, 5)
+
+# ===============================================
+# POST KIND (user-004)
+# ===============================================
+
+class PostKindTests(APITestBase):
+
+    def test_kind_follows_configured_categories(self):
+        with self.committed():
+            settings = PlatformSettings.objects.create(categories={'News': ['Council'], 'Articles': ['Local News Essays']})
+        council = self.make_post('Budget', category='Council')
+        essay = self.make_post('Essay', category='Local News Essays')
+        other = self.make_post('Fallback', category='Sports news')
+        self.assertEqual([Post.objects.get(pk=post.pk).kind for post in (council, essay, other)],
+                         ['news', 'article', 'news'])
+        with self.committed():
+            settings.categories = {'News': ['Local News Essays'], 'Articles': ['Council']}
+            settings.save()
+        self.assertEqual(Post.objects.get(pk=council.pk).kind, 'article')
+        self.assertEqual(Post.objects.get(pk=essay.pk).kind, 'news')
+
+    def test_reclassify_refreshes_feed_and_cached_lists(self):
+        with self.committed():
+            settings = PlatformSettings.objects.create(categories={'News': ['Council'], 'Articles': []})
+        council = self.make_post('Budget', category='Council')
+        client = APIClient()
+
+        def ids(kind):
+            # Cache hits are plain HttpResponses, so read the body rather than .data
+            body = json.loads(client.get('/api/v1/posts/', {'type': kind}).content)
+            return [item['id'] for item in body['results']]
+
+        self.assertEqual(ids('news'), [council.pk])
+        etag = client.get('/api/v1/posts/', {'type': 'news'})['ETag']
+
+        with self.committed():
+            settings.categories = {'News': [], 'Articles': ['Council']}
+            settings.save()
+        self.assertEqual((ids('news'), ids('article')), ([], [council.pk]))
+        self.assertEqual(client.get('/api/v1/posts/', {'type': 'news'}, headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(FeedEntry.objects.get(object_id=council.pk).summary['kind'], 'article')
+
+    def test_type_filter_uses_kind(self):
+        news = self.make_post('Headline', category='Local News')
+        self.make_post('Essay', category='Opinion')
+        client = self.client_for(self.make_user('reader'))
+        self.assertEqual([item['id'] for item in client.get('/api/v1/posts/', {'type': 'news'}).data['results']],
+                         [news.pk])
+
+    def test_type_filter_plans_use_kind_index(self):
+        Post.objects.bulk_create([
+            Post(title=f'Post {index}', description='Body', category='Local News' if index % 20 == 0 else 'Opinion',
+                 kind=Post.KIND_NEWS if index % 20 == 0 else Post.KIND_ARTICLE)
+            for index in range(20_000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE mytribe_post')
+        client = self.client_for(self.make_user('reader'))
+        for params in ({'type': 'news'}, {'type': 'news', 'pagination': 'cursor'}):
+            with CaptureQueriesContext(connection) as queries:
+                client.get('/api/v1/posts/', params)
+            post_queries = [query for query in queries if 'FROM "mytribe_post"' in query['sql']]
+            self.assertTrue(post_queries)
+            for query in post_queries:
+                self.assertNotIn('UPPER(', query['sql'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN {query['sql']}")
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertIn('post_kind_created_idx', plan, params)
+                self.assertNotIn('Seq Scan on mytribe_post', plan, params)
+
+# ===============================================
+# RESPONSE CACHE (user-005)
+# ===============================================
+
+class ResponseCacheTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.make_post('First')
+
+    def test_anonymous_reads_miss_then_hit(self):
+        client = APIClient()
+        for url in ('/api/v1/posts/', f'/api/v1/posts/{self.post.pk}/'):
+            first = client.get(url)
+            second = client.get(url)
+            self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+            self.assertEqual(json.loads(second.content), first.data)
+
+    def test_committed_write_retires_entries(self):
+        client = APIClient()
+        client.get('/api/v1/posts/')
+        with self.committed():
+            self.post.title = 'Renamed'
+            self.post.save()
+        response = client.get('/api/v1/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_author_profile_edit_retires_post_entries(self):
+        with self.committed():
+            author = self.make_user('writer', bio='Old bio')
+            Post.objects.filter(pk=self.post.pk).update(author=author)
+        client = APIClient()
+        client.get('/api/v1/posts/')
+        etag = client.get(f'/api/v1/posts/{self.post.pk}/')['ETag']
+
+        with self.committed():
+            author.last_login = timezone.now()
+            author.save(update_fields=['last_login'])
+        self.assertEqual(client.get('/api/v1/posts/')['X-Cache'], 'HIT')
+
+        with self.committed():
+            author.bio = 'New bio'
+            author.save()
+        response = client.get('/api/v1/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['author']['bio'], 'New bio')
+        detail = client.get(f'/api/v1/posts/{self.post.pk}/', headers={'If-None-Match': etag})
+        self.assertEqual(detail.status_code, 200)
+
+    def test_authenticated_and_bypass_requests_skip_the_cache(self):
+        member = self.client_for(self.make_user('reader'))
+        member.get('/api/v1/posts/')
+        self.assertNotIn('X-Cache', member.get('/api/v1/posts/'))
+        APIClient().get('/api/v1/posts/')
+        self.assertEqual(APIClient().get('/api/v1/posts/', HTTP_X_CACHE_BYPASS='1')['X-Cache'], 'BYPASS')
+
+    def test_stats_count_outcomes(self):
+        client = APIClient()
+        for _ in range(3):
+            client.get('/api/v1/posts/')
+        stats = self.client_for(self.make_user('admin', is_staff=True)).get('/api/v1/cache/stats/').data
+        self.assertEqual((stats['hit'], stats['miss'], stats['hit_ratio']), (2, 1, round(2 / 3, 4)))
+
+# ===============================================
+# PUBLIC SETTINGS (user-006)
+# ===============================================
+
+class PublicSettingsTests(APITestBase):
+    url = '/api/v1/settings/public/'
+
+    def test_not_configured(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 404)
+
+    def test_warm_requests_and_revalidation_run_no_queries(self):
+        with self.committed():
+            PlatformSettings.objects.create(app_name='Harbour Hub')
+        client = APIClient()
+        first = client.get(self.url)
+        self.assertEqual(json.loads(first.content)['platform']['app_name'], 'Harbour Hub')
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(self.url).content, first.content)
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(async_get('/api/v1/async/settings/public/').content, first.content)
+
+    def test_related_writes_change_the_etag(self):
+        with self.committed():
+            PlatformSettings.objects.create()
+        client = APIClient()
+        etag = client.get(self.url)['ETag']
+        with self.committed():
+            MembershipTier.objects.create(name='Gold', description='', monthly_price='5.00', annual_price='50.00')
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([tier['name'] for tier in json.loads(response.content)['membership_tiers']], ['Gold'])
+
+# ===============================================
+# CONDITIONAL GET (user-007)
+# ===============================================
+
+class ConditionalGetTests(APITestBase):
+
+    def test_list_revalidates_without_queries(self):
+        self.make_post('First')
+        client = APIClient()
+        etag = client.get('/api/v1/posts/')['ETag']
+        with self.assertNumQueries(0):
+            response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_hit_runs_no_queries(self):
+        self.make_post('First')
+        client = APIClient()
+        for url in ('/api/v1/posts/', '/api/v1/posts/?pagination=cursor'):
+            client.get(url)
+            with self.assertNumQueries(0):
+                response = client.get(url)
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertIn('ETag', response)
+
+    def test_write_changes_list_etag(self):
+        self.make_post('First')
+        client = APIClient()
+        etag = client.get('/api/v1/posts/')['ETag']
+        self.make_post('Second')
+        response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_ignores_if_modified_since(self):
+        post = self.make_post('First')
+        self.make_post('Second')
+        client = APIClient()
+        client.get('/api/v1/posts/')
+        with self.committed():
+            post.delete()
+        response = client.get('/api/v1/posts/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_detail_if_modified_since(self):
+        post = self.make_post('First')
+        url = f'/api/v1/posts/{post.pk}/'
+        client = APIClient()
+        last_modified = client.get(url)['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        with self.committed():
+            post.delete()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_is_per_caller(self):
+        self.make_post('First')
+        anonymous = APIClient().get('/api/v1/posts/')['ETag']
+        member = self.client_for(self.make_user('reader')).get('/api/v1/posts/')['ETag']
+        self.assertNotEqual(anonymous, member)
+
+# ===============================================
+# SPARSE FIELDSETS (user-008)
+# ===============================================
+
+class SparseFieldsetTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.make_user('writer')
+        self.post = self.make_post('First', author=self.author)
+        self.client = self.client_for(self.make_user('reader'))
+
+    def page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/', params)
+        self.assertEqual(response.status_code, 200)
+        sql = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "mytribe_post"."id"'))
+        return response.data['results'][0], sql
+
+    def test_fields_narrow_the_body_and_the_columns(self):
+        item, sql = self.page(fields='id,title')
+        self.assertEqual(set(item), {'id', 'title'})
+        self.assertNotIn('"mytribe_post"."description"', sql)
+        self.assertNotIn('mytribe_customuser', sql)
+
+    def test_relations_join_only_when_rendered(self):
+        item, sql = self.page(fields='title,author')
+        self.assertEqual(item['author']['username'], 'writer')
+        self.assertIn('JOIN "mytribe_customuser"', sql)
+
+    def test_exclude_and_presets(self):
+        item, _ = self.page(exclude='description')
+        self.assertNotIn('description', item)
+        self.assertIn('title', item)
+        item, _ = self.page(preset='card')
+        self.assertEqual(set(item), set(CONTENT_CARD_FIELDS['post']))
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({'fields': 'title,nope'}, {'preset': 'nope'}):
+            self.assertEqual(self.client.get('/api/v1/posts/', params).status_code, 400)
+
+# ===============================================
+# COMMENT THREADS (user-009)
+# ===============================================
+
+class CommentThreadTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.make_user('author', is_staff=True)
+        self.client = self.client_for(self.author)
+        self.post = self.make_post()
+
+    def make_thread(self, replies, parent=None):
+        """A comment with `replies` direct replies, each with one reply of its own"""
+        comment = Comment.objects.create(author=self.author, content_object=self.post, text='root', parent=parent)
+        for _ in range(replies):
+            child = Comment.objects.create(author=self.author, content_object=self.post, text='reply', parent=comment)
+            Comment.objects.create(author=self.author, content_object=self.post, text='nested', parent=child)
+        return comment
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/comments/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_query_count_does_not_grow_with_threads(self):
+        self.make_thread(2)
+        self.list_queries()  # caches the token's user state
+        small = self.list_queries()
+        for _ in range(3):
+            self.make_thread(4)
+        self.assertEqual(self.list_queries(), small)
+
+    def test_list_nests_replies(self):
+        root = self.make_thread(2)
+        results = self.client.get('/api/v1/comments/').data['results']
+        listed = next(result for result in results if result['id'] == root.pk)
+        self.assertEqual(len(listed['replies']), 2)
+        self.assertEqual([len(reply['replies']) for reply in listed['replies']], [1, 1])
+
+    def test_more_replies_link_keeps_prefix_and_limits(self):
+        root = self.make_thread(3)
+        response = self.client.get(f'/api/v1/comments/{root.pk}/', {'replies': 2, 'depth': 2})
+        cut_after = response.data['replies'][-1]['id']
+        self.assertEqual(
+            response.data['more_replies'],
+            f'http://testserver/api/v1/comments/{root.pk}/replies/?after={cut_after}&depth=2&replies=2',
+        )
+        page = self.client.get(response.data['more_replies'])
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(len(page.data['results']), 1)
+
+    def test_parent_cannot_change_on_update(self):
+        root, other = self.make_thread(1), self.make_thread(0)
+        reply = root.replies.get()
+        response = self.client.patch(f'/api/v1/comments/{reply.pk}/', {'text': 'edited', 'parent': other.pk})
+        self.assertEqual(response.status_code, 200)
+        reply.refresh_from_db()
+        self.assertEqual((reply.text, reply.parent_id), ('edited', root.pk))
+        self.assertTrue(reply.path.startswith(f'{root.path}/'))
+
+    def test_add_comment_rejects_parent_from_another_thread(self):
+        other = Comment.objects.create(author=self.author, content_object=self.make_event(), text='elsewhere')
+        response = self.client.post(f'/api/v1/posts/{self.post.pk}/add_comment/', {'text': 'hi', 'parent': other.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+        own = self.make_thread(0)
+        response = self.client.post(f'/api/v1/posts/{self.post.pk}/add_comment/', {'text': 'hi', 'parent': own.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['depth'], 1)
+
+# ===============================================
+# ENGAGEMENT COUNTERS (user-010)
+# ===============================================
+
+BUCKET = 1_000_000
+
+
+class CounterTests(APITestBase):
+
+    def test_direct_increment_refreshes_feed_summary(self):
+        post = self.make_post('Counted')
+        with self.committed():
+            self.assertEqual(counters.increment(Post, post.pk, 'likes'), 1)
+        entry = FeedEntry.objects.get(object_id=post.pk, content_type__model='post')
+        self.assertEqual(entry.summary['likes'], 1)
+        self.assertEqual(entry.summary['title'], 'Counted')
+
+    @override_settings(ENGAGEMENT_COUNTER_BUFFERING=True)
+    def test_buffered_reads_merge_pending_deltas(self):
+        post = self.make_post('Buffered')
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET):
+            for _ in range(3):
+                counters.increment(Post, post.pk, 'shares')
+            self.assertEqual(counters.value(Post, post.pk, 'shares'), 3)
+        post.refresh_from_db()
+        self.assertEqual(post.shares, 0)
+
+    @override_settings(ENGAGEMENT_COUNTER_BUFFERING=True)
+    def test_flush_applies_once_and_bumps_generation(self):
+        post = self.make_post('Buffered')
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET):
+            for _ in range(5):
+                counters.increment(Post, post.pk, 'shares')
+        generation, = cache.get_generations(['mytribe.post'])
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET + 2), self.committed():
+            counters.flush()
+            counters.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.shares, 5)
+        self.assertNotEqual(cache.get_generations(['mytribe.post']), [generation])
+        entry = FeedEntry.objects.get(object_id=post.pk, content_type__model='post')
+        self.assertEqual(entry.summary['shares'], 5)
+
+    @override_settings(ENGAGEMENT_COUNTER_BUFFERING=True)
+    def test_flush_retried_after_crash_does_not_replay(self):
+        post = self.make_post('Buffered')
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET):
+            for _ in range(4):
+                counters.increment(Post, post.pk, 'likes')
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET + 2):
+            # Dies after committing the UPDATE, before deleting its keys
+            with mock.patch.object(counters.get_store().__class__, 'delete_many', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    counters.flush()
+            counters.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.likes, 4)
+
+    @override_settings(ENGAGEMENT_COUNTER_BUFFERING=True)
+    def test_flush_resumes_from_the_database_watermark(self):
+        post = self.make_post('Buffered')
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET + 2):
+            counters.flush()
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET + 3):
+            for _ in range(2):
+                counters.increment(Post, post.pk, 'likes')
+        # The cache loses its hint and the next flush runs long after the read window
+        counters.get_store().delete(counters.FLUSHED_THROUGH_KEY)
+        late = BUCKET + 3 + counters.MAX_PENDING_BUCKETS + 10
+        with mock.patch('mytribe.counters.current_bucket', return_value=late):
+            with self.assertLogs('mytribe.counters', 'WARNING'):
+                counters.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.likes, 2)
+        self.assertEqual(counters.flushed_through(), late - 1 - counters.FLUSH_GRACE_BUCKETS)
+
+
+class CounterConcurrencyTests(TransactionTestCase):
+    """Many threads hammering one row, each on its own connection and transactions"""
+    THREADS = 8
+    PER_THREAD = 25
+
+    def setUp(self):
+        caches['default'].clear()
+        self.post = Post.objects.create(title='Viral', description='Viral body', category='Local News')
+
+    def test_direct_increments_are_exact(self):
+        run_threads(lambda _: [counters.increment(Post, self.post.pk, 'likes') for _ in range(self.PER_THREAD)],
+                    self.THREADS)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, self.THREADS * self.PER_THREAD)
+
+    @override_settings(ENGAGEMENT_COUNTER_BUFFERING=True)
+    def test_buffered_increments_and_overlapping_flushes_are_exact(self):
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET):
+            run_threads(lambda _: [counters.increment(Post, self.post.pk, 'shares') for _ in range(self.PER_THREAD)],
+                        self.THREADS)
+        with mock.patch('mytribe.counters.current_bucket', return_value=BUCKET + 2):
+            run_threads(lambda _: counters.flush(batch_size=1), 4)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.shares, self.THREADS * self.PER_THREAD)
+
+# ===============================================
+# LIKES (user-011)
+# ===============================================
+
+class LikeTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.make_post()
+        self.url = f'/api/v1/posts/{self.post.pk}/like/'
+
+    def test_like_and_unlike_are_idempotent(self):
+        client = self.client_for(self.make_user('fan'))
+        self.assertEqual(client.post(self.url).data, {'liked': True, 'likes': 1})
+        self.assertEqual(client.post(self.url).data, {'liked': True, 'likes': 1})
+        self.assertEqual(client.delete(self.url).data, {'liked': False, 'likes': 0})
+        self.assertEqual(client.delete(self.url).data, {'liked': False, 'likes': 0})
+
+    def test_liked_by_me_is_per_caller(self):
+        fan = self.client_for(self.make_user('fan'))
+        fan.post(self.url)
+        other = self.client_for(self.make_user('other'))
+        self.assertTrue(fan.get('/api/v1/posts/').data['results'][0]['liked_by_me'])
+        self.assertFalse(other.get('/api/v1/posts/').data['results'][0]['liked_by_me'])
+        self.assertNotIn('liked_by', other.get(f'/api/v1/posts/{self.post.pk}/').data)
+
+    def test_list_queries_do_not_grow_with_likes(self):
+        client = self.client_for(self.make_user('reader'))
+        client.get('/api/v1/posts/')
+        with CaptureQueriesContext(connection) as before:
+            client.get('/api/v1/posts/')
+        for index in range(5):
+            self.client_for(self.make_user(f'fan{index}')).post(self.url)
+        with CaptureQueriesContext(connection) as after:
+            client.get('/api/v1/posts/')
+        self.assertEqual(len(after), len(before))
+
+# ===============================================
+# BULK ENGAGEMENT STATE (user-012)
+# ===============================================
+
+class EngagementStateTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [self.make_post(f'Post {index}') for index in range(3)]
+        self.event = self.make_event()
+        self.fan = self.make_user('fan')
+        self.client = self.client_for(self.fan)
+        self.client.post(f'/api/v1/posts/{self.posts[1].pk}/like/')
+
+    def state(self, items, client=None):
+        response = (client or self.client).post('/api/v1/engagement/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_results_follow_request_order_and_skip_unknown_ids(self):
+        items = [{'type': 'event', 'id': self.event.pk}, {'type': 'post', 'id': self.posts[1].pk},
+                 {'type': 'post', 'id': 999999}, {'type': 'post', 'id': self.posts[1].pk}]
+        results = self.state(items)
+        self.assertEqual([(item['type'], item['id']) for item in results],
+                         [('event', self.event.pk), ('post', self.posts[1].pk)])
+        self.assertEqual((results[1]['likes'], results[1]['liked_by_me']), (1, True))
+        self.assertFalse(self.state(items, APIClient())[1]['liked_by_me'])
+
+    def test_one_query_per_content_type(self):
+        items = [{'type': 'post', 'id': post.pk} for post in self.posts] + [{'type': 'event', 'id': self.event.pk}]
+        self.state(items)
+        with self.assertNumQueries(2):
+            self.state(items)
+
+    def test_rejects_bad_items(self):
+        for items in ([], [{'type': 'nope', 'id': 1}], [{'type': 'post', 'id': 1}] * 101):
+            self.assertEqual(self.client.post('/api/v1/engagement/', {'items': items}, format='json').status_code, 400)
+
+# ===============================================
+# GENERIC FOREIGN KEYS (user-013)
+# ===============================================
+
+class GenericPrefetchTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        with self.committed():
+            self.section = SectionConfig.objects.create(section_id='News', title='News')
+        self.admin = self.client_for(self.make_user('admin', is_staff=True))
+
+    def feature(self, *targets):
+        with self.committed():
+            for order, target in enumerate(targets):
+                FeaturedContent.objects.create(section=self.section, content_object=target, order=order)
+
+    def list_featured(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin.get('/api/v1/featured-content/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(queries)
+
+    def test_one_query_per_content_type(self):
+        self.feature(self.make_post('A'), self.make_event('B'), self.make_business('C'))
+        self.list_featured()
+        _, few = self.list_featured()
+        self.feature(self.make_post('D'), self.make_event('E'), self.make_business('F'))
+        results, many = self.list_featured()
+        self.assertEqual(many, few)
+        self.assertEqual(sorted(item['content_object']['type'] for item in results),
+                         ['business', 'business', 'event', 'event', 'post', 'post'])
+
+    def test_missing_target_renders_none(self):
+        post = self.make_post('Gone')
+        self.feature(post)
+        with self.committed():
+            Post.objects.filter(pk=post.pk).delete()
+        results, _ = self.list_featured()
+        self.assertIsNone(results[0]['content_object'])
+
+# ===============================================
+# SECTION LANDING (user-014)
+# ===============================================
+
+class SectionLandingTests(APITestBase):
+    url = '/api/v1/sections/News/landing/'
+
+    def setUp(self):
+        super().setUp()
+        with self.committed():
+            self.section = SectionConfig.objects.create(section_id='News', title='News')
+        self.news = self.make_post('Headline', category='Local News')
+        self.make_post('Essay', category='Opinion')
+
+    def landing(self, **headers):
+        return APIClient().get(self.url, **headers)
+
+    def test_payload_has_featured_and_latest_for_the_section(self):
+        with self.committed():
+            FeaturedContent.objects.create(section=self.section, content_object=self.make_event('Swim'), order=1)
+        data = json.loads(self.landing().content)
+        self.assertEqual(data['section']['title'], 'News')
+        self.assertEqual([(card['type'], card['order']) for card in data['featured']], [('event', 1)])
+        self.assertEqual([card['id'] for card in data['latest']], [self.news.pk])
+
+    def test_warm_snapshot_and_revalidation_run_no_queries(self):
+        etag = self.landing()['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.landing().status_code, 200)
+            self.assertEqual(self.landing(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_content_writes_rebuild_the_snapshot(self):
+        etag = self.landing()['ETag']
+        latest = self.make_post('Breaking', category='Local News')
+        response = self.landing(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['latest'][0]['id'], latest.pk)
+
+    def test_unknown_and_unconfigured_sections(self):
+        self.assertEqual(APIClient().get('/api/v1/sections/Nope/landing/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/v1/sections/Events/landing/').status_code, 404)
+
+# ===============================================
+# ORDER HISTORY (user-015)
+# ===============================================
+
+class OrderHistoryTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('buyer')
+        self.client = self.client_for(self.user)
+        self.make_order(self.make_user('someone-else'))
+
+    def make_order(self, user, items=2):
+        order = Order.objects.create(user=user, subtotal='10.00', tax='1.00', total='11.00')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, name=f'Item {index}', item_type='event', price='5.00', quantity=index + 1)
+            for index in range(items)
+        ])
+        return order
+
+    def history_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_query_count_is_flat_in_orders_and_items(self):
+        for url in ('/api/v1/users/me/orders/', '/api/v1/orders/'):
+            self.make_order(self.user)
+            _, few = self.history_queries(url)
+            for _ in range(4):
+                self.make_order(self.user, items=5)
+            data, many = self.history_queries(url)
+            self.assertEqual(many, few, url)
+            self.assertTrue(all(order['user'] == self.user.pk for order in data['results']))
+
+    def test_summary_mode_aggregates_items(self):
+        self.make_order(self.user, items=3)
+        data, _ = self.history_queries('/api/v1/users/me/orders/?summary=true')
+        [order] = data['results']
+        self.assertEqual((order['item_count'], order['item_quantity']), (3, 6))
+        self.assertNotIn('items', order)
+
+    def test_pages_walk_newest_first(self):
+        orders = [self.make_order(self.user, items=1) for _ in range(5)]
+        ids, url = [], '/api/v1/users/me/orders/?page_size=2'
+        while url:
+            data = self.client.get(url).data
+            ids.extend(order['id'] for order in data['results'])
+            url = data['next']
+        self.assertEqual(ids, [order.pk for order in reversed(orders)])
+
+# ===============================================
+# ANALYTICS ROLLUPS (user-016)
+# ===============================================
+
+class AnalyticsReportTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_staff=True)
+        with self.committed():
+            for total in ('10.25', '20.25'):
+                order = Order.objects.create(user=self.admin, subtotal=total, tax='0.00', total=total)
+                OrderItem.objects.create(order=order, name='Ticket', item_type='event', price=total, quantity=1)
+        analytics.refresh_dirty()
+
+    def report(self, **params):
+        today = timezone.localdate().isoformat()
+        response = self.client_for(self.admin).get('/api/v1/analytics/report/', {'start': today, 'end': today, **params})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_rollups_follow_new_orders(self):
+        self.assertEqual(RollupDirtyDay.objects.count(), 0)
+        [row] = self.report(metric='sales')['results']
+        self.assertEqual((row['order_count'], row['revenue']), (2, '30.50'))
+
+    def test_money_totals_render_as_strings(self):
+        [row] = self.report(metric='items', group_by='item_type', granularity='month')['results']
+        self.assertEqual(row['revenue'], '30.50')
+        self.assertEqual(row['units'], 2)
+
+# ===============================================
+# CHECKOUT (user-017)
+# ===============================================
+
+class CheckoutTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.tier = MembershipTier.objects.create(name='Gold', description='', monthly_price='5.00', annual_price='50.00')
+        self.event = self.make_event('Gala', ticketing={'price': '12.50'})
+        self.client = self.client_for(self.make_user('buyer'))
+
+    def checkout(self, items, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/v1/orders/checkout/', {'items': items}, format='json', **headers)
+
+    @override_settings(CHECKOUT_TAX_RATE='0.2')
+    def test_prices_come_from_the_server(self):
+        response = self.checkout([
+            {'type': 'membership', 'id': self.tier.pk, 'billing': 'annual', 'price': '0.01'},
+            {'type': 'event', 'id': self.event.pk, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['subtotal'], response.data['tax'], response.data['total']),
+                         ('75.00', '15.00', '90.00'))
+        self.assertEqual(sorted(item['price'] for item in response.data['items']), ['12.50', '50.00'])
+
+    def test_bad_line_writes_nothing(self):
+        response = self.checkout([
+            {'type': 'event', 'id': self.event.pk},
+            {'type': 'event', 'id': 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1', {str(key) for key in response.data['items']})
+        self.assertFalse(Order.objects.exists())
+
+    def test_idempotency_key_returns_the_first_order(self):
+        items = [{'type': 'event', 'id': self.event.pk}]
+        first = self.checkout(items, key='cart-1')
+        again = self.checkout(items, key='cart-1')
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(first.data['id'], again.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertNotIn('idempotency_key', first.data)
+
+    def test_idempotency_key_replayed_with_another_cart_is_refused(self):
+        first = self.checkout([{'type': 'event', 'id': self.event.pk, 'quantity': 1}], key='cart-1')
+        same = self.checkout([{'type': 'event', 'id': self.event.pk}], key='cart-1')
+        changed = self.checkout([{'type': 'event', 'id': self.event.pk, 'quantity': 3}], key='cart-1')
+        self.assertEqual((first.status_code, same.status_code, changed.status_code), (201, 200, 422))
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        self.event = Event.objects.create(title='Gala', description='', date='Saturday', location='Hall',
+                                          ticketing={'price': '10.00'})
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw12345!x')
+
+    def test_concurrent_retries_create_one_order(self):
+        results = []
+        run_threads(lambda index: results.append(checkout.checkout(
+            self.user, [{'type': 'event', 'id': self.event.pk, 'quantity': 1}], idempotency_key='retry',
+        )), 8)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual({order.pk for order, _ in results}, {Order.objects.get().pk})
+        self.assertEqual(sum(created for _, created in results), 1)
+
+    @benchmark
+    def test_checkout_load(self):
+        clients, per_client = 16, 25
+        token = authentication.tokens_for_user(self.user).access_token
+
+        def buy(index):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            for number in range(per_client):
+                response = client.post('/api/v1/orders/checkout/',
+                                       {'items': [{'type': 'event', 'id': self.event.pk, 'quantity': 2}]},
+                                       format='json', HTTP_IDEMPOTENCY_KEY=f'{index}-{number}')
+                assert response.status_code == 201, response.status_code
+
+        started = time.perf_counter()
+        run_threads(buy, clients)
+        elapsed = time.perf_counter() - started
+        print(f'\ncheckout: {clients * per_client / elapsed:.0f} orders/s over {clients} concurrent clients')
+        self.assertEqual(Order.objects.count(), clients * per_client)
+        self.assertEqual(OrderItem.objects.count(), clients * per_client)
+
+# ===============================================
+# STREAMING EXPORTS (user-018)
+# ===============================================
+
+class ExportTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_staff=True)
+        self.client = self.client_for(self.admin)
+        order = Order.objects.create(user=self.admin, subtotal='10.00', tax='0.00', total='10.00')
+        OrderItem.objects.create(order=order, name='Gala', item_type='event', price='10.00')
+        OrderItem.objects.create(order=order, name='Gold', item_type='membership', price='5.00')
+
+    def export(self, name, **params):
+        response = self.client.get(f'/api/v1/exports/{name}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_a_header_and_every_row(self):
+        rows = list(csv.reader(io.StringIO(self.export('order-items').decode())))
+        self.assertEqual(rows[0][:3], ['id', 'order_id', 'order_user_id'])
+        self.assertEqual([row[rows[0].index('name')] for row in rows[1:]], ['Gala', 'Gold'])
+
+    def test_filtered_gzipped_jsonl(self):
+        body = gzip.decompress(self.export('order-items', output='jsonl', gzip='true', type='membership'))
+        [line] = body.decode().splitlines()
+        self.assertEqual((json.loads(line)['name'], json.loads(line)['price']), ('Gold', '5.00'))
+
+    def test_streams_through_the_asgi_handler(self):
+        token = authentication.tokens_for_user(self.admin).access_token
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/api/v1/exports/order-items/', 'query_string': b'output=jsonl', 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+        }
+        incoming = [{'type': 'http.request', 'body': b''}]
+        sent = []
+
+        async def receive():
+            if incoming:
+                return incoming.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        # As the test client does, keep request signals from closing the test transaction's connection
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with mock.patch.object(exports, 'BLOCK_SIZE', 1), warnings.catch_warnings():
+                warnings.simplefilter('error')
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        self.assertEqual(sent[0]['status'], 200)
+        bodies = [message['body'] for message in sent[1:-1]]
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual([json.loads(body)['name'] for body in bodies], ['Gala', 'Gold'])
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_admin_only_and_validated(self):
+        member = self.client_for(self.make_user('member'))
+        self.assertEqual(member.get('/api/v1/exports/orders/').status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/exports/nope/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/exports/events/', {'type': 'x'}).status_code, 400)
+
+# ===============================================
+# BULK IMPORTS (user-019)
+# ===============================================
+
+class ImportTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.make_user('admin', is_staff=True))
+
+    def upload(self, import_type, name, content):
+        response = self.client.post(f'/api/v1/imports/{import_type}/',
+                                    {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_csv_upserts_by_key_and_reports_bad_rows(self):
+        header = 'import_key,name,description,category,address\n'
+        report = self.upload('business', 'shops.csv', (header + 'b1,Bakery,Bread,Food,1 High St\n'
+                                                                 'b2,,No name,Food,2 High St\n').encode())
+        self.assertEqual((report['rows'], report['created'], report['error_count']), (2, 1, 1))
+        self.assertEqual(report['errors'], [{'row': 2, 'errors': {'name': ['This field is required.']}}])
+        report = self.upload('business', 'shops.csv', (header + 'b1,Harbour Bakery,Bread,Food,1 High St\n').encode())
+        self.assertEqual((report['created'], report['updated']), (0, 1))
+        self.assertEqual(list(Business.objects.values_list('name', flat=True)), ['Harbour Bakery'])
+
+    def test_gzipped_jsonl_in_batches_reaches_feed_and_search(self):
+        lines = [json.dumps({'import_key': f'e{index}', 'title': f'Harbour swim {index}', 'description': 'Sea',
+                             'date': 'Saturday', 'location': 'Harbour', 'ticketing': {'price': '3.00'}})
+                 for index in range(5)] + ['not json']
+        source, input_format = imports.open_upload(io.BytesIO(gzip.compress('\n'.join(lines).encode())), 'events.jsonl.gz')
+        report = imports.run('event', source, input_format, batch_size=2)
+        self.assertEqual((report['created'], report['error_count']), (5, 1))
+        self.assertEqual(len(APIClient().get('/api/v1/feed/', {'type': 'event'}).data['results']), 5)
+        self.assertEqual(len(APIClient().get('/api/v1/search/', {'q': 'harbour swim'}).data['results']), 5)
+
+# ===============================================
+# IMAGE DERIVATIVES (user-020)
+# ===============================================
+
+def png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageDerivativeTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name, IMAGE_DERIVATIVES_SYNC=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = self.make_user('pictured')
+
+    def upload(self, field_name, data, name='photo.png'):
+        with self.committed():
+            getattr(self.user, field_name).save(name, ContentFile(data))
+        self.user.refresh_from_db()
+        return getattr(self.user, images.variants_field(field_name))
+
+    def test_variants_are_built_after_commit_without_upscaling(self):
+        variants = self.upload('cover_photo', png_bytes(800, 400))
+        self.assertEqual(sorted(variants['sizes'], key=int), ['640', '800'])
+        with Image.open(default_storage.open(variants['sizes']['640'])) as derivative:
+            self.assertEqual((derivative.format, derivative.size), ('WEBP', (640, 320)))
+        self.assertFalse(images.process(CustomUser, self.user.pk, 'cover_photo'))
+
+    def test_profile_serves_srcset(self):
+        self.upload('profile_picture', png_bytes(300, 300))
+        srcset = self.client_for(self.user).get('/api/v1/users/me/').data['profile_picture_srcset']
+        self.assertEqual(list(srcset), ['64w', '128w', '256w', '300w'])
+
+    def test_unreadable_upload_keeps_the_original(self):
+        with self.assertLogs('mytribe.images', 'WARNING'):
+            variants = self.upload('profile_picture', b'not an image')
+        self.assertEqual(variants, {})
+        self.assertIsNone(self.client_for(self.user).get('/api/v1/users/me/').data['profile_picture_srcset'])
+
+# ===============================================
+# LOGIN (user-021)
+# ===============================================
+
+class LoginTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('reader')
+
+    def login(self, email, password='pw12345!x'):
+        return APIClient().post('/api/v1/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def alogin(self, email, password='pw12345!x'):
+        return async_to_sync(AsyncClient().post)(
+            '/api/v1/async/auth/login/', {'email': email, 'password': password}, content_type='application/json'
+        )
+
+    def test_email_is_case_insensitive(self):
+        response = self.login('READER@Example.COM')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['id'], self.user.pk)
+
+    def test_unknown_account_and_wrong_password_look_the_same(self):
+        unknown = self.login('nobody@example.com')
+        wrong = self.login('reader@example.com', 'wrong')
+        self.assertEqual((unknown.status_code, unknown.data), (wrong.status_code, wrong.data))
+        self.assertEqual(wrong.status_code, 401)
+
+    def test_async_login_matches_sync(self):
+        response = self.alogin('Reader@example.com')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['user'], self.login('reader@example.com').data['user'])
+        self.assertIn('access_token', body)
+        self.assertEqual(self.alogin('reader@example.com', 'wrong').status_code, 401)
+
+    def test_async_login_is_throttled_per_account(self):
+        statuses = [self.alogin('reader@example.com', 'wrong').status_code for _ in range(11)]
+        self.assertEqual(statuses, [401] * 10 + [429])
+        self.assertIn('Retry-After', self.alogin('READER@example.com'))
+
+    def test_saturated_hashing_pool_answers_503(self):
+        with mock.patch.object(backends, 'submit_check', side_effect=backends.HashingBusy):
+            for response in (self.login('reader@example.com'), self.alogin('reader@example.com')):
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '1')
+
+
+class DuplicateEmailPreflightTests(TestCase):
+
+    def test_migration_refuses_case_insensitive_duplicates(self):
+        migration = importlib.import_module('mytribe.migrations.0013_customuser_email_ci_unique')
+        constraint = next(c for c in CustomUser._meta.constraints if c.name == 'customuser_email_ci_unique')
+        # Rolled back with the test's transaction
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(CustomUser, constraint)
+        CustomUser.objects.create_user('first', 'Shared@example.com', 'pw12345!x')
+        CustomUser.objects.create_user('second', 'shared@EXAMPLE.com', 'pw12345!x')
+        CustomUser.objects.create_user('blank1', '', 'pw12345!x')
+        CustomUser.objects.create_user('blank2', '', 'pw12345!x')
+        with self.assertRaisesMessage(RuntimeError, 'shared@example.com: first (id'):
+            migration.check_duplicate_emails(django_apps, None)
+
+
+class LoginBenchmark(TransactionTestCase):
+    """Sync logins per second through the hashing pool, per hashing worker"""
+
+    @benchmark
+    def test_logins_per_second(self):
+        CustomUser.objects.create_user('bench', 'bench@example.com', 'pw12345!x')
+        workers = backends.get_executor()._max_workers
+        clients, per_client = workers * 4, 25
+
+        def log_in(index):
+            client = APIClient()
+            for _ in range(per_client):
+                response = client.post('/api/v1/auth/login/', {'email': 'bench@example.com', 'password': 'pw12345!x'})
+                assert response.status_code == 200, response.status_code
+
+        with mock.patch.object(LoginIPThrottle, 'allow_request', return_value=True), \
+                mock.patch.object(LoginAccountThrottle, 'allow_request', return_value=True):
+            started = time.perf_counter()
+            run_threads(log_in, clients)
+            elapsed = time.perf_counter() - started
+        rate = clients * per_client / elapsed
+        print(f'\nlogins: {rate:.1f}/s with {workers} hashing workers, {rate / workers:.1f}/s per worker')
+
+# ===============================================
+# AUTHENTICATION SNAPSHOTS (user-022)
+# ===============================================
+
+class SnapshotAuthenticationTests(APITestBase):
+
+    def test_demoted_staff_loses_admin_access_with_old_token(self):
+        admin = self.make_user('admin1', is_staff=True)
+        client = self.client_for(admin)
+        self.assertEqual(client.get('/api/v1/users/').status_code, 200)
+        with self.committed():
+            admin.is_staff = False
+            admin.save()
+        self.assertEqual(client.get('/api/v1/users/').status_code, 403)
+
+    def test_role_change_applies_to_outstanding_token(self):
+        role = self.make_role('no events', {'Events': {'read': False}})
+        user = self.make_user('member1')
+        client = self.client_for(user)
+        self.assertEqual(client.get('/api/v1/events/').status_code, 200)
+        with self.committed():
+            user.role = role
+            user.save()
+        self.assertEqual(client.get('/api/v1/events/').status_code, 403)
+
+    def test_password_change_revokes_tokens(self):
+        user = self.make_user('member2')
+        client = self.client_for(user)
+        with self.committed():
+            response = client.post('/api/v1/users/me/change-password/',
+                                   {'old_password': 'pw12345!x', 'new_password': 'An0ther-pass!'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/v1/users/me/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        user = self.make_user('member3')
+        client = self.client_for(user)
+        with self.committed():
+            user.is_active = False
+            user.save()
+        self.assertEqual(client.get('/api/v1/users/me/').status_code, 401)
+
+    def test_warm_me_needs_no_queries(self):
+        client = self.client_for(self.make_user('member4'))
+        client.get('/api/v1/users/me/')
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/v1/users/me/').status_code, 200)
+
+    def test_deploy_check_warns_about_per_process_state(self):
+        self.assertEqual([warning.id for warning in checks.run_checks(include_deployment_checks=True)
+                          if warning.id.startswith('authentication.')], ['authentication.W001'])
+        self.assertNotIn('authentication.W001', [warning.id for warning in checks.run_checks()])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(authentication.check_state_cache(), [])
+
+# ===============================================
+# ROLE PERMISSIONS (user-023)
+# ===============================================
+
+class RolePermissionTests(APITestBase):
+
+    def test_compile_folds_grants_onto_baseline(self):
+        mask = permissions.compile_permissions({
+            'News': {'read': False}, 'Events': {'create': True}, 'Nowhere': {'read': True}, 'Orders': {'read': 'yes'},
+        })
+        self.assertFalse(mask & permissions.BITS['News', 'read'])
+        self.assertTrue(mask & permissions.BITS['Events', 'create'])
+        self.assertTrue(mask & permissions.BITS['Articles', 'read'])
+        self.assertTrue(mask & permissions.BITS['Orders', 'read'])
+        self.assertEqual(permissions.compile_permissions(None), permissions.BASELINE_MASK)
+
+    def test_role_save_takes_effect_without_queries(self):
+        role = self.make_role('muted', {'Events': {'read': False}})
+        self.make_event()
+        client = self.client_for(self.make_user('member', role=role))
+        self.assertEqual(client.get('/api/v1/events/').status_code, 403)
+
+        with self.committed():
+            role.permissions = {'Events': {'read': True}}
+            role.save()
+        self.assertEqual(client.get('/api/v1/events/').status_code, 200)
+        with self.assertNumQueries(0):
+            permissions.compiled_roles()
+
+    def test_role_edit_retires_etags(self):
+        role = self.make_role('reader', {})
+        self.make_post('Headline', category='Local News')
+        self.make_post('Essay', category='Opinion')
+        member = self.make_user('member', role=role)
+        token = str(authentication.tokens_for_user(member).access_token)
+        client = self.client_for(member)
+        etag = client.get('/api/v1/posts/')['ETag']
+        async_etag = async_get('/api/v1/async/posts/', token)['ETag']
+
+        with self.committed():
+            role.permissions = {'News': {'read': False}}
+            role.save()
+        response = client.get('/api/v1/posts/', headers={'If-None-Match': etag})
+        self.assertEqual((response.status_code, len(response.data['results'])), (200, 1))
+        response = async_get('/api/v1/async/posts/', token, headers={'If-None-Match': async_etag})
+        self.assertEqual((response.status_code, len(json.loads(response.content)['results'])), (200, 1))
+
+    def test_create_needs_the_grant(self):
+        author = self.make_role('author', {'Events': {'create': True}})
+        payload = {'title': 'Fair', 'description': 'Stalls', 'date': 'Saturday', 'location': 'Green'}
+        self.assertEqual(self.client_for(self.make_user('member')).post('/api/v1/events/', payload).status_code, 403)
+        self.assertEqual(self.client_for(self.make_user('writer', role=author)).post('/api/v1/events/', payload).status_code,
+                         201)
+
+    def test_authors_manage_their_own_comments(self):
+        post = self.make_post()
+        author, other = self.make_user('author'), self.make_user('other')
+        comment = Comment.objects.create(author=author, content_object=post, text='First')
+        self.assertEqual(self.client_for(other).delete(f'/api/v1/comments/{comment.pk}/').status_code, 403)
+        self.assertEqual(self.client_for(author).delete(f'/api/v1/comments/{comment.pk}/').status_code, 204)
+
+    def test_invalid_role_json_is_rejected(self):
+        client = self.client_for(self.make_user('admin', is_staff=True))
+        response = client.post('/api/v1/user-roles/', {
+            'name': 'typo', 'description': '', 'permissions': {'Newz': {'read': True}, 'News': {'raed': True}},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['permissions']), 2)
+
+
+class RolePermissionBenchmark(APITestBase):
+    """RolePermission checks per second against a warm compiled map"""
+
+    @benchmark
+    def test_checks_per_second(self):
+        role = self.make_role('editor', {'News': {'create': True}, 'Articles': {'read': False}})
+        request = Request(RequestFactory().get('/api/v1/posts/'))
+        request.user = self.make_user('member', role=role)
+        view = resolve('/api/v1/posts/').func.cls(action='list', request=request, kwargs={})
+        permission = permissions.RolePermission()
+        permissions.compiled_roles()
+        batch = 1000
+
+        def check_batch():
+            for _ in range(batch):
+                permission.has_permission(request, view)
+
+        with self.assertNumQueries(0):
+            elapsed = timed(f'{batch} role permission checks', 100, check_batch)
+        print(f'role permission checks: {batch / elapsed:,.0f}/s')
+
+# ===============================================
+# ASYNC READ PATH (user-024)
+# ===============================================
+
+class AsyncReadTests(APITestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.make_post('First')
+        self.make_post('Second')
+
+    def test_list_and_detail_match_sync(self):
+        user = self.make_user('reader')
+        token = str(authentication.tokens_for_user(user).access_token)
+        for path in ('posts/', f'posts/{self.post.pk}/', f'posts/{self.post.pk}/comments/'):
+            for caller, client in ((None, APIClient()), (token, self.client_for(user))):
+                expected = json.loads(client.get(f'/api/v1/{path}').content)
+                self.assertEqual(async_get(f'/api/v1/async/{path}', caller).json(), expected)
+
+    def test_list_revalidates_with_etag(self):
+        etag = async_get('/api/v1/async/posts/')['ETag']
+        response = async_get('/api/v1/async/posts/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.make_post('Third')
+        self.assertEqual(async_get('/api/v1/async/posts/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_detail_last_modified(self):
+        url = f'/api/v1/async/posts/{self.post.pk}/'
+        last_modified = async_get(url)['Last-Modified']
+        self.assertEqual(async_get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        with self.committed():
+            self.post.delete()
+        self.assertEqual(async_get(url, headers={'If-Modified-Since': last_modified}).status_code, 404)
+
+
+class AsyncReadBenchmark(TransactionTestCase):
+    """
+    Requests per second for the same list through the WSGI handler (a thread
+    per request) and the ASGI handler (one event loop), in process, at equal
+    concurrency
+    """
+
+    @benchmark
+    def test_asgi_against_wsgi(self):
+        for index in range(20):
+            Post.objects.create(title=f'Post {index}', category='Local News', description='Body')
+        user = CustomUser.objects.create_user('bench', 'bench@example.com', 'pw12345!x')
+        headers = {'Authorization': f'Bearer {authentication.tokens_for_user(user).access_token}'}
+        concurrency, total = 50, 1000
+
+        def wsgi_worker(index):
+            client = Client(headers=headers)
+            for _ in range(total // concurrency):
+                assert client.get('/api/v1/posts/').status_code == 200
+
+        async def asgi_run():
+            client = AsyncClient(headers=headers)
+
+            async def worker():
+                for _ in range(total // concurrency):
+                    assert (await client.get('/api/v1/async/posts/')).status_code == 200
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        started = time.perf_counter()
+        run_threads(wsgi_worker, concurrency)
+        wsgi = total / (time.perf_counter() - started)
+        started = time.perf_counter()
+        async_to_sync(asgi_run)()
+        asgi = total / (time.perf_counter() - started)
+        print(f'\nposts list, {concurrency} concurrent clients: WSGI {wsgi:.0f} req/s, ASGI {asgi:.0f} req/s')
+
+# ===============================================
+# READ REPLICAS (user-025)
+# ===============================================
+
+class ReplicaRouteTests(TransactionTestCase):
+    """Routing decisions; outside TestCase's transaction, where every read would stay on the primary"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = CustomUser.objects.create_user('reader', 'reader@example.com', 'pw12345!x')
+
+    def route_for(self, path):
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        request.user = self.user
+        return replicas.Route(request)
+
+    @mock.patch.object(replicas, 'healthy_replicas', return_value=['replica_1'])
+    def test_only_replica_actions_read_replicas(self, healthy):
+        self.assertEqual(self.route_for('/api/v1/posts/').read_alias(), 'replica_1')
+        self.assertEqual(self.route_for('/api/v1/async/posts/').read_alias(), 'replica_1')
+        self.assertEqual(self.route_for('/api/v1/users/me/').read_alias(), 'default')
+        with replicas.use_primary():
+            self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
+
+    @mock.patch.object(replicas, 'healthy_replicas', return_value=['replica_1'])
+    def test_writers_are_pinned_to_the_primary(self, healthy):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {authentication.tokens_for_user(self.user).access_token}')
+        self.assertFalse(replicas.is_pinned(self.user.pk))
+        self.assertEqual(client.patch('/api/v1/users/me/', {'bio': 'Hello'}, format='json').status_code, 200)
+        self.assertTrue(replicas.is_pinned(self.user.pk))
+        self.assertEqual(self.route_for('/api/v1/posts/').read_alias(), 'default')
+
+
+class ReplicaConsistencyTests(APITestBase):
+
+    def test_validators_read_where_the_body_comes_from(self):
+        post = self.make_post()
+        url = f'/api/v1/posts/{post.pk}/'
+        async_url = f'/api/v1/async/posts/{post.pk}/'
+        last_modified = APIClient().get(url)['Last-Modified']
+        async_get(async_url)
+        # Routed reads ask the Route; primary-only reads (the shared cache's) never do
+        with mock.patch.object(replicas.Route, 'read_alias', return_value='default') as read_alias:
+            self.assertEqual(APIClient().get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            self.assertEqual(async_get(async_url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        self.assertFalse(read_alias.called)
+
+        client = self.client_for(self.make_user('reader'))
+        with mock.patch.object(replicas.Route, 'read_alias', return_value='default') as read_alias:
+            self.assertEqual(client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertTrue(read_alias.called)
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_warns_when_pins_are_per_process(self):
+        self.assertEqual([warning.id for warning in replicas.check_pin_cache()], ['replicas.W001'])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(replicas.check_pin_cache(), [])
@@ -0,0 +1,110 @@
+# mytribe/threads.py
+
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+# ===============================================
+# COMMENT THREAD LOADING
+# ===============================================
+# Threads are read through Comment.path, so a page of top-level comments and
+# every reply beneath them (down to a depth limit) come back in two queries:
+# one for the roots, one prefix scan for their descendants.
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 10
+DEFAULT_REPLIES = 5
+MAX_REPLIES = 50
+
+
+def with_reply_flag(queryset):
+    """Annotate has_replies so depth-limited leaves know whether to offer 'load more'"""
+    return queryset.annotate(has_replies=Exists(Comment.objects.filter(parent_id=OuterRef('pk'))))
+
+
+def bounded_int(value, default, maximum, minimum=0):
+    try:
+        return max(minimum, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def attach_replies(parents, depth=DEFAULT_DEPTH, replies=DEFAULT_REPLIES):
+    """
+    Load replies beneath `parents` down to `depth` further levels in one query
+    and attach them as `thread_children`, keeping the first `replies` children
+    of each node. Any node whose children were cut off, by the per-branch limit
+    or the depth limit, gets `more_replies_after` set to the id to resume from
+    (0 meaning from the first reply).
+    """
+    descendants = descendants_query(parents, depth, replies)
+    return link_replies(parents, descendants if descendants is not None else (), depth, replies)
+
+
+async def aattach_replies(parents, depth=DEFAULT_DEPTH, replies=DEFAULT_REPLIES):
+    """attach_replies() for async views"""
+    descendants = descendants_query(parents, depth, replies)
+    rows = [node async for node in descendants] if descendants is not None else []
+    return link_replies(parents, rows, depth, replies)
+
+
+def descendants_query(parents, depth, replies):
+    """The replies beneath `parents` in path order, each branch cut after `replies` + 1 children; None if nothing to load"""
+    if not parents or depth <= 0:
+        return None
+    deepest = max(parent.depth for parent in parents) + depth
+    prefixes = Q()
+    for parent in parents:
+        prefixes |= Q(path__startswith=f'{parent.path}/')
+    return (with_reply_flag(Comment.objects.filter(prefixes, depth__lte=deepest))
+            .select_related('author')
+            .annotate(sibling_rank=Window(RowNumber(), partition_by=[F('parent_id')], order_by=F('path').asc()))
+            .filter(sibling_rank__lte=replies + 1)
+            .order_by('path'))
+
+
+def link_replies(parents, descendants, depth, replies):
+    nodes = {parent.pk: parent for parent in parents}
+    for parent in parents:
+        parent.thread_children = []
+        parent.more_replies_after = None
+    if not parents:
+        return parents
+
+    deepest = max(parent.depth for parent in parents) + depth
+    for node in descendants:
+        parent = nodes.get(node.parent_id)
+        if parent is None:
+            # Its parent was beyond the per-branch limit
+            continue
+        if node.sibling_rank > replies:
+            parent.more_replies_after = parent.thread_children[-1].pk if parent.thread_children else 0
+            continue
+        node.thread_children = []
+        node.more_replies_after = None
+        parent.thread_children.append(node)
+        nodes[node.pk] = node
+
+    for node in nodes.values():
+        if node.depth >= deepest and getattr(node, 'has_replies', False):
+            node.more_replies_after = 0
+    return parents
+
+
+def load_replies_page(comment, after=0, depth=DEFAULT_DEPTH, replies=DEFAULT_REPLIES):
+    """
+    One page of direct replies to `comment` (oldest first) starting after the
+    reply id `after`, each with its own subtree attached.
+    Returns (children, next_after) where next_after is None on the last page.
+    """
+    children = Comment.objects.filter(parent_id=comment.pk).select_related('author')
+    if after:
+        after_path = f'{comment.path}/{str(after).zfill(Comment.PATH_SEGMENT_WIDTH)}'
+        children = children.filter(path__gt=after_path)
+    children = list(with_reply_flag(children).order_by('path')[:replies + 1])
+
+    next_after = children[replies - 1].pk if len(children) > replies else None
+    children = children[:replies]
+    attach_replies(children, depth=max(depth - 1, 0), replies=replies)
+    return children, next_after
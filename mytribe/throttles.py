@@ -0,0 +1,28 @@
+# mytribe/throttles.py
+
+from rest_framework.throttling import SimpleRateThrottle
+
+# ===============================================
+# LOGIN THROTTLES
+# ===============================================
+# SimpleRateThrottle keeps a sliding window of request timestamps per key in
+# the default cache (shared by all workers when REDIS_URL is set). Rates live in
+# REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Login attempts per client IP"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(SimpleRateThrottle):
+    """Login attempts per targeted account, whichever IPs they come from"""
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        identifier = request.data.get('email') or request.data.get('username')
+        if not isinstance(identifier, str) or not identifier.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': identifier.strip().lower()}
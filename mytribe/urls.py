@@ -1,9 +1,9 @@
 # mytribe/urls.py
 
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 
@@ -16,6 +16,7 @@ router.register(r'splash-themes', views.SplashThemeViewSet, basename='splash-the
 router.register(r'posts', views.PostViewSet, basename='posts')
 router.register(r'events', views.EventViewSet, basename='events')
 router.register(r'businesses', views.BusinessViewSet, basename='businesses')
+router.register(r'feed', views.FeedViewSet, basename='feed')
 
 # Engagement
 router.register(r'comments', views.CommentViewSet, basename='comments')
@@ -31,7 +32,7 @@ router.register(r'user-roles', views.UserRoleViewSet, basename='user-roles')
 
 urlpatterns = [
     # API routes
-    path('api/v1/', include(router.urls)),
+    path('api/v1/', include((router.urls, 'v1'))),
     
     # Authentication endpoints
     path('api/v1/auth/register/', views.register_view, name='register'),
@@ -41,6 +42,27 @@ urlpatterns = [
     # Public settings endpoint (combines multiple settings)
     path('api/v1/settings/public/', views.public_settings, name='public-settings'),
     
+    # Splash theme + featured + latest cards for one section, from a cached snapshot
+    path('api/v1/sections/<str:section_id>/landing/', views.section_landing, name='section-landing'),
+    
+    # Full-text search across all content types
+    path('api/v1/search/', views.search_view, name='search'),
+    
+    # Bulk like/comment state for a mixed list of content items
+    path('api/v1/engagement/', views.engagement_state, name='engagement-state'),
+    
+    # Sales and membership rollups (admin only)
+    path('api/v1/analytics/report/', views.analytics_report, name='analytics-report'),
+    
+    # Streaming CSV/JSONL table exports (admin only)
+    path('api/v1/exports/<str:name>/', views.export_view, name='export'),
+    
+    # Bulk business/event upload by import_key (admin only)
+    path('api/v1/imports/<str:import_type>/', views.import_view, name='import'),
+    
+    # Response cache metrics (admin only)
+    path('api/v1/cache/stats/', views.response_cache_stats, name='response-cache-stats'),
+    
     # Additional user endpoints
     path('api/v1/users/me/change-password/', 
          views.UserViewSet.as_view({'post': 'change_password'}), 
@@ -75,6 +97,19 @@ urlpatterns += [
          name='user-me'),
 ]
 
+# Async endpoints (served natively under ASGI; same responses as the sync routes)
+urlpatterns += [
+    path('api/v1/async/auth/login/', async_views.login, name='async-login'),
+    path('api/v1/async/settings/public/', async_views.public_settings, name='async-public-settings'),
+    path('api/v1/async/users/me/', async_views.me, name='async-user-me'),
+    re_path(r'^api/v1/async/(?P<collection>posts|events|businesses)/$',
+            async_views.content_list, name='async-content-list'),
+    re_path(r'^api/v1/async/(?P<collection>posts|events|businesses)/(?P<pk>\d+)/$',
+            async_views.content_detail, name='async-content-detail'),
+    re_path(r'^api/v1/async/(?P<collection>posts|events|businesses)/(?P<pk>\d+)/comments/$',
+            async_views.content_comments, name='async-content-comments'),
+]
+
 # Content Interaction (Likes & Comments)
 urlpatterns += [
     # These are already handled by the viewset @action decorators
@@ -1,18 +1,38 @@
 # mytribe/views.py
 
-from rest_framework import viewsets, status, permissions
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import (
+    action, api_view, authentication_classes, parser_classes, permission_classes, throttle_classes,
+)
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.contrib.auth import logout
 from django.contrib.contenttypes.models import ContentType
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 from .models import *
 from .serializers import *
-import json
+from .permissions import RolePermission, RoleSectionMixin
+from .pagination import CommentPagination, ContentPagination, KeysetPagination, OrderPagination
+from . import (
+    analytics, authentication, cache, checkout, counters, exports, generic, imports, landing, likes, permissions,
+    search, threads,
+)
+from .backends import HashingBusy, find_user, verify_password
+from .cache import CachedResponseMixin, ConditionalGetMixin
+from .projection import SparseFieldsetMixin
+from .throttles import LoginAccountThrottle, LoginIPThrottle
+import csv
+import hashlib
 
 # ===============================================
 # AUTHENTICATION VIEWS
@@ -31,35 +51,40 @@ def register_view(request):
         }, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+INVALID_CREDENTIALS = {'error': 'Invalid credentials'}
+HASHING_BUSY = {'error': 'Too many login attempts in progress, please retry shortly'}
+LOGIN_THROTTLES = [LoginIPThrottle, LoginAccountThrottle]
+
+def login_payload(user):
+    """Profile and JWT pair for a successful login; access tokens carry the user snapshot"""
+    refresh = authentication.tokens_for_user(user)
+    return {
+        'user': UserSerializer(user).data,
+        'access_token': str(refresh.access_token),
+        'refresh_token': str(refresh),
+        'message': 'Login successful'
+    }
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def login_view(request):
     """User login endpoint"""
     email = request.data.get('email')
     password = request.data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str):
+        return Response(INVALID_CREDENTIALS, status=status.HTTP_401_UNAUTHORIZED)
     
+    # Unknown users still pay for one hash, so both failures look the same
+    user = find_user(email)
     try:
-        user = CustomUser.objects.get(email=email)
-        if user.check_password(password) and user.is_active:
-            # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
-            
-            return Response({
-                'user': UserSerializer(user).data,
-                'access_token': str(refresh.access_token),
-                'refresh_token': str(refresh),
-                'message': 'Login successful'
-            })
-        else:
-            return Response(
-                {'error': 'Invalid credentials'}, 
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-    except CustomUser.DoesNotExist:
-        return Response(
-            {'error': 'Invalid credentials'}, 
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+        password_ok = verify_password(user, password)
+    except HashingBusy:
+        return Response(HASHING_BUSY, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+    
+    if password_ok and user.is_active:
+        return Response(login_payload(user))
+    return Response(INVALID_CREDENTIALS, status=status.HTTP_401_UNAUTHORIZED)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -126,42 +151,91 @@ class SplashThemeViewSet(viewsets.ModelViewSet):
 # CONTENT VIEWSETS
 # ===============================================
 
-class BaseContentViewSet(viewsets.ModelViewSet):
+class BaseContentViewSet(RoleSectionMixin, SparseFieldsetMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """Base viewset for all content types with common functionality"""
+    pagination_class = ContentPagination
+    role_actions = {
+        'toggle_like': 'read',
+        'like': 'read',
+        'comments': ('read', 'Comments.read'),
+        'add_comment': ('read', 'Comments.create'),
+    }
+    # Served from a read replica unless the caller recently wrote (see mytribe/replicas.py)
+    replica_actions = ('list', 'retrieve', 'comments')
+    # A role edit changes what its members may read, so it retires their ETags
+    caller_labels = (permissions.ROLE_LABEL,)
+    
+    def get_queryset(self):
+        """Narrow columns and relations to the requested fieldset and flag the caller's likes"""
+        queryset = self.project_queryset(super().get_queryset())
+        if self.action in ['list', 'retrieve']:
+            requested = self.get_requested_fields()
+            if requested is None or 'liked_by_me' in requested:
+                queryset = likes.annotate_liked_by_me(queryset, self.request.user)
+        return queryset
+    
+    def get_like_target(self):
+        """Resolve the object for like actions without loading its columns"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            self.get_queryset().only(*self.always_load),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, obj)
+        return obj
     
     def get_permissions(self):
-        """Set permissions based on action"""
+        """The caller's role decides each action; writes also need a signed-in user"""
         if self.action in ['list', 'retrieve']:
-            permission_classes = [AllowAny]
+            permission_classes = [RolePermission]
+        elif self.action in ['create', 'update', 'partial_update', 'destroy']:
+            permission_classes = [IsAuthenticated, RolePermission]
         else:
-            permission_classes = [IsAdminUser]
+            # Extra actions declare their own permission_classes
+            permission_classes = list(self.permission_classes) + [RolePermission]
         return [permission() for permission in permission_classes]
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def toggle_like(self, request, pk=None):
         """Toggle like on content"""
-        obj = self.get_object()
-        user = request.user
+        obj = self.get_like_target()
+        model = type(obj)
         
-        if user in obj.liked_by.all():
-            obj.liked_by.remove(user)
-            obj.likes = max(0, obj.likes - 1)
-            liked = False
+        if likes.is_liked(model, obj.pk, request.user):
+            liked, count = likes.unlike(model, obj.pk, request.user)
         else:
-            obj.liked_by.add(user)
-            obj.likes += 1
-            liked = True
+            liked, count = likes.like(model, obj.pk, request.user)
+        return Response({'liked': liked, 'likes': count})
+    
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None):
+        """Idempotent like (POST) / unlike (DELETE)"""
+        obj = self.get_like_target()
         
-        obj.save()
-        return Response({'liked': liked, 'likes': obj.likes})
+        if request.method == 'POST':
+            liked, count = likes.like(type(obj), obj.pk, request.user)
+        else:
+            liked, count = likes.unlike(type(obj), obj.pk, request.user)
+        return Response({'liked': liked, 'likes': count})
     
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def comments(self, request, pk=None):
-        """Get comments for this content"""
+        """
+        Get comment threads for this content: top-level comments keyset-paged,
+        each with replies down to ?depth= levels and ?replies= per branch
+        """
         obj = self.get_object()
-        comments = obj.comments.filter(parent__isnull=True)  # Only top-level comments
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        roots = threads.with_reply_flag(obj.comments.filter(depth=0).select_related('author'))
+        
+        paginator = CommentPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        threads.attach_replies(
+            page,
+            depth=threads.bounded_int(request.query_params.get('depth'), threads.DEFAULT_DEPTH, threads.MAX_DEPTH),
+            replies=threads.bounded_int(request.query_params.get('replies'), threads.DEFAULT_REPLIES, threads.MAX_REPLIES, minimum=1),
+        )
+        serializer = CommentSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_comment(self, request, pk=None):
@@ -170,12 +244,18 @@ class BaseContentViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(data=request.data)
         
         if serializer.is_valid():
+            # A reply takes its parent's path, so the parent must be in this object's thread
+            parent = serializer.validated_data.get('parent')
+            if parent is not None and (
+                parent.content_type_id != ContentType.objects.get_for_model(obj).pk or parent.object_id != obj.pk
+            ):
+                return Response({'parent': ['The parent comment belongs to another thread.']},
+                                status=status.HTTP_400_BAD_REQUEST)
             serializer.save(
-                author=request.user,
+                author=authentication.full_user(request.user),
                 content_object=obj
             )
-            obj.comments_count += 1
-            obj.save()
+            counters.increment(type(obj), obj.pk, 'comments_count')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -183,41 +263,146 @@ class PostViewSet(BaseContentViewSet):
     """Handle news and articles posts"""
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    field_presets = {
+        'card': CONTENT_CARD_FIELDS['post'],
+        'detail': None,
+    }
+    # Bodies nest the author, so profile changes retire cached responses and ETags too
+    cache_models = [Post, CustomUser]
+    # Permission checks read the kind, which picks the News or Articles section
+    always_load = ('id', 'created_at', 'kind')
+    kind_sections = permissions.POST_KIND_SECTIONS
+    type_kinds = {'news': Post.KIND_NEWS, 'article': Post.KIND_ARTICLE}
+    
+    def get_role_sections(self, obj=None):
+        if obj is not None:
+            return (self.kind_sections[obj.kind],)
+        kind = self.type_kinds.get(self.request.query_params.get('type'))
+        if kind is not None:
+            return (self.kind_sections[kind],)
+        return tuple(self.kind_sections.values())
     
     def get_queryset(self):
-        """Filter by type (news/article) if provided"""
-        queryset = Post.objects.all()
+        """Filter by type (news/article) if provided, and to the kinds the caller may read"""
+        queryset = super().get_queryset()
         content_type = self.request.query_params.get('type', None)
         
         if content_type == 'news':
-            # Assuming news posts have specific category or you can add a 'type' field
-            queryset = queryset.filter(category__icontains='news')
+            queryset = queryset.filter(kind=Post.KIND_NEWS)
         elif content_type == 'article':
-            queryset = queryset.exclude(category__icontains='news')
+            queryset = queryset.filter(kind=Post.KIND_ARTICLE)
         
+        readable = permissions.readable_post_kinds(self.request.user)
+        if len(readable) < len(self.kind_sections):
+            queryset = queryset.filter(kind__in=readable)
         return queryset
+    
+    def perform_create(self, serializer):
+        self.save_in_section(serializer)
+    
+    def perform_update(self, serializer):
+        self.save_in_section(serializer)
+    
+    def save_in_section(self, serializer):
+        """The section follows the kind derived from the category on save, so check the saved row"""
+        with transaction.atomic():
+            instance = serializer.save()
+            self.check_object_permissions(self.request, instance)
 
 class EventViewSet(BaseContentViewSet):
     """Handle events"""
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    role_section = 'Events'
+    field_presets = {
+        'card': CONTENT_CARD_FIELDS['event'],
+        'detail': None,
+    }
 
 class BusinessViewSet(BaseContentViewSet):
     """Handle businesses"""
     queryset = Business.objects.all()
     serializer_class = BusinessSerializer
+    role_section = 'Businesses'
+    field_presets = {
+        'card': CONTENT_CARD_FIELDS['business'],
+        'detail': None,
+    }
+
+class FeedViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Unified Post/Event/Business feed served from the materialized feed table"""
+    serializer_class = FeedEntrySerializer
+    pagination_class = KeysetPagination
+    permission_classes = [AllowAny]
+    
+    def get_queryset(self):
+        """Filter by one or more content types, e.g. ?type=post,event"""
+        queryset = FeedEntry.objects.all()
+        types = self.request.query_params.get('type')
+        
+        if types:
+            models = [CONTENT_MODELS[name] for name in types.split(',') if name in CONTENT_MODELS]
+            content_types = ContentType.objects.get_for_models(*models).values()
+            queryset = queryset.filter(content_type__in=[ct.pk for ct in content_types])
+        
+        return queryset
 
 # ===============================================
 # ENGAGEMENT VIEWS
 # ===============================================
 
-class CommentViewSet(viewsets.ModelViewSet):
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def engagement_state(request):
+    """Likes, comment counts, shares and the caller's like state for many content items at once"""
+    serializer = EngagementRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = [(item['type'], item['id']) for item in serializer.validated_data['items']]
+    return Response({'results': likes.engagement_state(items, request.user)})
+
+class CommentViewSet(RoleSectionMixin, viewsets.ModelViewSet):
     """Handle comments"""
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author')
     serializer_class = CommentSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, RolePermission]
+    role_section = 'Comments'
+    role_actions = {'reply': 'create', 'replies': 'read'}
+    # Authors may edit and delete their own comments; other people's need the role grant
+    role_owner_field = 'author'
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def thread_limits(self):
+        params = self.request.query_params
+        return {
+            'depth': threads.bounded_int(params.get('depth'), threads.DEFAULT_DEPTH, threads.MAX_DEPTH),
+            'replies': threads.bounded_int(params.get('replies'), threads.DEFAULT_REPLIES, threads.MAX_REPLIES, minimum=1),
+        }
+    
+    def list(self, request, *args, **kwargs):
+        """Comments with their reply threads, loaded in one query per page"""
+        queryset = threads.with_reply_flag(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        comments = list(queryset) if page is None else page
+        threads.attach_replies(comments, **self.thread_limits())
+        serializer = self.get_serializer(comments, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        comment = self.get_object()
+        threads.attach_replies([comment], **self.thread_limits())
+        return Response(self.get_serializer(comment).data)
+    
+    def perform_destroy(self, instance):
+        """Deleting a comment cascades to its replies, so drop them all from the count"""
+        removed = 1 + Comment.objects.filter(path__startswith=f'{instance.path}/').count()
+        with transaction.atomic():
+            instance.delete()
+            counters.increment(instance.content_type.model_class(), instance.object_id, 'comments_count', -removed)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, RolePermission])
     def reply(self, request, pk=None):
         """Add reply to comment"""
         parent_comment = self.get_object()
@@ -225,19 +410,33 @@ class CommentViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             serializer.save(
-                author=request.user,
+                author=authentication.full_user(request.user),
                 parent=parent_comment,
                 content_type=parent_comment.content_type,
                 object_id=parent_comment.object_id
             )
             
             # Update comments count on parent content
-            content_obj = parent_comment.content_object
-            content_obj.comments_count += 1
-            content_obj.save()
+            counters.increment(parent_comment.content_type.model_class(), parent_comment.object_id, 'comments_count')
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['get'], permission_classes=[RolePermission])
+    def replies(self, request, pk=None):
+        """Load more replies for one branch of a thread, oldest first"""
+        comment = self.get_object()
+        children, next_after = threads.load_replies_page(
+            comment,
+            after=threads.bounded_int(request.query_params.get('after'), 0, float('inf')),
+            depth=threads.bounded_int(request.query_params.get('depth'), threads.DEFAULT_DEPTH, threads.MAX_DEPTH, minimum=1),
+            replies=threads.bounded_int(request.query_params.get('replies'), threads.DEFAULT_REPLIES, threads.MAX_REPLIES, minimum=1),
+        )
+        next_url = None
+        if next_after is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), 'after', next_after)
+        serializer = CommentSerializer(children, many=True, context={'request': request})
+        return Response({'next': next_url, 'results': serializer.data})
 
 class FeaturedContentViewSet(viewsets.ModelViewSet):
     """Handle featured content"""
@@ -245,6 +444,10 @@ class FeaturedContentViewSet(viewsets.ModelViewSet):
     serializer_class = FeaturedContentSerializer
     permission_classes = [IsAdminUser]
 
+    def get_queryset(self):
+        """Resolve every featured item's content in one query per content type"""
+        return self.queryset.prefetch_related(generic.prefetch_content_object())
+
 # ===============================================
 # USER MANAGEMENT VIEWS
 # ===============================================
@@ -278,18 +481,21 @@ class UserViewSet(viewsets.ModelViewSet):
     def me(self, request):
         """Handle current user's profile"""
         if request.method == 'GET':
-            serializer = self.get_serializer(request.user)
-            return Response(serializer.data)
+            # Served from the profile cache; request.user only holds the token snapshot
+            return Response(authentication.cached_profile(
+                request, lambda: self.get_serializer(authentication.full_user(request.user)).data
+            ))
         
         elif request.method == 'PATCH':
-            serializer = self.get_serializer(request.user, data=request.data, partial=True)
+            serializer = self.get_serializer(authentication.full_user(request.user), data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         elif request.method == 'DELETE':
-            request.user.delete()
+            # The deletion revokes the account's outstanding tokens
+            authentication.full_user(request.user).delete()
             return Response({'message': 'Account deleted successfully'})
     
     @action(detail=False, methods=['post'])
@@ -297,35 +503,104 @@ class UserViewSet(viewsets.ModelViewSet):
         """Change current user's password"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response({'message': 'Password changed successfully'})
+            user = serializer.save()
+            # The change revoked every earlier token, including the one on this request
+            refresh = authentication.tokens_for_user(user)
+            return Response({
+                'message': 'Password changed successfully',
+                'access_token': str(refresh.access_token),
+                'refresh_token': str(refresh),
+            })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
     def my_orders(self, request):
-        """Get current user's orders"""
-        orders = Order.objects.filter(user=request.user)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        """Get current user's orders, newest first (?summary=true for totals only)"""
+        summary = wants_order_summary(request)
+        orders = order_queryset(Order.objects.filter(user=request.user), summary)
+        
+        paginator = OrderPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer_class = OrderSummarySerializer if summary else OrderSerializer
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
 
 # ===============================================
 # E-COMMERCE VIEWS
 # ===============================================
 
-class OrderViewSet(viewsets.ModelViewSet):
+def wants_order_summary(request):
+    return request.query_params.get('summary', '').lower() in ('1', 'true', 'yes')
+
+def order_queryset(queryset, summary=False):
+    """Orders with their items prefetched, or with item counts aggregated in SQL for summaries"""
+    if summary:
+        return queryset.annotate(
+            item_count=Count('items'),
+            item_quantity=Coalesce(Sum('items__quantity'), 0),
+        )
+    return queryset.prefetch_related('items')
+
+class OrderViewSet(RoleSectionMixin, viewsets.ModelViewSet):
     """Handle orders"""
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderPagination
+    role_section = 'Orders'
+    role_actions = {'checkout': 'create'}
     
     def get_queryset(self):
         """Users can only see their own orders, admins see all"""
         if self.request.user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+            queryset = Order.objects.all()
+        else:
+            queryset = Order.objects.filter(user=self.request.user)
+        return order_queryset(queryset, summary=self.is_summary())
+    
+    def get_permissions(self):
+        """Members read their orders and check out as their role allows; raw order writes are admin-only"""
+        if self.action in ['list', 'retrieve', 'checkout']:
+            permission_classes = [IsAuthenticated, RolePermission]
+        else:
+            permission_classes = [IsAdminUser]
+        return [permission() for permission in permission_classes]
+    
+    def is_summary(self):
+        return self.action == 'list' and wants_order_summary(self.request)
+    
+    def get_serializer_class(self):
+        if self.action == 'checkout':
+            return CheckoutSerializer
+        if self.is_summary():
+            return OrderSummarySerializer
+        return OrderSerializer
     
     def perform_create(self, serializer):
         """Create order with current user"""
         serializer.save(user=self.request.user)
+    
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """
+        Price a cart server-side and create the order with its items atomically.
+        Send an Idempotency-Key header so retries return the original order.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if len(key) > 64:
+            return Response(
+                {'error': 'Idempotency-Key must be at most 64 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        order, created = checkout.checkout(request.user, serializer.validated_data['items'], idempotency_key=key or None)
+        order = order_queryset(Order.objects.filter(pk=order.pk)).get()
+        return Response(
+            OrderSerializer(order).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
 class MembershipTierViewSet(viewsets.ModelViewSet):
     """Handle membership tiers"""
@@ -347,26 +622,201 @@ class UserRoleViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
 
 # ===============================================
-# PUBLIC VIEWS
+# ANALYTICS VIEWS
 # ===============================================
 
 @api_view(['GET'])
-@permission_classes([AllowAny])
-def public_settings(request):
-    """Public endpoint for all settings needed by the app"""
+@permission_classes([IsAdminUser])
+def analytics_report(request):
+    """
+    Sales and membership report read from the daily rollups.
+    ?metric=sales|items|members&start=YYYY-MM-DD&end=YYYY-MM-DD
+    &granularity=day|week|month|quarter|year&group_by=item_type|membership_tier
+    """
+    serializer = AnalyticsReportSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = serializer.validated_data
+    results = analytics.report(
+        params['metric'], params['start'], params['end'],
+        granularity=params['granularity'], group_by=params.get('group_by'),
+    )
+    return Response({
+        **{key: params[key] for key in ('metric', 'start', 'end', 'granularity')},
+        'group_by': params.get('group_by'),
+        # Days changed since the last refresh_analytics run, not yet reflected above
+        'pending_days': RollupDirtyDay.objects.count(),
+        'results': results,
+    })
+
+# ===============================================
+# EXPORT VIEWS
+# ===============================================
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_view(request, name):
+    """
+    Stream a whole table as CSV or JSON Lines:
+    ?output=csv|jsonl&gzip=true&start=YYYY-MM-DD&end=YYYY-MM-DD&tier=<id>&type=<kind/item_type/category>
+    """
+    if name not in exports.EXPORTS:
+        return Response(
+            {'error': f"Unknown export. Choose from: {', '.join(exports.EXPORTS)}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    serializer = ExportQuerySerializer(data=request.query_params, context={'export': name})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = dict(serializer.validated_data)
+    output = params.pop('output')
+    compress = params.pop('gzip')
+    content_type = 'text/csv; charset=utf-8' if output == 'csv' else 'application/x-ndjson; charset=utf-8'
+    
+    chunks = exports.stream(name, output=output, compress=compress, **params)
+    if isinstance(request._request, ASGIRequest):
+        chunks = exports.aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if compress else content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(name, output, compress)}"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def import_view(request, import_type):
+    """
+    Bulk-load businesses or events from an uploaded CSV or JSON Lines file
+    (optionally .gz) in the `file` field. Rows are upserted by import_key; invalid
+    rows are reported by line number without stopping the import.
+    """
+    if import_type not in imports.IMPORTS:
+        return Response(
+            {'error': f"Unknown import. Choose from: {', '.join(imports.IMPORTS)}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the data in a `file` field'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    source, input_format = imports.open_upload(upload, upload.name)
+    input_format = request.query_params.get('input', input_format)
+    if input_format not in imports.INPUTS:
+        return Response(
+            {'error': f"input must be one of: {', '.join(imports.INPUTS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        report = imports.run(import_type, source, input_format=input_format)
+    except (UnicodeDecodeError, OSError, csv.Error) as error:
+        return Response({'error': f'Could not read the file: {error}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+# ===============================================
+# PUBLIC VIEWS
+# ===============================================
+
+PUBLIC_SETTINGS_LABEL = 'public-settings'
+
+def build_public_settings():
+    """Render the public settings payload once; returns None if the platform is not configured"""
     try:
         platform_settings = PlatformSettings.objects.get()
-        membership_tiers = MembershipTier.objects.all()
-        section_configs = SectionConfig.objects.all()
-        
-        data = {
-            'platform': PlatformSettingsSerializer(platform_settings).data,
-            'membership_tiers': MembershipTierSerializer(membership_tiers, many=True).data,
-            'sections': SectionConfigSerializer(section_configs, many=True).data,
-        }
-        return Response(data)
     except PlatformSettings.DoesNotExist:
+        return None
+    membership_tiers = MembershipTier.objects.all()
+    section_configs = SectionConfig.objects.select_related('splash_theme')
+    
+    data = {
+        'platform': PlatformSettingsSerializer(platform_settings).data,
+        'membership_tiers': MembershipTierSerializer(membership_tiers, many=True).data,
+        'sections': PublicSectionSerializer(section_configs, many=True).data,
+    }
+    body = JSONRenderer().render(data)
+    return {'body': body, 'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32]}
+
+def snapshot_response(request, payload):
+    """Serve a precomputed {'body', 'etag'} payload, answering a matching If-None-Match with 304"""
+    if payload['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload['body'], content_type='application/json')
+    response['ETag'] = payload['etag']
+    response['Cache-Control'] = f'public, max-age={settings.PUBLIC_SETTINGS_MAX_AGE}'
+    return response
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def public_settings(request):
+    """
+    Public endpoint for all settings needed by the app, including each section's
+    splash theme. Served as precomputed JSON from the shared cache and
+    revalidated with a strong ETag.
+    """
+    payload = cache.get_or_build(PUBLIC_SETTINGS_LABEL, 'public-settings', build_public_settings)
+    if payload is None:
         return Response(
             {'error': 'Platform not configured'},
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+    
+    return snapshot_response(request, payload)
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def section_landing(request, section_id):
+    """
+    Everything a section screen needs in one call: the section with its splash
+    theme, the featured hero slider and the latest content cards. Served from a
+    precomputed snapshot and revalidated with a strong ETag.
+    """
+    if section_id not in landing.SECTION_CONTENT:
+        return Response({'error': 'Unknown section'}, status=status.HTTP_404_NOT_FOUND)
+    
+    payload = landing.get(section_id)
+    if payload is None:
+        return Response({'error': 'Section not configured'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return snapshot_response(request, payload)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """Hit/miss counters for the public content response cache"""
+    return Response(cache.stats())
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_view(request):
+    """Full-text search across posts, events and businesses"""
+    text = request.query_params.get('q', '').strip()
+    if not text:
+        return Response(
+            {'error': 'Query parameter q is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    types = request.query_params.get('type')
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), search.MAX_RESULTS)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response(
+            {'error': 'limit and offset must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if offset > search.MAX_OFFSET:
+        return Response(
+            {'error': f'offset may not exceed {search.MAX_OFFSET}; refine the query instead'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    results = search.search(text, types=types.split(',') if types else None, limit=max(limit, 1), offset=offset,
+                            user=request.user)
+    return Response({'results': SearchResultSerializer(results, many=True).data})